@@ -6,25 +6,65 @@
 # - Success banner + hide overrides when gate passes
 # - Assistant Summary: state-aware line (needs review vs success) + "Applied fixes" count
 # - CSV download fixed (real bytes)
+# - Run mode: n8n webhook or in-process local engine (local_engine.py)
+# - Re-runs send only the file digest when the server already holds the parsed upload
+# - Override re-runs re-transform only the edited handles and merge them into the last response
+#   (delta_rerun.py); a changed strategy or catalog-wide override always sends a full run
+# - CSV arrives as a gzip artifact id (local engine / local server); fetched only on download click
+#   and handed to st.download_button as a file handle, never as a bytes copy
+# - Background jobs: submit → job id, progress bar from stage polling; resumes after a page reload,
+#   "Cancel job" stops it on the server
+# - Request signing / upload shared with the batch CLI (webhook_client.py)
+# - Latency waterfall: client spans (upload, server wait, download, JSON parse, base64 decode)
+#   + decision_log.timings from the server, with a rolling history of recent runs
+# - Preview: paginated, filterable grid served page by page from the run (local engine / local
+#   server); n8n responses fall back to paging their preview_transformed rows
+# - Split exports (strategy.csv_split_mb): one download per CSV part
+# - QA: summary from the issue index counts; the full issue list is paged from the run on demand
+# - Overrides panel: one rule per varying-attribute set (overrides.rules) with opt-in per-product
+#   exceptions; settings travel once, in the request body
+# - Memory-bounded session: upload and decoded CSVs spilled to a digest-keyed blob store
+#   (session_store.py) and read through mmap; summary / JSON views memoized per response id
+#   within a per-session budget (MC_SESSION_BUDGET_MB)
+# - AI answers replayed from the workflow's LLM cache are flagged under the summary
+#   (decision_log.llm_cache); "Fresh AI answers" sends llm_cache=bypass
 
 import os
 import io
 import json
 import time
 import uuid
-import hmac
-import hashlib
 from base64 import b64encode, b64decode
+from collections import Counter
 from typing import Tuple, Dict, Any, List
 
 import requests
 import pandas as pd
+import altair as alt
 import streamlit as st
 
+import local_engine
+from upload_cache import CatalogCache
+from artifact_store import ArtifactStore, consumer_root
+from session_store import BlobStore, ViewCache, approx_nbytes, DEFAULT_BUDGET_MB
+from webhook_client import sign_body, post_catalog
+from delta_rerun import delta_handles, merge_delta
+
 # ---------------------------- Config ----------------------------
 DEFAULT_WEBHOOK_PATH = "/webhook/migrate_v1"   # adjust if different
 DEFAULT_TIMEOUT_SEC = 120
 DEFAULT_BYPASS_HMAC = True  # dev default
+RUN_MODE_WEBHOOK = "n8n webhook"
+RUN_MODE_LOCAL = "Local engine"
+MAX_REMEMBERED_DIGESTS = 20
+JOBS_PATH = DEFAULT_WEBHOOK_PATH + "/jobs"
+JOB_POLL_SEC = 0.5
+JOB_STAGES = ["parse", "mapping", "transform", "csv"]
+TIMING_HISTORY = 20          # runs kept for the latency history
+SLOW_STAGE_FACTOR = 2.0      # flag a stage this many times slower than its recent median
+PREVIEW_PAGE_SIZES = [25, 50, 100, 250]
+CSV_SPLIT_MB = 15            # Shopify's product CSV import size limit
+SESSION_BUDGET_MB = int(os.getenv("MC_SESSION_BUDGET_MB", str(DEFAULT_BUDGET_MB)))  # response + derived views
 
 # ---------------------- Session bootstrap -----------------------
 def _init_state():
@@ -32,15 +72,24 @@ def _init_state():
     st.session_state.setdefault("bypass_hmac", DEFAULT_BYPASS_HMAC)
     st.session_state.setdefault("mw_secret", os.getenv("MW_HMAC_SECRET", ""))  # UI can override
     st.session_state.setdefault("timeout_sec", DEFAULT_TIMEOUT_SEC)
+    st.session_state.setdefault("run_mode", RUN_MODE_WEBHOOK)
+    st.session_state.setdefault("digest_reruns", True)
+    st.session_state.setdefault("async_jobs", False)
+    st.session_state.setdefault("server_digests", {})        # base_url -> digests the server has parsed
 
     st.session_state.setdefault("strict_mode", True)
     st.session_state.setdefault("strategy_json", "")         # JSON string
     st.session_state.setdefault("overrides_json", "")        # JSON string
     st.session_state.setdefault("per_product_edits", {})     # temp UI state for overrides
+    st.session_state.setdefault("rule_edits", {})            # attribute-set key -> rule (overrides.rules)
 
     st.session_state.setdefault("stored_file_name", "")
-    st.session_state.setdefault("stored_file_bytes", b"")
-    st.session_state.setdefault("last_response", None)       # cache last js
+    st.session_state.setdefault("stored_file", None)         # blob handle {digest, bytes, file_id} of the upload
+    st.session_state.setdefault("last_response", None)       # cache last js (CSV payloads spilled as blob handles)
+    st.session_state.setdefault("last_response_id", "")      # key of the memoized views of last_response
+    st.session_state.setdefault("last_response_bytes", 0)
+    st.session_state.setdefault("last_submitted", {})        # {"digest", "strategy_json", "overrides_json"} behind last_response
+    st.session_state.setdefault("timing_history", [])        # recent runs: total + per-stage ms
 
 _init_state()
 
@@ -55,14 +104,6 @@ def get_hmac_secret() -> str:
     # 1) env var, 2) sidebar input, else empty (unsigned)
     return os.getenv("MW_HMAC_SECRET") or st.session_state.get("mw_secret", "")
 
-def sha256_hex(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
-
-def sign_body(secret: str, ts: int, request_id: str, file_digest_header: str) -> str:
-    # Must match n8n Verify HMAC: base = f"{ts}.{request_id}.{file_digest_header}"
-    base = f"{ts}.{request_id}.{file_digest_header}".encode("utf-8")
-    return hmac.new(secret.encode("utf-8"), base, hashlib.sha256).hexdigest()
-
 def send_to_n8n(
     base_url: str,
     path: str,
@@ -72,67 +113,492 @@ def send_to_n8n(
     strategy_json: str,
     overrides_json: str,
     bypass_hmac: bool,
+    file_digest: str = "",
 ) -> Tuple[bool, str, requests.Response]:
     """Graceful signing: if secret provided and not bypassed, sign; else send unsigned."""
+    secret = get_hmac_secret()
+    return post_catalog(
+        requests, base_url, path, file_name, file_bytes, strict_mode, strategy_json, overrides_json,
+        secret="" if bypass_hmac else secret,
+        timeout=int(st.session_state.get("timeout_sec", DEFAULT_TIMEOUT_SEC)),
+        file_digest=file_digest,
+        llm_cache="bypass" if st.session_state.get("bypass_llm_cache") else "",
+    )
+
+def send_digest_to_n8n(
+    base_url: str,
+    path: str,
+    file_digest: str,
+    strict_mode: bool,
+    strategy_json: str,
+    overrides_json: str,
+    bypass_hmac: bool,
+    base_run_id: str = "",
+    changed_handles: List[str] = None,
+) -> Tuple[bool, str, requests.Response]:
+    """Re-run against an upload the server already parsed: digest + settings, no file.
+
+    The server answers 409 (digest_not_cached) if it evicted the catalog; callers then
+    fall back to send_to_n8n(). With base_run_id + changed_handles the server may reply
+    with a delta (see merge_delta).
+    """
     ts = int(time.time())
     request_id = str(uuid.uuid4())
-    file_digest_header = sha256_hex(file_bytes)
-
     headers = {
         "x-timestamp": str(ts),
         "x-request-id": request_id,
-        "x-file-digest": file_digest_header,
-        "x-strict-mode": str(strict_mode).lower(),
-        "x-strategy-json": strategy_json or "",
-        "x-overrides-json": overrides_json or "",
-        # 'content-type' left to requests for multipart boundary
-    }
-
-    # Also send as form data for backwards compatibility
-    data = {
-        "strict_mode": str(strict_mode).lower(),
-        "strategy_json": strategy_json or "",
-        "overrides_json": overrides_json or "",
+        "x-file-digest": file_digest,
+        "x-digest-only": "true",
+        "content-type": "application/json",
     }
-
-    files = {
-        "file": (file_name or "catalog.csv", file_bytes, "text/csv"),
-    }
-
     signed = False
     secret = get_hmac_secret()
     if secret and not bypass_hmac:
-        headers["x-signature"] = sign_body(secret, ts, request_id, file_digest_header)
+        headers["x-signature"] = sign_body(secret, ts, request_id, file_digest)
         signed = True
 
+    payload = {
+        "strict_mode": str(strict_mode).lower(),
+        "strategy_json": strategy_json or "",
+        "overrides_json": overrides_json or "",
+    }
+    if base_run_id and changed_handles is not None:
+        payload["base_run_id"] = base_run_id
+        payload["changed_handles"] = changed_handles
+    body = json.dumps(payload).encode("utf-8")
     url = base_url.rstrip("/") + "/" + path.lstrip("/")
-
-    # CRITICAL FIX: Pass overrides and strategy as URL query params
-    # This ensures they survive the n8n "Extract from File" node which drops metadata
-    from urllib.parse import quote
-    query_params = []
-    if overrides_json:
-        query_params.append(f"overrides={quote(overrides_json)}")
-    if strategy_json:
-        query_params.append(f"strategy={quote(strategy_json)}")
-    if strict_mode is not None:
-        query_params.append(f"strict_mode={str(strict_mode).lower()}")
-
-    if query_params:
-        url += "?" + "&".join(query_params)
-
     resp = requests.post(
-        url, data=data, files=files, headers=headers,
+        url, data=body, headers=headers,
         timeout=int(st.session_state.get("timeout_sec", DEFAULT_TIMEOUT_SEC))
     )
     return signed, request_id, resp
 
+def _remember_server_digest(base_url: str, digest: str):
+    known = st.session_state.setdefault("server_digests", {})
+    lst = [d for d in known.get(base_url, []) if d != digest] + [digest]
+    known[base_url] = lst[-MAX_REMEMBERED_DIGESTS:]
+
+def result_csv_loader(files: Dict[str, Any], run_mode: str, base_url: str, timeout: int, store: ArtifactStore):
+    """Callable for st.download_button: resolves the CSV artifact only when the user clicks.
+
+    Runs outside the script thread, so everything it needs is bound here. Returns a file handle
+    over the gzip artifact rather than its bytes; Streamlit reads it once into its media store.
+    """
+    meta = files.get("shopify_csv") or {}
+    run_id = files.get("run_id") or ""
+
+    def load() -> io.BufferedReader:
+        if run_mode == RUN_MODE_LOCAL:
+            local_meta = meta if meta.get("artifact_id") else local_engine.run_artifact(run_id)
+            src = local_engine.ARTIFACTS.open(local_meta["artifact_id"]) if local_meta else None
+            if src is None:
+                raise RuntimeError("Result expired from the local engine; click 'Send to Agent' again.")
+            # st.download_button takes plain binary files, not a GzipFile
+            return io.BufferedReader(src)
+        key = meta.get("artifact_id") or f"run-{run_id}"
+        if store.meta(key) is None:
+            endpoint = f"/artifacts/{meta['artifact_id']}" if meta.get("artifact_id") else f"/runs/{run_id}/csv"
+            url = base_url.rstrip("/") + "/" + DEFAULT_WEBHOOK_PATH.strip("/") + endpoint
+            with requests.get(url, stream=True, timeout=timeout) as r:
+                r.raise_for_status()
+                fname = meta.get("filename") or "shopify_products.csv"
+                if r.headers.get("content-encoding") == "gzip":
+                    # keep the transfer compressed on disk; decompress once, on read
+                    size = int(r.headers.get("x-uncompressed-length") or meta.get("bytes") or 0)
+                    store.write_compressed(r.raw.stream(1 << 16, decode_content=False), fname, size, artifact_id=key)
+                else:
+                    store.write_chunks(r.iter_content(1 << 16), fname, artifact_id=key)
+        src = store.open(key)
+        if src is None:
+            raise RuntimeError("Downloaded result was evicted; click the button again.")
+        return io.BufferedReader(src)
+
+    return load
+
+@st.cache_resource
+def _download_store() -> ArtifactStore:
+    # client-side gzip copies of server artifacts, so reruns never refetch a result
+    return ArtifactStore(root=consumer_root("downloads"))
+
+# ------------------------ Session memory ------------------------
+@st.cache_resource
+def _blob_store() -> BlobStore:
+    # process-wide: uploads and decoded CSVs on disk, one file per digest; sessions keep handles
+    return BlobStore()
+
+def _views() -> ViewCache:
+    views = st.session_state.get("views")
+    if views is None:
+        views = st.session_state.views = ViewCache(SESSION_BUDGET_MB << 20)
+    return views
+
+def session_view(name: str, build):
+    """View derived from last_response, built once per response while it fits the session budget."""
+    views = _views()
+    # the response itself counts against the budget; what is left holds the views
+    views.budget = max(0, (SESSION_BUDGET_MB << 20) - int(st.session_state.get("last_response_bytes") or 0))
+    views.shrink()
+    return views.get(st.session_state.get("last_response_id"), name, build)
+
+def blob_loader(handle: Dict[str, Any]):
+    """Callable for st.download_button: reads a spilled blob only when the user clicks."""
+    store, digest = _blob_store(), (handle or {}).get("digest", "")
+
+    def load() -> io.BufferedReader:
+        f = store.reader(digest)
+        if f is None:
+            raise RuntimeError("Result expired from the session store; click 'Send to Agent' again.")
+        return f
+
+    return load
+
+def store_response(js_obj: Dict[str, Any], csv_bytes: bytes = None) -> Dict[str, Any]:
+    """Keep a response in the session: inline base64 CSVs decoded once and spilled to the blob
+    store (files.shopify_csv_blob / part.blob), views of the previous response dropped."""
+    files = dict(js_obj.get("files") or {})
+    csv_b64 = files.pop("shopify_csv_base64", None)
+    if csv_bytes or csv_b64:
+        files["shopify_csv_blob"] = _blob_store().put(csv_bytes if csv_bytes is not None else b64decode(csv_b64))
+    parts = files.get("shopify_csv_parts") or []
+    if any("base64" in part for part in parts):
+        files["shopify_csv_parts"] = [
+            dict({k: v for k, v in part.items() if k != "base64"},
+                 blob=_blob_store().put(b64decode(part["base64"] or ""))) if "base64" in part else part
+            for part in parts
+        ]
+    js_obj = dict(js_obj, files=files)
+    st.session_state.last_response = js_obj
+    st.session_state.last_response_id = uuid.uuid4().hex
+    st.session_state.last_response_bytes = approx_nbytes(js_obj)
+    _views().clear()
+    return js_obj
+
+def session_debug() -> Dict[str, Any]:
+    """Session state for the debug expander; large entries summarised instead of dumped."""
+    out = {}
+    for k, v in st.session_state.items():
+        if k == "last_response" and v:
+            out[k] = f"<response {st.session_state.get('last_response_id')}, " \
+                     f"~{int(st.session_state.get('last_response_bytes') or 0):,} bytes>"
+        elif k == "qa_list" and v:
+            out[k] = f"<{len(v['issues']):,} issues loaded>"
+        elif isinstance(v, ViewCache):
+            out[k] = v.stats()
+        elif isinstance(v, (bytes, bytearray)):
+            out[k] = f"<{len(v)} bytes>"
+        else:
+            out[k] = v
+    return out
+
+# --------------------------- QA issues --------------------------
+def fetch_issues_page(run_mode: str, base_url: str, run_id: str, cursor: str, code: str = "",
+                      limit: int = 500, timeout: int = 30) -> Dict[str, Any]:
+    """One page of the run's full QA issue list (qa.next_cursor → next_cursor); None if the run is gone."""
+    if run_mode == RUN_MODE_LOCAL:
+        return local_engine.issues_page(run_id, cursor, limit, code=code)
+    url = base_url.rstrip("/") + "/" + DEFAULT_WEBHOOK_PATH.strip("/") + f"/runs/{run_id}/issues"
+    r = requests.get(url, params={"cursor": cursor, "limit": limit, "code": code}, timeout=timeout)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json()
+
+def render_issue_list(js_obj: Dict[str, Any]) -> None:
+    """Beyond the inline first page: load the full issue list from the run on demand."""
+    qa = js_obj.get("qa") or {}
+    run_id = js_obj.get("run_id")
+    if not (run_id and qa.get("next_cursor")):
+        return
+    st.caption(f"The response lists the first {len(qa.get('issues') or [])} of {int(qa.get('total') or 0):,} issues.")
+    c1, c2 = st.columns([3, 1])
+    code = c1.selectbox("Issue code", [""] + list(qa.get("counts") or {}),
+                        format_func=lambda c: c or "(all)", key="qa_list_code")
+    loaded = st.session_state.get("qa_list")
+    if loaded and (loaded["run_id"], loaded["code"]) != (run_id, code):
+        loaded = st.session_state.qa_list = None
+    more = bool(loaded and loaded["next_cursor"])
+    if c2.button("Load more" if more else "Load issues", key="qa_list_load", disabled=bool(loaded) and not more):
+        try:
+            page = fetch_issues_page(
+                st.session_state.get("run_mode", RUN_MODE_WEBHOOK), st.session_state.get("base_url", "").strip(),
+                run_id, loaded["next_cursor"] if more else "0", code,
+                timeout=int(st.session_state.get("timeout_sec", DEFAULT_TIMEOUT_SEC)),
+            )
+        except Exception as e:
+            st.error(f"Could not load issues: {e}")
+            page = None
+        if page is not None:
+            loaded = st.session_state.qa_list = {
+                "run_id": run_id, "code": code, "matched": page["matched"], "next_cursor": page["next_cursor"],
+                "issues": (loaded["issues"] if more else []) + page["issues"],
+            }
+    if loaded:
+        st.dataframe(pd.DataFrame(loaded["issues"]), use_container_width=True, height=300)
+        st.caption(f"{len(loaded['issues']):,} of {loaded['matched']:,} issues loaded")
+
+# --------------------------- Preview ----------------------------
+def fetch_preview_page(run_mode: str, base_url: str, run_id: str, offset: int, limit: int,
+                       filters: Dict[str, str], timeout: int = 30) -> Dict[str, Any]:
+    """One page of the run's output rows from the engine; None if the run is gone (or the
+    server has no preview endpoint, e.g. n8n)."""
+    if run_mode == RUN_MODE_LOCAL:
+        return local_engine.preview_page(run_id, offset, limit, **filters)
+    url = base_url.rstrip("/") + "/" + DEFAULT_WEBHOOK_PATH.strip("/") + f"/runs/{run_id}/preview"
+    r = requests.get(url, params={"offset": offset, "limit": limit, **filters}, timeout=timeout)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json()
+
+def inline_preview_page(js_obj: Dict[str, Any], offset: int, limit: int, filters: Dict[str, str]) -> Dict[str, Any]:
+    """Same page shape over the response's own preview_transformed rows (n8n workflow)."""
+    rows = [r for r in js_obj.get("preview_transformed") or [] if isinstance(r, dict)]
+    handle, issue, option = (filters.get(k, "").lower() for k in ("handle", "issue", "option"))
+    qa = js_obj.get("qa") or {}
+    known = list(qa.get("issues") or []) + [i for sample in (qa.get("samples") or {}).values() for i in sample]
+    issue_handles = {i.get("handle") for i in known if str(i.get("code", "")).lower() == issue} if issue else set()
+    positions = [
+        i for i, r in enumerate(rows)
+        if (not handle or handle in str(r.get("Handle", "")).lower())
+        and (not issue or r.get("Handle") in issue_handles)
+        and (not option or any(option in str(r.get(f"Option{k} Value", "")).lower() for k in (1, 2, 3)))
+    ]
+    picked = positions[offset:offset + limit]
+    columns = list(dict.fromkeys(k for r in rows for k in r))
+    return {
+        "total": len(rows), "matched": len(positions), "offset": offset, "limit": limit,
+        "columns": columns, "positions": picked,
+        "data": [[rows[i].get(c, "") for i in picked] for c in columns],
+        "partial": True,
+    }
+
+def page_frame(page: Dict[str, Any]) -> pd.DataFrame:
+    """Columnar page → DataFrame indexed by row number (1-based) in the full output."""
+    df = pd.DataFrame(dict(zip(page.get("columns") or [], page.get("data") or [])))
+    if len(df):
+        df.index = [p + 1 for p in page.get("positions") or range(len(df))]
+    return df
+
+def render_preview(js_obj: Dict[str, Any]) -> None:
+    """Searchable grid over the transformed rows; only the visible page is fetched."""
+    st.subheader("Preview")
+    f1, f2, f3, f4 = st.columns([3, 2, 3, 1])
+    filters = {
+        "handle": f1.text_input("Handle contains", key="pv_handle").strip(),
+        "issue": f2.selectbox("Products with issue", [""] + sorted(local_engine.ISSUE_KEYS),
+                              format_func=lambda c: c or "(any)", key="pv_issue"),
+        "option": f3.text_input("Option value contains", key="pv_option").strip(),
+    }
+    size = f4.selectbox("Rows / page", PREVIEW_PAGE_SIZES, key="pv_size")
+    # new filters (or a new run) start again at page 1
+    sig = (js_obj.get("run_id"), size, tuple(filters.values()))
+    if st.session_state.get("pv_sig") != sig:
+        st.session_state.pv_sig = sig
+        st.session_state.pv_page = 1
+    page_no = int(st.session_state.get("pv_page", 1))
+
+    page = None
+    if js_obj.get("run_id"):
+        try:
+            page = fetch_preview_page(
+                st.session_state.get("run_mode", RUN_MODE_WEBHOOK), st.session_state.get("base_url", "").strip(),
+                js_obj["run_id"], (page_no - 1) * size, size, filters,
+            )
+        except Exception as e:
+            st.caption(f"Paged preview unavailable ({e}); showing the rows returned with the response.")
+    if page is None:
+        page = inline_preview_page(js_obj, (page_no - 1) * size, size, filters)
+
+    pages = max(1, -(-int(page["matched"]) // size))
+    if page_no > pages:
+        # the run shrank under the current page (e.g. a delta re-run)
+        st.session_state.pv_page = pages
+        st.rerun()
+    df = page_frame(page)
+    if df.empty:
+        st.caption("No rows match these filters." if any(filters.values()) else "No preview rows returned.")
+    else:
+        st.dataframe(df, use_container_width=True, height=400)
+    n1, n2 = st.columns([1, 4])
+    n1.number_input("Page", min_value=1, max_value=pages, step=1, key="pv_page")
+    first = page["offset"] + 1 if page["matched"] else 0
+    last = min(page["offset"] + size, page["matched"])
+    scope = "rows returned with the response" if page.get("partial") else "rows"
+    n2.caption(f"Rows {first:,}–{last:,} of {page['matched']:,} matching · {page['total']:,} {scope} · page {page_no} of {pages}")
+
+def job_progress(job: Dict[str, Any]) -> Tuple[float, str]:
+    """(fraction, label) for a job status: stages weigh equally, rows within a stage."""
+    if job.get("status") == "done":
+        return 1.0, "Done"
+    stage = job.get("stage")
+    if not stage:
+        return 0.0, "Queued…"
+    i = JOB_STAGES.index(stage) if stage in JOB_STAGES else 0
+    done, total = int(job.get("done") or 0), int(job.get("total") or 0)
+    frac = (i + (min(done / total, 1.0) if total else 0.0)) / len(JOB_STAGES)
+    label = f"{stage.capitalize()} — {done:,} / {total:,} rows" if total else f"{stage.capitalize()}…"
+    return frac, label
+
+def wait_for_job(base_url: str, job_id: str) -> Dict[str, Any]:
+    """Poll a background job to completion with a progress bar; returns the final status.
+
+    The job id sits in the URL while polling, so a page reload picks the job back up. Clicking
+    "Cancel job" reruns the script, which lands here again via that URL and asks the server to stop.
+    """
+    st.query_params["job_id"] = job_id
+    url = base_url.rstrip("/") + "/" + JOBS_PATH.lstrip("/") + "/" + job_id
+    if st.button("Cancel job", key=f"cancel_{job_id}"):
+        requests.delete(url, timeout=30)
+    bar = st.progress(0.0, text="Queued…")
+    while True:
+        r = requests.get(url, timeout=30)
+        if r.status_code == 404:
+            job = {"status": "error", "error": "job_not_found (server restarted or job evicted)"}
+            break
+        job = r.json()
+        frac, label = job_progress(job)
+        bar.progress(frac, text=label)
+        if job.get("status") in ("done", "error", "cancelled"):
+            break
+        time.sleep(JOB_POLL_SEC)
+    if "job_id" in st.query_params:
+        del st.query_params["job_id"]
+    if job.get("status") == "error":
+        st.error(f"Job failed: {job.get('error')}")
+    elif job.get("status") == "cancelled":
+        st.warning("Job cancelled.")
+    return job
+
+# --------------------------- Timings ----------------------------
+def _span(stage: str, start_ms: float, ms: float, nbytes: Any = None, encloses_server: bool = False) -> Dict[str, Any]:
+    # encloses_server: the span contains the server's own spans (left out of totals and "slowest")
+    sp = {"stage": stage, "start_ms": round(start_ms, 1), "ms": round(max(ms, 0.0), 1), "bytes": nbytes}
+    if encloses_server:
+        sp["encloses_server"] = True
+    return sp
+
+def _ms_since(t: float) -> float:
+    return (time.perf_counter() - t) * 1000.0
+
+def timings_extent(spans: List[Dict[str, Any]]) -> float:
+    """End of the last span (ms), i.e. the server time the spans account for."""
+    return max((float(s.get("start_ms") or 0) + float(s.get("ms") or 0) for s in spans or []), default=0.0)
+
+def request_bytes(r: requests.Response) -> int:
+    """Size of the sent body: bytes, or the streamed webhook_client.MultipartBody (0 when there was none)."""
+    body = r.request.body
+    if body is None:
+        return 0
+    return len(body) if hasattr(body, "__len__") else 0
+
+def http_timings(r: requests.Response, total_ms: float, server_ms: float) -> Tuple[List[Dict[str, Any]], float]:
+    """Client spans for one blocking request, plus where the server's spans start.
+
+    r.elapsed runs from sending the request until the response headers are parsed, so it
+    covers upload + server time; the rest of the call is the body download.
+    """
+    head_ms = r.elapsed.total_seconds() * 1000.0
+    server_ms = min(server_ms, head_ms)
+    spans = [
+        _span("upload", 0.0, head_ms - server_ms, request_bytes(r)),
+        _span("server wait", head_ms - server_ms, server_ms, encloses_server=True),
+        _span("download", head_ms, total_ms - head_ms, len(r.content)),
+    ]
+    return spans, head_ms - server_ms
+
+def record_timings(js: Dict[str, Any], client: List[Dict[str, Any]], server_offset_ms: float, delta: bool = False) -> None:
+    """Attach the client spans to a response and append the run to the rolling history."""
+    server = (js.get("decision_log") or {}).get("timings") or []
+    total = max(timings_extent(client), server_offset_ms + timings_extent(server))
+    js["client_timings"] = {"spans": client, "server_offset_ms": round(server_offset_ms, 1), "total_ms": round(total, 1)}
+    stages: Dict[str, float] = {}
+    for side, spans in (("client", client), ("server", server)):
+        for sp in spans:
+            if sp.get("encloses_server"):
+                continue
+            key = f"{side}: {sp.get('stage')}"
+            stages[key] = round(stages.get(key, 0.0) + float(sp.get("ms") or 0), 1)
+    meta = (js.get("decision_log") or {}).get("meta") or {}
+    hist = st.session_state.setdefault("timing_history", [])
+    hist.append({
+        "at": time.strftime("%H:%M:%S"),
+        "mode": st.session_state.get("run_mode", RUN_MODE_WEBHOOK) + (" (delta)" if delta else ""),
+        "rows": meta.get("row_count"),
+        "total_ms": round(total, 1),
+        "stages": stages,
+    })
+    del hist[:-TIMING_HISTORY]
+
+def slow_stages(history: List[Dict[str, Any]]) -> List[Tuple[str, float, float]]:
+    """(stage, ms, median ms) for stages of the latest run well above their recent median."""
+    if len(history) < 2:
+        return []
+    *prev, last = history
+    out = []
+    for stage, ms in last["stages"].items():
+        seen = sorted(h["stages"][stage] for h in prev if stage in h["stages"])
+        if not seen:
+            continue
+        median = seen[len(seen) // 2]
+        if ms > 50 and ms > SLOW_STAGE_FACTOR * max(median, 1.0):
+            out.append((stage, ms, median))
+    return out
+
+def render_timings(js_obj: Dict[str, Any]) -> None:
+    """Waterfall of the last run (client + server spans) and the recent-runs history."""
+    ct = js_obj.get("client_timings") or {}
+    server = (js_obj.get("decision_log") or {}).get("timings") or []
+    offset = float(ct.get("server_offset_ms") or 0)
+    rows = [dict(sp, side="client") for sp in ct.get("spans") or []]
+    rows += [dict(sp, side="server", start_ms=offset + float(sp.get("start_ms") or 0)) for sp in server]
+    if not rows:
+        return
+    total = ct.get("total_ms") or timings_extent(rows)
+    slowest = max([sp for sp in rows if not sp.get("encloses_server")] or rows, key=lambda sp: float(sp.get("ms") or 0))
+    with st.expander(f"⏱ Timings — {total:,.0f} ms (slowest: {slowest['side']} {slowest['stage']}, "
+                     f"{float(slowest['ms']):,.0f} ms)", expanded=False):
+        df = pd.DataFrame([{
+            "lane": f"{sp['side']}: {sp['stage']}",
+            "side": sp["side"],
+            "start_ms": float(sp.get("start_ms") or 0),
+            "end_ms": float(sp.get("start_ms") or 0) + float(sp.get("ms") or 0),
+            "ms": float(sp.get("ms") or 0),
+            "rows_in": sp.get("rows_in"),
+            "rows_out": sp.get("rows_out"),
+            "bytes": sp.get("bytes"),
+        } for sp in rows])
+        chart = alt.Chart(df).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since request"),
+            x2="end_ms:Q",
+            y=alt.Y("lane:N", sort=list(df["lane"]), title=None),
+            color=alt.Color("side:N", title=None),
+            tooltip=["lane", "ms", "rows_in", "rows_out", "bytes"],
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+        history = st.session_state.get("timing_history") or []
+        for stage, ms, median in slow_stages(history):
+            st.warning(f"**{stage}** took {ms:,.0f} ms — {ms / max(median, 1.0):.1f}× its recent median ({median:,.0f} ms).")
+        if len(history) > 1:
+            st.caption(f"Last {len(history)} runs (ms per stage)")
+            hist_df = pd.DataFrame([{"run": f"{i + 1} · {h['at']}", **h["stages"]} for i, h in enumerate(history)])
+            st.bar_chart(hist_df.set_index("run"), height=260)
+            st.dataframe(pd.DataFrame([{k: h[k] for k in ("at", "mode", "rows", "total_ms")} for h in history]),
+                         use_container_width=True, hide_index=True)
+
+@st.cache_resource
+def _local_catalog_cache() -> CatalogCache:
+    # process-wide: parsed uploads shared by reruns (and sessions) in local engine mode
+    return CatalogCache()
+
 def _clear_override_ui_state():
     # clears stale override widgets after success
     st.session_state.pop("per_product_edits", None)
+    st.session_state.pop("rule_edits", None)
 
 # ---------------------------- UI --------------------------------
 st.set_page_config(page_title="Migration Copilot (Demo)", layout="wide")
+local_engine.use_artifacts("app")  # local-mode results in their own artifact subdirectory
 
 with st.sidebar:
     st.markdown("### Connection")
@@ -156,9 +622,27 @@ with st.sidebar:
 
     st.divider()
     st.markdown("### Run Options")
+    st.session_state.run_mode = st.radio(
+        "Run mode", options=[RUN_MODE_WEBHOOK, RUN_MODE_LOCAL],
+        index=[RUN_MODE_WEBHOOK, RUN_MODE_LOCAL].index(st.session_state.get("run_mode", RUN_MODE_WEBHOOK)),
+        help="Local engine runs the Transform & QA logic in-process (no upload, no n8n round trip)."
+    )
     st.session_state.strict_mode = st.toggle(
         "Strict Mode (block on errors)", value=bool(st.session_state.get("strict_mode", True))
     )
+    st.session_state.digest_reruns = st.toggle(
+        "Digest-only re-runs", value=bool(st.session_state.get("digest_reruns", True)),
+        help="On 'Apply overrides & re-run', send only the file digest if the server already parsed this upload."
+    )
+    st.session_state.async_jobs = st.toggle(
+        "Run as background job", value=bool(st.session_state.get("async_jobs", False)),
+        help="Submit to the jobs endpoint (local_server.py) and poll progress instead of one blocking call."
+    )
+    st.session_state.bypass_llm_cache = st.toggle(
+        "Fresh AI answers (skip LLM cache)", value=bool(st.session_state.get("bypass_llm_cache", False)),
+        help="The workflow reuses mapping/plan answers for the same headers and sample rows; "
+             "turn on to call the model again (the new answer replaces the cached one)."
+    )
 
 st.title("🧭 Migration Copilot — Demo UI")
 
@@ -176,10 +660,11 @@ with col_u2:
         label_visibility="collapsed"
     )
 
-# Persist uploaded file for re-runs
+# Persist uploaded file for re-runs: spilled to the blob store once per upload, the session keeps the handle
 if uploaded is not None:
     st.session_state.stored_file_name = uploaded.name
-    st.session_state.stored_file_bytes = uploaded.read()
+    if (st.session_state.get("stored_file") or {}).get("file_id") != uploaded.file_id:
+        st.session_state.stored_file = dict(_blob_store().put(uploaded.getbuffer()), file_id=uploaded.file_id)
 
 # Actions
 c_send, c_rerun = st.columns([1, 1])
@@ -190,10 +675,15 @@ rerun_clicked = c_rerun.button("Apply overrides & re-run", use_container_width=T
 overrides_json = st.session_state.get("overrides_json") or ""
 strategy_json = st.session_state.get("strategy_json") or ""
 
-# Guard: need file
-if (send_clicked or rerun_clicked) and not st.session_state.get("stored_file_bytes"):
+# Guard: need file (still in the blob store)
+stored_file = st.session_state.get("stored_file") or {}
+if (send_clicked or rerun_clicked) and not stored_file.get("bytes"):
     st.error("Please upload a CSV file first.")
     st.stop()
+file_bytes = _blob_store().open(stored_file["digest"]) if send_clicked or rerun_clicked else None
+if (send_clicked or rerun_clicked) and file_bytes is None:
+    st.error("The uploaded file expired from the session store; please upload it again.")
+    st.stop()
 
 # Do request (send or re-run)
 js = None
@@ -218,39 +708,147 @@ if send_clicked or rerun_clicked:
                     except Exception as e:
                         st.error(f"Error parsing overrides_json: {e}")
 
-        signed, request_id, r = send_to_n8n(
-            base_url=st.session_state.get("base_url", "").strip(),
-            path=DEFAULT_WEBHOOK_PATH,
-            file_name=st.session_state.get("stored_file_name", "catalog.csv"),
-            file_bytes=st.session_state.get("stored_file_bytes", b""),
-            strict_mode=bool(st.session_state.get("strict_mode", True)),
-            strategy_json=strategy_json,
-            overrides_json=overrides_json,
-            bypass_hmac=bool(st.session_state.get("bypass_hmac", DEFAULT_BYPASS_HMAC)),
-        )
-        content_type = r.headers.get("content-type", "")
-        ok_json = "application/json" in content_type or r.text.strip().startswith("{")
-        try:
-            js = r.json() if ok_json else None
-        except Exception:
-            js = None
+        file_digest = stored_file["digest"]  # sha256 of the upload, computed once when it was spilled
+        # Delta re-run: same upload, strategy and catalog-wide overrides as the last response →
+        # only the handles with edited per_product overrides are re-transformed
+        last = st.session_state.get("last_response") or {}
+        last_submitted = st.session_state.get("last_submitted") or {}
+        delta_base, rerun_handles = "", None
+        if rerun_clicked and last.get("run_id") and last_submitted.get("digest") == file_digest:
+            rerun_handles = delta_handles(last_submitted, strategy_json, overrides_json)
+            delta_base = last["run_id"] if rerun_handles is not None else ""
+
+        client_spans, server_offset, csv_decoded = [], 0.0, None
+        if st.session_state.get("run_mode") == RUN_MODE_LOCAL:
+            signed, r = False, None
+            t_send = time.perf_counter()
+            bar = st.progress(0.0, text="Parse…")
+            def _local_progress(stage: str, done: int, total: int):
+                bar.progress(*job_progress({"stage": stage, "done": done, "total": total}))
+            if delta_base:
+                strict, strategy, overrides = local_engine.parse_inputs(
+                    bool(st.session_state.get("strict_mode", True)), strategy_json, overrides_json
+                )
+                js = local_engine.run_delta(delta_base, rerun_handles, strategy, overrides, strict)
+            if js is None:
+                js = local_engine.run_local(
+                    file_bytes=file_bytes,
+                    strict_mode=bool(st.session_state.get("strict_mode", True)),
+                    strategy_json=strategy_json,
+                    overrides_json=overrides_json,
+                    cache=_local_catalog_cache(),
+                    progress=_local_progress,
+                )
+            bar.empty()
+            status = "local"
+            client_spans = [_span("local engine", 0.0, _ms_since(t_send), encloses_server=True)]
+        else:
+            base_url = st.session_state.get("base_url", "").strip()
+            use_jobs = bool(st.session_state.get("async_jobs", False))
+            path = JOBS_PATH if use_jobs else DEFAULT_WEBHOOK_PATH
+            r = None
+            if (rerun_clicked and st.session_state.get("digest_reruns", True)
+                    and file_digest in st.session_state.get("server_digests", {}).get(base_url, [])):
+                t_send = time.perf_counter()
+                signed, request_id, r = send_digest_to_n8n(
+                    base_url=base_url,
+                    path=path,
+                    file_digest=file_digest,
+                    strict_mode=bool(st.session_state.get("strict_mode", True)),
+                    strategy_json=strategy_json,
+                    overrides_json=overrides_json,
+                    bypass_hmac=bool(st.session_state.get("bypass_hmac", DEFAULT_BYPASS_HMAC)),
+                    base_run_id=delta_base,
+                    changed_handles=rerun_handles,
+                )
+                if r.status_code == 409:
+                    r = None  # server evicted the catalog → full upload
+            if r is None:
+                t_send = time.perf_counter()
+                signed, request_id, r = send_to_n8n(
+                    base_url=base_url,
+                    path=path,
+                    file_name=st.session_state.get("stored_file_name", "catalog.csv"),
+                    file_bytes=file_bytes,
+                    strict_mode=bool(st.session_state.get("strict_mode", True)),
+                    strategy_json=strategy_json,
+                    overrides_json=overrides_json,
+                    bypass_hmac=bool(st.session_state.get("bypass_hmac", DEFAULT_BYPASS_HMAC)),
+                    file_digest=file_digest,
+                )
+            if r.headers.get("x-catalog-cache") in ("stored", "hit"):
+                _remember_server_digest(base_url, file_digest)
+            total_ms = _ms_since(t_send)
+            if use_jobs and r.status_code == 202:
+                t_wait = time.perf_counter()
+                job = wait_for_job(base_url, r.json().get("job_id", ""))
+                js = job.get("result")
+                status = f"job {job.get('status')}"
+                client_spans = [_span("submit", 0.0, total_ms, request_bytes(r)),
+                                _span("job wait", total_ms, _ms_since(t_wait), encloses_server=True)]
+                server_offset = total_ms
+            else:
+                content_type = r.headers.get("content-type", "")
+                ok_json = "application/json" in content_type or r.text.strip().startswith("{")
+                t_parse = time.perf_counter()
+                try:
+                    js = r.json() if ok_json else None
+                except Exception:
+                    js = None
+                parse_ms = _ms_since(t_parse)
+                status = r.status_code
+                if js is not None:
+                    server_ms = r.headers.get("x-server-ms")
+                    server_ms = float(server_ms) if server_ms else timings_extent(
+                        (js.get("decision_log") or {}).get("timings"))
+                    client_spans, server_offset = http_timings(r, total_ms, server_ms)
+                    client_spans.append(_span("json parse", total_ms, parse_ms, len(r.content)))
+                    csv_b64 = (js.get("files") or {}).get("shopify_csv_base64")
+                    if csv_b64:
+                        # decode once here (timed) instead of on every rerun of the download section
+                        t_dec = time.perf_counter()
+                        csv_decoded = b64decode(csv_b64)
+                        client_spans.append(_span("base64 decode", total_ms + parse_ms, _ms_since(t_dec),
+                                                  len(csv_decoded)))
 
         # Metrics
         m1, m2, m3, m4 = st.columns(4)
-        m1.metric("HTTP", r.status_code)
+        m1.metric("HTTP", status)
         m2.metric("JSON?", "yes" if js is not None else "no")
         m3.metric("Signed", "✅" if signed else "—")
         needs_override_metric = (js or {}).get("gate", {}).get("needs_override") if js else None
         m4.metric("Needs Override", "Yes" if needs_override_metric else ("No" if needs_override_metric is not None else "—"))
 
-        if not signed and not bool(st.session_state.get("bypass_hmac", DEFAULT_BYPASS_HMAC)):
+        if r is not None and not signed and not bool(st.session_state.get("bypass_hmac", DEFAULT_BYPASS_HMAC)):
             st.warning("Sent **unsigned** (no secret provided). Enter a secret or toggle Bypass HMAC.")
 
-        if js is None:
+        if js is None and status == "job cancelled":
+            pass  # wait_for_job already said so
+        elif js is None:
             st.error("No JSON in response. Body preview:")
-            st.code(r.text[:2000])
+            st.code(r.text[:2000] if r is not None else "")
         else:
-            st.session_state.last_response = js
+            was_delta = bool(js.get("delta"))
+            if was_delta:
+                st.caption(f"Re-transformed {len(js.get('changed_handles') or [])} edited product(s) only.")
+                js = merge_delta(last, js)
+            record_timings(js, client_spans, server_offset, delta=was_delta)
+            js = store_response(js, csv_decoded)
+            st.session_state.last_submitted = {"digest": file_digest, "strategy_json": strategy_json,
+                                               "overrides_json": overrides_json}
+    except Exception as e:
+        st.exception(e)
+
+# Resume a background job after a page reload (job id kept in the URL)
+if js is None and st.query_params.get("job_id") and st.session_state.get("run_mode") != RUN_MODE_LOCAL:
+    try:
+        job = wait_for_job(st.session_state.get("base_url", "").strip(), st.query_params["job_id"])
+        result = job.get("result")
+        if result and result.get("delta") and not st.session_state.get("last_response"):
+            st.warning("The resumed job was an incremental re-run; click **Send to Agent** for a full result.")
+        elif result:
+            js = merge_delta(st.session_state.get("last_response") or {}, result) if result.get("delta") else result
+            js = store_response(js)
     except Exception as e:
         st.exception(e)
 
@@ -281,7 +879,8 @@ def build_conversational_summary(js_obj):
     needs_override = bool(gate.get("needs_override"))
     blocking_count = int(qa.get("blocking") or 0)
     warn_count = int(qa.get("warnings") or 0)
-    issues = qa.get("issues", [])
+    # issue index counts; older responses carry only the flat list
+    counts = qa.get("counts") or Counter(i.get("code") for i in qa.get("issues") or [])
 
     messages = []
 
@@ -315,25 +914,33 @@ def build_conversational_summary(js_obj):
     if blocking_count > 0:
         messages.append(f"\n**{blocking_count} critical issue(s) found:**")
         # Categorize blocking issues
-        missing_titles = [i for i in issues if i.get('code') == 'REQ_MISSING_TITLE']
-        missing_prices = [i for i in issues if i.get('code') == 'REQ_MISSING_PRICE']
+        missing_titles = counts.get('REQ_MISSING_TITLE', 0)
+        missing_prices = counts.get('REQ_MISSING_PRICE', 0)
 
         if missing_titles:
-            messages.append(f"• {len(missing_titles)} product(s) missing titles")
+            messages.append(f"• {missing_titles} product(s) missing titles")
         if missing_prices:
-            messages.append(f"• {len(missing_prices)} variant(s) missing prices")
+            messages.append(f"• {missing_prices} variant(s) missing prices")
         messages.append("_These must be fixed before import._")
 
     # Warnings
     if warn_count > 0:
         messages.append(f"\n**{warn_count} warning(s) detected:**")
-        auto_sku = [i for i in issues if i.get('code') == 'AUTO_SKU_ASSIGNED']
-        dup_variants = [i for i in issues if i.get('code') == 'DUP_VARIANT_COMBO']
+        auto_sku = counts.get('AUTO_SKU_ASSIGNED', 0)
+        dup_variants = counts.get('DUP_VARIANT_COMBO', 0)
+        dup_values = counts.get('DUP_OPTION_VALUES', 0)
+        capped = counts.get('VARIANT_LIMIT_EXCEEDED', 0)
 
         if auto_sku:
-            messages.append(f"• {len(auto_sku)} SKU(s) auto-generated")
+            messages.append(f"• {auto_sku} SKU(s) auto-generated")
         if dup_variants:
-            messages.append(f"• {len(dup_variants)} duplicate variant combination(s)")
+            messages.append(f"• {dup_variants} duplicate variant combination(s)")
+        if dup_values:
+            messages.append(f"• {dup_values} product(s) with repeated option values (merged)")
+        if capped:
+            limit = (decision_log.get("strategy_applied") or {}).get("max_variants_per_product")
+            messages.append(f"• {capped} product(s) cut off at {limit or 'the'} variant limit "
+                            "(raise `max_variants_per_product` in the strategy or choose fewer options)")
 
     # Applied fixes
     applied = decision_log.get("overrides_applied", {}) or {}
@@ -356,15 +963,22 @@ def build_conversational_summary(js_obj):
     return "\n".join(messages)
 
 st.subheader("Assistant Summary")
-summary_msg = build_conversational_summary(js)
+summary_msg = session_view("summary", lambda: build_conversational_summary(js))
 st.markdown(summary_msg)
+llm_cache = (js.get("decision_log") or {}).get("llm_cache") or {}
+replayed = [(step, p) for step, p in llm_cache.items() if (p or {}).get("cached")]
+if replayed:
+    st.caption("AI " + " and ".join(f"{step} from the LLM cache ({p.get('age_sec') or 0}s old)"
+                                    for step, p in replayed)
+               + " · turn on **Fresh AI answers** in the sidebar to ask the model again.")
 
 # QA / Gate details
 with st.expander("QA & Gate details", expanded=False):
     st.write("**Gate**")
-    st.code(pretty_json(gate), language="json")
+    st.code(session_view("gate_json", lambda: pretty_json(gate)), language="json")
     st.write("**QA**")
-    st.code(pretty_json(qa), language="json")
+    st.code(session_view("qa_json", lambda: pretty_json(qa)), language="json")
+    render_issue_list(js)
 
 # Confirmation message after re-run with overrides
 if rerun_clicked and js:
@@ -382,43 +996,67 @@ if applied_count > 0 and not needs_override and not handles_list:
     st.success(f"All overrides applied! CSV is ready for review/download.")
     st.session_state.pop("overrides_json", None)
     st.session_state.pop("per_product_edits", None)
+    st.session_state.pop("rule_edits", None)
     try:
         _clear_override_ui_state()
     except Exception:
         pass
 
-# Preview (first 25 rows)
-def _preview_df(rows: List[Dict[str, Any]], limit: int = 25) -> pd.DataFrame:
-    try:
-        if isinstance(rows, list) and rows and isinstance(rows[0], dict):
-            return pd.DataFrame(rows[:limit])
-        return pd.DataFrame()
-    except Exception:
-        return pd.DataFrame()
-
-st.subheader("Preview (first 25 rows)")
-df_prev = _preview_df(js.get("preview_transformed") or [], 25)
-if not df_prev.empty:
-    st.dataframe(df_prev, use_container_width=True, height=400)
-else:
-    st.caption("No preview rows returned.")
-
-# Download — real bytes
-csv_b64 = files.get("shopify_csv_base64")
-if csv_b64:
-    try:
-        csv_bytes = b64decode(csv_b64)
-        fname = f"shopify_products_{time.strftime('%Y-%m-%d')}.csv"
+render_preview(js)
+
+# Download — artifact (fetched on click) or the n8n workflow's inline CSV, spilled to the blob store
+csv_meta = files.get("shopify_csv") or {}
+csv_blob = files.get("shopify_csv_blob")
+csv_parts = files.get("shopify_csv_parts") or []
+if csv_parts:
+    # split export (strategy.csv_split_mb): one button per file, each within the size limit
+    st.caption(f"CSV split into {len(csv_parts)} files for Shopify's import size limit")
+    for i, part in enumerate(csv_parts, 1):
+        if part.get("artifact_id"):
+            data = result_csv_loader(
+                {"shopify_csv": part},
+                run_mode=st.session_state.get("run_mode", RUN_MODE_WEBHOOK),
+                base_url=st.session_state.get("base_url", "").strip(),
+                timeout=int(st.session_state.get("timeout_sec", DEFAULT_TIMEOUT_SEC)),
+                store=_download_store(),
+            )
+        else:
+            data = blob_loader(part.get("blob"))
         st.download_button(
-            "Download Shopify CSV",
-            data=csv_bytes,
-            file_name=fname,
+            f"Download part {i} ({part.get('rows', 0):,} rows, ~{part.get('bytes', 0):,} bytes)",
+            data=data,
+            file_name=part.get("filename") or f"shopify_products_{time.strftime('%Y-%m-%d')}_part{i}.csv",
             mime="text/csv",
+            key=f"csv_part_{i}",
             use_container_width=True,
         )
-        st.caption(f"CSV size: ~{len(csv_bytes):,} bytes")
-    except Exception as e:
-        st.error(f"Could not decode CSV: {e}")
+elif csv_meta.get("artifact_id") or (files.get("deferred") and files.get("run_id")):
+    st.download_button(
+        "Download Shopify CSV",
+        data=result_csv_loader(
+            files,
+            run_mode=st.session_state.get("run_mode", RUN_MODE_WEBHOOK),
+            base_url=st.session_state.get("base_url", "").strip(),
+            timeout=int(st.session_state.get("timeout_sec", DEFAULT_TIMEOUT_SEC)),
+            store=_download_store(),
+        ),
+        file_name=csv_meta.get("filename") or f"shopify_products_{time.strftime('%Y-%m-%d')}.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
+    if csv_meta.get("bytes"):
+        st.caption(f"CSV size: ~{csv_meta['bytes']:,} bytes ({csv_meta.get('compressed_bytes', 0):,} compressed)")
+elif csv_blob:
+    st.download_button(
+        "Download Shopify CSV",
+        data=blob_loader(csv_blob),
+        file_name=f"shopify_products_{time.strftime('%Y-%m-%d')}.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
+    st.caption(f"CSV size: ~{csv_blob['bytes']:,} bytes")
+
+render_timings(js)
 
 # ----------------- Fixes (Agentic) Panel -----------------
 def render_overrides_panel(js_obj: dict):
@@ -426,7 +1064,7 @@ def render_overrides_panel(js_obj: dict):
     st.subheader("Overrides (per product)")
 
     # Pending changes indicator
-    has_pending_changes = bool(st.session_state.get("per_product_edits"))
+    has_pending_changes = bool(st.session_state.get("per_product_edits") or st.session_state.get("rule_edits"))
     if has_pending_changes:
         st.info("📝 You have pending changes. Click **'Apply overrides & re-run'** at the top to submit them.")
 
@@ -440,6 +1078,8 @@ def render_overrides_panel(js_obj: dict):
             fmt_title = st.checkbox("Fill missing title → 'Untitled' prefix", value=False, key="fix_title_prefix")
             sku_unique = st.checkbox("Generate unique SKUs for expanded variants", value=True, key="sku_unique",
                                      help="When a simple product is expanded into variants, generate unique SKUs for each variant instead of keeping the parent SKU")
+            split_csv = st.checkbox(f"Split CSV into files under {CSV_SPLIT_MB} MB", value=False, key="split_csv",
+                                    help="Shopify's product CSV import takes files up to 15 MB; products are never split across files")
 
         # Build strategy patch and persist as JSON string
         try:
@@ -461,45 +1101,73 @@ def render_overrides_panel(js_obj: dict):
         else:
             base["sku_generation"] = "keep_parent"
 
+        if split_csv:
+            base["csv_split_mb"] = CSV_SPLIT_MB
+        else:
+            base.pop("csv_split_mb", None)
+
         st.session_state.strategy_json = json.dumps(base)
 
-    st.caption("Pick up to 3 option dimensions per product. Overflow will be appended to Body (HTML) and stored as Metafields JSON on the first row.")
+    st.caption("Pick up to 3 option dimensions for each group of products sharing the same varying attributes. Overflow will be appended to Body (HTML) and stored as Metafields JSON on the first row.")
 
+    rule_edits = st.session_state.get("rule_edits") or {}
     per_edits = st.session_state.get("per_product_edits") or {}
-    items = js_obj.get("handles_with_overflow") or []
-
-    for item in items:
-        handle = item.get("handle")
-        title = item.get("title") or handle
-        attrs = item.get("varying_attributes") or []
-        suggested = item.get("suggested_three") or attrs[:3]
-        if not handle:
-            continue
-
+    # one rule per varying-attribute set: a bulk choice stays one entry however many products share it
+    by_set: Dict[str, List[Dict[str, Any]]] = {}
+    for item in js_obj.get("handles_with_overflow") or []:
+        if item.get("handle"):
+            sig = "|".join(local_engine.attr_set_key(item.get("varying_attributes") or []))
+            by_set.setdefault(sig, []).append(item)
+
+    for sig, group in by_set.items():
+        attrs = group[0].get("varying_attributes") or []
+        suggested = Counter(tuple(it.get("suggested_three") or attrs[:3]) for it in group).most_common(1)[0][0]
         with st.container(border=True):
-            st.markdown(f"**{title}**  \n`{handle}`")
+            st.markdown(f"**{len(group)} product(s) varying on {' / '.join(attrs)}**")
             sel = st.multiselect(
                 "Choose up to 3 option dimensions",
                 options=attrs,
-                default=suggested[:3],
+                default=list(suggested[:3]),
                 max_selections=3,
-                key=f"opt_{handle}"
+                key=f"rule_{sig}"
             )
             action = st.selectbox(
                 "Overflow action",
                 options=["append_to_body_html"],
                 index=0,
-                key=f"act_{handle}",
+                key=f"rule_act_{sig}",
                 help="Demo: overflow values are appended to Body (HTML) and written into a Metafields JSON."
             )
-            per_edits[handle] = {"chosen_options": sel, "overflow_to": action}
-
+            rule_edits[sig] = {"varying_attributes": attrs, "chosen_options": sel, "overflow_to": action}
+
+            with st.expander(f"Customize individual products ({len(group)})", expanded=False):
+                for item in group:
+                    handle = item["handle"]
+                    own = st.checkbox(f"{item.get('title') or handle} · `{handle}`", key=f"own_{handle}")
+                    if not own:
+                        per_edits.pop(handle, None)
+                        continue
+                    own_sel = st.multiselect(
+                        "Choose up to 3 option dimensions",
+                        options=attrs,
+                        default=(item.get("suggested_three") or attrs[:3])[:3],
+                        max_selections=3,
+                        key=f"opt_{handle}"
+                    )
+                    per_edits[handle] = {"chosen_options": own_sel, "overflow_to": action}
+
+    st.session_state.rule_edits = rule_edits
     st.session_state.per_product_edits = per_edits
 
-    # Build overrides_json from edits
-    if per_edits:
-        payload = {"per_product": per_edits}
-        st.session_state.overrides_json = json.dumps(payload, ensure_ascii=False)
+    # Build overrides_json from edits: rules for the groups, per_product only for the exceptions
+    rules = [rule for rule in rule_edits.values() if rule["chosen_options"]]
+    if rules or per_edits:
+        payload: Dict[str, Any] = {}
+        if rules:
+            payload["rules"] = rules
+        if per_edits:
+            payload["per_product"] = per_edits
+        st.session_state.overrides_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
 
     st.caption("⚠️ Changes are staged locally. Click **'Apply overrides & re-run'** button at the top to submit them to the workflow.")
 
@@ -509,7 +1177,10 @@ if needs_override or handles_list:
 
 # Footer debug
 with st.expander("Raw JSON response", expanded=False):
-    st.code(pretty_json(js), language="json")
+    st.code(session_view("raw_json", lambda: pretty_json(js)), language="json")
 with st.expander("Session (debug)", expanded=False):
-    dbg = {k: (v if k not in ("stored_file_bytes",) else f"<{len(v)} bytes>") for k, v in st.session_state.items()}
-    st.code(pretty_json(dbg), language="json")
+    views_stats, blobs = _views().stats(), _blob_store().stats()
+    st.caption(f"Session memory ~{int(st.session_state.get('last_response_bytes') or 0) + views_stats['bytes']:,} "
+               f"of {SESSION_BUDGET_MB << 20:,} bytes (response + {views_stats['entries']} cached views) · "
+               f"blob store {blobs['entries']} file(s), {blobs['bytes']:,} bytes on disk")
+    st.code(pretty_json(session_debug()), language="json")
@@ -0,0 +1,225 @@
+# artifact_store.py
+# Compressed result files (the Shopify CSV) kept on disk and handed out by id
+# - Written gzip-compressed in chunks; responses carry only {artifact_id, bytes, compressed_bytes, ...}
+# - Served as-is (content-encoding: gzip) by local_server; readers decompress while streaming
+# - Files live under MC_ARTIFACT_DIR (default: <tmp>/migration_copilot_artifacts), one subdirectory
+#   per consumer (consumer_root: "server", "batch", "app", "downloads"; "engine" for library use),
+#   so one consumer's bounds never delete another's results
+# - Bounded by count and bytes across processes: every registration lists its directory (which
+#   restarts and other instances of the same consumer share) and deletes the least recently
+#   written / served .gz files past max_items or max_bytes (MC_ARTIFACT_MAX_MB); the newest always stays
+# - Files this process did not register are left alone until they are MIN_AGE_SEC old
+#   (MC_ARTIFACT_MIN_AGE_SEC), so a second instance never evicts a run the first is still serving
+# - Stale .part files (writers that died mid-way) are removed after STALE_PART_SEC
+# - writer(): incremental writes (a CSV produced block by block, several files in one pass)
+
+import os
+import re
+import time
+import gzip
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Iterable, Optional
+
+DEFAULT_MAX_ITEMS = 32
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+STALE_PART_SEC = 3600
+DEFAULT_MIN_AGE_SEC = 600
+WRITE_CHUNK_CHARS = 1 << 20
+ARTIFACT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def default_root() -> str:
+    return os.getenv("MC_ARTIFACT_DIR") or os.path.join(tempfile.gettempdir(), "migration_copilot_artifacts")
+
+def consumer_root(consumer: str) -> str:
+    return os.path.join(default_root(), consumer)
+
+def default_min_age() -> float:
+    return float(os.getenv("MC_ARTIFACT_MIN_AGE_SEC") or DEFAULT_MIN_AGE_SEC)
+
+def default_max_bytes() -> int:
+    mb = os.getenv("MC_ARTIFACT_MAX_MB")
+    return int(float(mb) * 1024 * 1024) if mb else DEFAULT_MAX_BYTES
+
+class ArtifactStore:
+    """Thread-safe store of gzip files keyed by artifact id, bounded by count and bytes on disk."""
+
+    def __init__(self, root: Optional[str] = None, max_items: int = DEFAULT_MAX_ITEMS,
+                 max_bytes: Optional[int] = None, min_age: Optional[float] = None):
+        self.root = root or default_root()
+        self.max_items = int(max_items)
+        self.max_bytes = int(max_bytes) if max_bytes is not None else default_max_bytes()
+        self.min_age = float(min_age) if min_age is not None else default_min_age()
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, artifact_id: str) -> Optional[str]:
+        if not ARTIFACT_ID_RE.match(artifact_id or ""):
+            return None
+        return os.path.join(self.root, artifact_id + ".gz")
+
+    def meta(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(artifact_id)
+            if item is not None:
+                self._items.move_to_end(artifact_id)
+        if item is not None and os.path.exists(item["_path"]):
+            return {k: v for k, v in item.items() if not k.startswith("_")}
+        return None
+
+    def write_text(self, text: str, filename: str, mime: str = "text/csv", artifact_id: Optional[str] = None) -> Dict[str, Any]:
+        """gzip `text` (utf-8) to disk without building a second full-size bytes copy."""
+        def chunks():
+            for i in range(0, len(text), WRITE_CHUNK_CHARS):
+                yield text[i:i + WRITE_CHUNK_CHARS].encode("utf-8")
+        return self.write_chunks(chunks(), filename, mime, artifact_id)
+
+    def write_chunks(self, chunks: Iterable[bytes], filename: str, mime: str = "text/csv",
+                     artifact_id: Optional[str] = None) -> Dict[str, Any]:
+        w = self.writer(filename, mime, artifact_id)
+        try:
+            for chunk in chunks:
+                w.write(chunk)
+        except BaseException:
+            w.abort()
+            raise
+        return w.close()
+
+    def writer(self, filename: str, mime: str = "text/csv", artifact_id: Optional[str] = None) -> "ArtifactWriter":
+        """Open a new artifact for incremental writes; close() registers it and returns its metadata."""
+        artifact_id = artifact_id or uuid.uuid4().hex
+        path = self.path(artifact_id)
+        if path is None:
+            raise ValueError(f"invalid artifact id: {artifact_id!r}")
+        os.makedirs(self.root, exist_ok=True)
+        return ArtifactWriter(self, artifact_id, path, filename, mime)
+
+    def write_compressed(self, stream: Iterable[bytes], filename: str, size: int, mime: str = "text/csv",
+                         artifact_id: Optional[str] = None) -> Dict[str, Any]:
+        """Store an already-gzipped stream (e.g. a download from local_server) unchanged."""
+        artifact_id = artifact_id or uuid.uuid4().hex
+        path = self.path(artifact_id)
+        if path is None:
+            raise ValueError(f"invalid artifact id: {artifact_id!r}")
+        os.makedirs(self.root, exist_ok=True)
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            for chunk in stream:
+                f.write(chunk)
+        os.replace(tmp, path)
+        return self._register(artifact_id, path, filename, mime, size)
+
+    def _register(self, artifact_id: str, path: str, filename: str, mime: str, size: int) -> Dict[str, Any]:
+        item = {
+            "artifact_id": artifact_id,
+            "filename": filename,
+            "mime": mime,
+            "encoding": "gzip",
+            "bytes": int(size),
+            "compressed_bytes": os.path.getsize(path),
+            "_path": path,
+        }
+        with self._lock:
+            self._items.pop(artifact_id, None)
+            self._items[artifact_id] = item
+        self.evict(keep=path)
+        return {k: v for k, v in item.items() if not k.startswith("_")}
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Apply the bounds to the directory itself, oldest mtime first; returns the number deleted.
+
+        Works from a listing, not from this process's registry, so files written by other
+        processes (or before a restart) are bounded too. `keep` (the file just written) stays, and
+        so does any file another process wrote less than `min_age` seconds ago.
+        """
+        now = time.time()
+        with self._lock:
+            own = {it["_path"] for it in self._items.values()}
+        files = []
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return 0
+        for e in entries:
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            if e.name.endswith(".part"):
+                if now - st.st_mtime > STALE_PART_SEC:
+                    self._remove(e.path)
+            elif e.name.endswith(".gz") and e.is_file():
+                files.append((st.st_mtime, st.st_size, e.path))
+        files.sort(reverse=True)
+        kept = total = removed = 0
+        for mtime, size, path in files:
+            if path == keep or (kept < self.max_items and total + size <= self.max_bytes):
+                kept += 1
+                total += size
+                continue
+            if path not in own and now - mtime < self.min_age:
+                continue
+            if self._remove(path):
+                removed += 1
+        if removed:
+            with self._lock:
+                for aid in [a for a, it in self._items.items() if not os.path.exists(it["_path"])]:
+                    del self._items[aid]
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def open(self, artifact_id: str) -> Optional[BinaryIO]:
+        """Decompressing reader over the stored artifact (None if unknown or evicted)."""
+        if self.meta(artifact_id) is None:
+            return None
+        path = self.path(artifact_id)
+        try:
+            os.utime(path)  # served → recently used for the mtime-ordered eviction
+        except OSError:
+            pass
+        return gzip.open(path, "rb")
+
+    def read_bytes(self, artifact_id: str) -> Optional[bytes]:
+        f = self.open(artifact_id)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+class ArtifactWriter:
+    """gzip writer for one artifact; visible in the store only after close()."""
+
+    def __init__(self, store: ArtifactStore, artifact_id: str, path: str, filename: str, mime: str):
+        self._store = store
+        self.artifact_id = artifact_id
+        self._path = path
+        self._filename = filename
+        self._mime = mime
+        self._tmp = path + ".part"
+        self._f = gzip.open(self._tmp, "wb", compresslevel=6)
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._f.write(chunk)
+        self.size += len(chunk)
+
+    def close(self) -> Dict[str, Any]:
+        self._f.close()
+        os.replace(self._tmp, self._path)
+        return self._store._register(self.artifact_id, self._path, self._filename, self._mime, self.size)
+
+    def abort(self) -> None:
+        self._f.close()
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
@@ -0,0 +1,274 @@
+# batch_migrate.py
+# Headless bulk migration: a directory / glob of source CSVs → Shopify CSVs + per-file JSON reports
+# - Same request contract and HMAC signing as the Streamlit app (webhook_client.py)
+# - Bounded worker pool over one shared keep-alive session; retries with exponential backoff
+# - --local runs local_engine in worker processes instead of calling the webhook
+# - Prints aggregate throughput (rows/sec, files/min) and writes batch_summary.json
+# - Split exports (strategy.csv_split_mb) are saved as <name>.shopify.part1.csv, part2, ...
+# - --bypass-llm-cache: the workflow calls the model even when its LLM cache has an answer
+#
+# Usage:
+#   python batch_migrate.py exports/ --out out/ --base-url http://localhost:5678 --workers 8
+#   python batch_migrate.py "exports/*.csv" --out out/ --strategy strategy.json --overrides overrides.json --local
+
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import random
+import shutil
+import argparse
+from base64 import b64decode
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from webhook_client import make_session, post_catalog, read_hashed
+
+DEFAULT_WEBHOOK_PATH = "/webhook/migrate_v1"
+DEFAULT_TIMEOUT_SEC = 120
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_SESSION: Optional[requests.Session] = None  # shared by worker threads in webhook mode
+
+class RetryableError(Exception):
+    pass
+
+# -------------------------- Inputs ------------------------------
+def expand_inputs(specs: List[str]) -> List[str]:
+    """Directories (→ *.csv inside), globs and plain paths, de-duplicated in order."""
+    paths: List[str] = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            paths.extend(sorted(glob.glob(os.path.join(spec, "*.csv"))))
+        elif any(ch in spec for ch in "*?["):
+            paths.extend(sorted(glob.glob(spec)))
+        else:
+            paths.append(spec)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def output_names(paths: List[str]) -> Dict[str, str]:
+    """Unique output stem per input (same file name in two folders → name-2)."""
+    names: Dict[str, str] = {}
+    used = set()
+    for p in paths:
+        stem = os.path.splitext(os.path.basename(p))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}"
+        used.add(name)
+        names[p] = name
+    return names
+
+def read_json_file(path: Optional[str]) -> str:
+    """Validated, compact JSON string from a file ('' when not given)."""
+    if not path:
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.dumps(json.load(f), ensure_ascii=False, separators=(",", ":"))
+
+# -------------------------- Export ------------------------------
+def save_export(js: Dict[str, Any], out_csv: str, cfg: Dict[str, Any]) -> List[str]:
+    """Write the response's Shopify CSV to out_csv; a split export (files.shopify_csv_parts)
+    becomes <name>.part1.csv, <name>.part2.csv, ... Returns the paths written."""
+    files = js.get("files") or {}
+    parts = files.get("shopify_csv_parts") or []
+    if not parts:
+        _save_file(files.get("shopify_csv") or {}, files.get("shopify_csv_base64"), out_csv, cfg)
+        return [out_csv]
+    stem = out_csv[:-len(".csv")] if out_csv.endswith(".csv") else out_csv
+    paths = []
+    for n, part in enumerate(parts, 1):
+        path = f"{stem}.part{n}.csv"
+        _save_file(part if part.get("artifact_id") else {}, part.get("base64"), path, cfg)
+        paths.append(path)
+    return paths
+
+def _save_file(meta: Dict[str, Any], csv_b64: Optional[str], out_csv: str, cfg: Dict[str, Any]) -> None:
+    tmp = out_csv + ".part"
+    if meta.get("artifact_id") and cfg["local"]:
+        import local_engine
+        src = local_engine.ARTIFACTS.open(meta["artifact_id"])
+        if src is None:
+            raise RuntimeError("artifact_missing")
+        with src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 16)
+    elif meta.get("artifact_id"):
+        url = cfg["base_url"].rstrip("/") + "/" + cfg["path"].strip("/") + "/artifacts/" + meta["artifact_id"]
+        with _SESSION.get(url, stream=True, timeout=cfg["timeout"]) as r:
+            if r.status_code in RETRY_STATUSES:
+                raise RetryableError(f"HTTP {r.status_code} on artifact download")
+            r.raise_for_status()
+            with open(tmp, "wb") as dst:
+                if r.headers.get("content-encoding") == "gzip":
+                    with gzip.GzipFile(fileobj=r.raw) as src:
+                        shutil.copyfileobj(src, dst, 1 << 16)
+                else:
+                    shutil.copyfileobj(r.raw, dst, 1 << 16)
+    elif csv_b64:
+        with open(tmp, "wb") as dst:
+            dst.write(b64decode(csv_b64))
+    else:
+        raise RuntimeError("response_has_no_csv")
+    os.replace(tmp, out_csv)
+
+# -------------------------- Worker ------------------------------
+def _attempt(file_path: str, file_bytes: bytes, digest: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    if cfg["local"]:
+        import local_engine
+        return local_engine.run_local(file_bytes, cfg["strict_mode"], cfg["strategy_json"], cfg["overrides_json"])
+    _, request_id, r = post_catalog(
+        _SESSION, cfg["base_url"], cfg["path"], os.path.basename(file_path), file_bytes,
+        cfg["strict_mode"], cfg["strategy_json"], cfg["overrides_json"],
+        secret=cfg["secret"], timeout=cfg["timeout"], file_digest=digest,
+        llm_cache="bypass" if cfg.get("bypass_llm_cache") else "",
+    )
+    if r.status_code in RETRY_STATUSES:
+        raise RetryableError(f"HTTP {r.status_code}")
+    try:
+        js = r.json()
+    except ValueError:
+        raise RuntimeError(f"HTTP {r.status_code}: no JSON in response ({r.text[:200]!r})")
+    if r.status_code >= 400 or not isinstance(js, dict):
+        raise RuntimeError(f"HTTP {r.status_code}: {js.get('error') if isinstance(js, dict) else js}")
+    js.setdefault("request_id", request_id)
+    return js
+
+def migrate_one(file_path: str, out_name: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Transform one catalog (with retries), save its export and JSON report; returns the report."""
+    t0 = time.perf_counter()
+    report: Dict[str, Any] = {"file": file_path, "ok": False, "attempts": 0}
+    out_csv = os.path.join(cfg["out_dir"], out_name + ".shopify.csv")
+    try:
+        file_bytes, digest = read_hashed(file_path)
+        report.update(file_digest=digest, bytes_in=len(file_bytes))
+        for attempt in range(1, cfg["retries"] + 2):
+            report["attempts"] = attempt
+            try:
+                js = _attempt(file_path, file_bytes, digest, cfg)
+                out_paths = save_export(js, out_csv, cfg)
+                break
+            except (RetryableError, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if attempt > cfg["retries"]:
+                    raise
+                delay = cfg["backoff"] * (2 ** (attempt - 1)) * (1 + 0.25 * random.random())
+                report.setdefault("retries", []).append({"error": str(e), "sleep_sec": round(delay, 2)})
+                time.sleep(delay)
+        qa = js.get("qa") or {}
+        meta = (js.get("decision_log") or {}).get("meta") or {}
+        report.update(
+            ok=True,
+            request_id=js.get("request_id"),
+            output_csv=out_paths[0],
+            bytes_out=sum(os.path.getsize(p) for p in out_paths),
+            rows_in=int(meta.get("row_count") or 0),
+            qa={"blocking": qa.get("blocking", 0), "warnings": qa.get("warnings", 0)},
+            gate=js.get("gate") or {},
+            handles_with_overflow=[h.get("handle") for h in js.get("handles_with_overflow") or []],
+        )
+        if len(out_paths) > 1:
+            report["output_parts"] = out_paths
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    with open(os.path.join(cfg["out_dir"], out_name + ".report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+# --------------------------- Main -------------------------------
+def run_batch(paths: List[str], cfg: Dict[str, Any], workers: int) -> Dict[str, Any]:
+    global _SESSION
+    os.makedirs(cfg["out_dir"], exist_ok=True)
+    names = output_names(paths)
+    if cfg["local"]:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        _SESSION = make_session(pool_size=workers)
+        pool = ThreadPoolExecutor(max_workers=workers)
+    reports = []
+    t0 = time.perf_counter()
+    with pool:
+        futures = [pool.submit(migrate_one, p, names[p], cfg) for p in paths]
+        for fut in as_completed(futures):
+            rep = fut.result()
+            reports.append(rep)
+            status = "ok " if rep["ok"] else "ERR"
+            detail = (f"{rep.get('rows_in', 0):>8,} rows  blocking={rep['qa']['blocking']}"
+                      if rep["ok"] else rep.get("error", ""))
+            print(f"[{status}] {os.path.basename(rep['file'])}  {rep['seconds']:.2f}s  "
+                  f"attempts={rep['attempts']}  {detail}", flush=True)
+    elapsed = time.perf_counter() - t0
+    ok = [r for r in reports if r["ok"]]
+    rows = sum(r.get("rows_in", 0) for r in ok)
+    summary = {
+        "files": len(reports),
+        "ok": len(ok),
+        "failed": len(reports) - len(ok),
+        "rows": rows,
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "files_per_min": round(len(ok) * 60 / elapsed, 2) if elapsed else 0.0,
+        "workers": workers,
+        "mode": "local" if cfg["local"] else cfg["base_url"],
+        "inputs": sorted(r["file"] for r in reports),
+    }
+    with open(os.path.join(cfg["out_dir"], "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Migrate a directory or glob of catalog CSVs to Shopify CSVs")
+    ap.add_argument("inputs", nargs="+", help="CSV files, directories (*.csv inside) or glob patterns")
+    ap.add_argument("--out", required=True, help="Output directory for exports and reports")
+    ap.add_argument("--strategy", help="Strategy JSON file (same shape as strategy_json)")
+    ap.add_argument("--overrides", help="Overrides JSON file (same shape as overrides_json)")
+    ap.add_argument("--strict", action="store_true", help="Strict mode (gate blocks on errors)")
+    ap.add_argument("--base-url", default=os.getenv("N8N_BASE_URL", ""), help="Webhook base URL (env N8N_BASE_URL)")
+    ap.add_argument("--path", default=DEFAULT_WEBHOOK_PATH)
+    ap.add_argument("--local", action="store_true", help="Run local_engine in-process (no webhook)")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--backoff", type=float, default=1.0, help="First retry delay in seconds (doubles each retry)")
+    ap.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT_SEC)
+    ap.add_argument("--secret", default=os.getenv("MW_HMAC_SECRET", ""), help="HMAC secret (env MW_HMAC_SECRET)")
+    ap.add_argument("--no-sign", action="store_true", help="Send unsigned even if a secret is set")
+    ap.add_argument("--bypass-llm-cache", action="store_true",
+                    help="Have the workflow call the model instead of reusing cached mapping/plan answers")
+    args = ap.parse_args(argv)
+
+    if not args.local and not args.base_url:
+        ap.error("--base-url (or N8N_BASE_URL) is required unless --local is given")
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        ap.error("no input CSVs matched")
+    if args.local:
+        import local_engine
+        local_engine.use_artifacts("batch")
+    cfg = {
+        "out_dir": os.path.abspath(args.out),
+        "strategy_json": read_json_file(args.strategy),
+        "overrides_json": read_json_file(args.overrides),
+        "strict_mode": bool(args.strict),
+        "base_url": args.base_url,
+        "path": args.path,
+        "local": bool(args.local),
+        "retries": max(0, args.retries),
+        "backoff": max(0.0, args.backoff),
+        "timeout": args.timeout,
+        "secret": "" if args.no_sign else args.secret,
+        "bypass_llm_cache": bool(args.bypass_llm_cache),
+    }
+    workers = max(1, args.workers)
+    print(f"Migrating {len(paths)} file(s) with {workers} worker(s) → {cfg['out_dir']}", flush=True)
+    summary = run_batch(paths, cfg, workers)
+    print(f"\n{summary['ok']}/{summary['files']} ok  {summary['rows']:,} rows in {summary['elapsed_sec']:.2f}s  "
+          f"→ {summary['rows_per_sec']:,.0f} rows/sec, {summary['files_per_min']:.1f} files/min")
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
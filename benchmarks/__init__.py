@@ -0,0 +1,2 @@
+# benchmarks
+# Synthetic catalog generator (generator.py) and end-to-end benchmark harness (run.py)
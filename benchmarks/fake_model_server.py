@@ -0,0 +1,160 @@
+# benchmarks/fake_model_server.py
+# Offline stand-in for the chat models behind the workflow's AI Agent and Agent Plan nodes
+# - Gemini generateContent / streamGenerateContent (point the n8n "Google Gemini(PaLM) Api" credential's
+#   Host at http://127.0.0.1:<port>) and OpenAI-style /v1/chat/completions
+# - Deterministic answers after a fixed --latency-ms: the mapping prompt gets local_engine.suggest_mapping
+#   for its headers, the plan prompt a canned plan; anything else gets "{}"
+# - GET /stats: calls per kind (what the LLM cache tests count); POST /reset zeroes them
+#
+# Usage: python -m benchmarks.fake_model_server --port 8765 --latency-ms 1500
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import REPO_ROOT
+
+sys.path.insert(0, REPO_ROOT)
+import local_engine  # noqa: E402
+
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY_MS = 1500
+MODEL_VERSION = "fake-model-1"
+
+PLAN = {
+    "fix_missing_price": "zero",
+    "option_priority": ["Color", "Size", "Material"],
+    "notes": ["Canned plan from the fake model server"],
+    "confidence": 0.5,
+}
+_HEADERS_RE = re.compile(r"Headers JSON \(string\):\s*(\[.*?\])\s*$", re.M)
+
+def answer(prompt: str) -> Dict[str, Any]:
+    """Prompt text → {kind, text}: the answer the real model is asked for, in the shape it is asked for."""
+    m = _HEADERS_RE.search(prompt)
+    if m:
+        try:
+            headers = [str(h) for h in json.loads(m.group(1))]
+        except ValueError:
+            headers = []
+        return {"kind": "mapping", "text": json.dumps(dict(local_engine.suggest_mapping(headers), notes=[]))}
+    if "mapping_template:" in prompt:
+        return {"kind": "plan", "text": json.dumps(PLAN)}
+    return {"kind": "other", "text": "{}"}
+
+def _gemini_prompt(req: Dict[str, Any]) -> str:
+    parts: List[str] = []
+    for block in [req.get("systemInstruction") or {}] + list(req.get("contents") or []):
+        parts.extend(str(p.get("text", "")) for p in (block.get("parts") or []) if isinstance(p, dict))
+    return "\n".join(parts)
+
+def _openai_prompt(req: Dict[str, Any]) -> str:
+    out = []
+    for msg in req.get("messages") or []:
+        content = msg.get("content")
+        if isinstance(content, list):
+            content = "\n".join(str(c.get("text", "")) for c in content if isinstance(c, dict))
+        out.append(str(content or ""))
+    return "\n".join(out)
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    server_version = "FakeModel/1.0"
+    latency_ms = DEFAULT_LATENCY_MS
+    calls: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        if os.getenv("MC_SERVER_QUIET") != "1":
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, obj: Any) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json; charset=utf-8")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _count(self, kind: str) -> None:
+        with self.lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] == "/stats":
+            with self.lock:
+                calls = dict(self.calls)
+            self._send_json(200, {"calls": sum(calls.values()), "by_kind": calls, "latency_ms": self.latency_ms})
+        else:
+            self._send_json(404, {"error": "not_found"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("content-length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": "bad_json"})
+        path = self.path.split("?")[0]
+        if path == "/reset":
+            with self.lock:
+                self.calls.clear()
+            return self._send_json(200, {"ok": True})
+        if path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            ans = answer(_gemini_prompt(req))
+            body = {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": ans["text"]}]},
+                                "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+                "modelVersion": MODEL_VERSION,
+            }
+        elif path.endswith("/chat/completions"):
+            ans = answer(_openai_prompt(req))
+            body = {
+                "id": f"fake-{time.time_ns()}", "object": "chat.completion", "created": int(time.time()),
+                "model": req.get("model") or MODEL_VERSION,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": ans["text"]}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        else:
+            return self._send_json(404, {"error": "not_found"})
+        self._count(ans["kind"])
+        time.sleep(self.latency_ms / 1000)
+        if path.endswith(":streamGenerateContent") and "alt=sse" in self.path:
+            data = f"data: {json.dumps(body)}\r\n\r\n".encode("utf-8")
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif path.endswith(":streamGenerateContent"):
+            self._send_json(200, [body])
+        else:
+            self._send_json(200, body)
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+          latency_ms: int = DEFAULT_LATENCY_MS) -> ThreadingHTTPServer:
+    handler = type("Handler", (FakeModelHandler,), {"latency_ms": latency_ms, "calls": {}})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Fake Gemini / OpenAI chat model for offline workflow runs")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--latency-ms", type=int, default=DEFAULT_LATENCY_MS)
+    args = ap.parse_args(argv)
+    httpd = serve(args.host, args.port, args.latency_ms)
+    print(f"Fake model on http://{args.host}:{args.port} ({args.latency_ms} ms per call)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# benchmarks/generator.py
+# Deterministic WooCommerce-style catalog generator for benchmarks
+# - Same seed + knobs → byte-identical CSV
+# - Knobs: total rows, variable-product share, variations per parent, pipe-delimited attribute
+#   values on simple products, products with >3 option dimensions, missing price/title rates,
+#   variations without a Parent reference (matched to their parent by name root)
+# - Streams rows, so 500k-row catalogs never sit in memory as Python dicts
+
+import io
+import csv
+import random
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List
+
+MAX_ATTRS = 5
+HEADERS = (
+    ["ID", "Type", "SKU", "Name", "Parent", "Regular price", "Sale price", "Stock", "Images",
+     "Description", "Tags"]
+    + [f"Attribute {i} {kind}" for i in range(1, MAX_ATTRS + 1) for kind in ("name", "value(s)")]
+)
+
+ATTRIBUTE_POOL = [
+    ("Color", ["Red", "Blue", "Green", "Black", "White", "Navy", "Grey", "Olive"]),
+    ("Size", ["XS", "S", "M", "L", "XL", "XXL"]),
+    ("Material", ["Cotton", "Wool", "Linen", "Silk"]),
+    ("Style", ["Classic", "Slim", "Relaxed"]),
+    ("Pattern", ["Plain", "Striped", "Checked"]),
+]
+
+@dataclass
+class CatalogSpec:
+    rows: int = 1000
+    seed: int = 42
+    variable_ratio: float = 0.4       # share of products that are variable (parent + variations)
+    variations_per_parent: int = 6    # mean variations per variable product
+    pipe_ratio: float = 0.3           # share of simple products with pipe-delimited attribute values
+    wide_products: int = 10           # products with more than 3 option dimensions
+    missing_price_rate: float = 0.02
+    missing_title_rate: float = 0.01
+    missing_parent_rate: float = 0.0  # share of variations with a blank Parent column
+    images_per_product: int = 2
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def _attrs(rnd: random.Random, dims: int) -> List[tuple]:
+    picks = ATTRIBUTE_POOL[:dims] if dims > 3 else rnd.sample(ATTRIBUTE_POOL[:3], dims)
+    return [(name, rnd.sample(values, rnd.randint(2, min(4, len(values))))) for name, values in picks]
+
+def _price(rnd: random.Random, spec: CatalogSpec) -> str:
+    if rnd.random() < spec.missing_price_rate:
+        return ""
+    return f"{rnd.randint(5, 199)}.{rnd.choice(['00', '50', '95', '99'])}"
+
+def iter_rows(spec: CatalogSpec) -> Iterator[Dict[str, str]]:
+    """Rows until spec.rows is reached (the last product may be cut short, as in real exports)."""
+    rnd = random.Random(spec.seed)
+    emitted = 0
+    next_id = 1
+    product = 0
+    wide_left = spec.wide_products
+    # spread the wide products across the catalog instead of bunching them at the start
+    wide_every = max(1, spec.rows // (spec.variations_per_parent + 2) // max(1, spec.wide_products))
+
+    def row(**kw) -> Dict[str, str]:
+        nonlocal next_id
+        r = {h: "" for h in HEADERS}
+        r["ID"] = str(next_id)
+        next_id += 1
+        r.update(kw)
+        return r
+
+    while emitted < spec.rows:
+        product += 1
+        wide = wide_left > 0 and product % wide_every == 0
+        dims = rnd.randint(4, MAX_ATTRS) if wide else rnd.randint(1, 3)
+        if wide:
+            wide_left -= 1
+        attrs = _attrs(rnd, dims)
+        sku = f"P{product:07d}"
+        title = "" if rnd.random() < spec.missing_title_rate else f"Product {product} {attrs[0][1][0]}"
+        images = ", ".join(f"https://cdn.example.com/p{product}/{k}.jpg" for k in range(spec.images_per_product))
+        attr_cols: Dict[str, str] = {}
+
+        if rnd.random() < spec.variable_ratio:
+            for i, (name, values) in enumerate(attrs, 1):
+                attr_cols[f"Attribute {i} name"] = name
+                attr_cols[f"Attribute {i} value(s)"] = "|".join(values)
+            yield row(Type="variable", SKU=sku, Name=title, Images=images,
+                      Description=f"<p>Description for product {product}</p>", Tags="bench,generated",
+                      **attr_cols)
+            emitted += 1
+            n_var = max(1, int(rnd.gauss(spec.variations_per_parent, spec.variations_per_parent / 3)))
+            for v in range(n_var):
+                if emitted >= spec.rows:
+                    break
+                var_cols = {}
+                for i, (name, values) in enumerate(attrs, 1):
+                    var_cols[f"Attribute {i} name"] = name
+                    var_cols[f"Attribute {i} value(s)"] = rnd.choice(values)
+                orphan = spec.missing_parent_rate and rnd.random() < spec.missing_parent_rate
+                yield row(Type="variation", SKU=f"{sku}-{v + 1}", Name=f"{title}-{v + 1}" if title else "",
+                          Parent="" if orphan else sku, **{"Regular price": _price(rnd, spec)},
+                          **{"Sale price": rnd.choice(["", "", "", "4.99"])},
+                          Stock=str(rnd.randint(0, 50)), **var_cols)
+                emitted += 1
+        else:
+            pipes = wide or rnd.random() < spec.pipe_ratio
+            for i, (name, values) in enumerate(attrs, 1):
+                attr_cols[f"Attribute {i} name"] = name
+                attr_cols[f"Attribute {i} value(s)"] = "|".join(values) if pipes else values[0]
+            yield row(Type="simple", SKU=sku, Name=title, Images=images,
+                      Description=f"<p>Description for product {product}</p>", Tags="bench,generated",
+                      Stock=str(rnd.randint(0, 50)), **{"Regular price": _price(rnd, spec)}, **attr_cols)
+            emitted += 1
+
+def write_csv(spec: CatalogSpec, fh: io.TextIOBase) -> int:
+    writer = csv.DictWriter(fh, fieldnames=HEADERS, lineterminator="\n")
+    writer.writeheader()
+    n = 0
+    for r in iter_rows(spec):
+        writer.writerow(r)
+        n += 1
+    return n
+
+def generate_bytes(spec: CatalogSpec) -> bytes:
+    buf = io.StringIO()
+    write_csv(spec, buf)
+    return buf.getvalue().encode("utf-8")
+
+def generate_file(spec: CatalogSpec, path: str) -> int:
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        return write_csv(spec, fh)
@@ -0,0 +1,124 @@
+# benchmarks/llm_cache.py
+# Offline check + timing of the workflow's LLM response cache (LLM Cache: Mapping / Plan nodes)
+# - Starts benchmarks/fake_model_server.py in-process (fixed --latency-ms per model call) and runs the
+#   mapping + plan path of the workflow under node (benchmarks/node_llm_cache.js) against it
+# - Scenarios on one generated catalog, one cache file (MC_LLM_CACHE_PATH):
+#     cold → repeat → overrides that apply nothing → other strategy (plan only) → repeat →
+#     other sample rows → llm_cache=bypass → TTL expired
+#   each with the model calls it must make; any difference makes the exit status 1, as does a run
+#   with no model call that rewrote the cache file (lookups never write it)
+# - Writes JSON with per-run wall ms, model ms and the decision_log.llm_cache provenance
+#
+# Usage: python -m benchmarks.llm_cache --rows 500 --latency-ms 1500
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generator import CatalogSpec, generate_bytes
+from benchmarks.run import REPO_ROOT, _git_rev
+from benchmarks import fake_model_server
+
+HARNESS = os.path.join(REPO_ROOT, "benchmarks", "node_llm_cache.js")
+
+def sync_item(spec: CatalogSpec, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Generated catalog → the Sync: CSV + Webhook item the mapping path starts from."""
+    reader = csv.reader(generate_bytes(spec).decode("utf-8").splitlines())
+    headers = next(reader, [])
+    return {"headers": headers, "rows": list(reader), "context": context}
+
+def run_path(item: Dict[str, Any], work: str, model_url: str, env: Dict[str, str]) -> Dict[str, Any]:
+    path = os.path.join(work, "input.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(item, f)
+    t = time.perf_counter()
+    proc = subprocess.run(["node", HARNESS, path, "--model-url", model_url], capture_output=True, text=True,
+                          env={**os.environ, **env}, check=True)
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["wall_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    return out
+
+def file_stamp(path: str) -> Optional[int]:
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="LLM response cache check against a fake model (offline)")
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--latency-ms", type=int, default=1500, help="fake model latency per call")
+    ap.add_argument("--out", default="llm_cache_results.json")
+    args = ap.parse_args(argv)
+
+    if shutil.which("node") is None:
+        print("node not found on PATH", file=sys.stderr)
+        return 2
+    os.environ.setdefault("MC_SERVER_QUIET", "1")
+    httpd = fake_model_server.serve("127.0.0.1", 0, args.latency_ms)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    model_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    work = tempfile.mkdtemp(prefix="mc_llm_cache_")
+    env = {"MC_LLM_CACHE_PATH": os.path.join(work, "llm_cache.json")}
+
+    spec = CatalogSpec(rows=args.rows)
+    settings = {"strategy_json": json.dumps({"fix_missing_price": "skip"}), "overrides_json": ""}
+    base = sync_item(spec, settings)
+    reseeded = sync_item(CatalogSpec(rows=args.rows, seed=spec.seed + 1), settings)
+    overrides = {"per_product": {"no-such-handle": {"chosen_options": ["Size"]}}}
+    noop_overrides = dict(base, context=dict(settings, overrides_json=json.dumps(overrides)))
+    other_strategy = dict(base, context=dict(settings, strategy_json=json.dumps({"fix_missing_price": "zero"})))
+    # (name, item, extra env, sleep before, model calls expected)
+    scenarios = [
+        ("cold", base, {}, 0, 2),
+        ("repeat", base, {}, 0, 0),
+        ("no-op overrides", noop_overrides, {}, 0, 0),
+        ("other strategy", other_strategy, {}, 0, 1),
+        ("repeat strategy", other_strategy, {}, 0, 0),
+        ("other sample rows", reseeded, {}, 0, 2),
+        ("bypass", dict(base, context=dict(settings, llm_cache="bypass")), {}, 0, 2),
+        ("after bypass", base, {}, 0, 0),
+        ("ttl expired", base, {"MC_LLM_CACHE_TTL_SEC": "1"}, 1.2, 2),
+    ]
+    results, all_ok = [], True
+    try:
+        for name, item, extra, sleep, expected in scenarios:
+            time.sleep(sleep)
+            before = file_stamp(env["MC_LLM_CACHE_PATH"])
+            run = run_path(item, work, model_url, {**env, **extra})
+            run["file_written"] = file_stamp(env["MC_LLM_CACHE_PATH"]) != before
+            ok = run["model_calls"] == expected and (expected > 0 or not run["file_written"])
+            all_ok &= ok
+            results.append({"scenario": name, "expected_model_calls": expected, "ok": ok, **run})
+            prov = run.get("decision_log_llm_cache") or {}
+            cached = "/".join("cache" if (prov.get(k) or {}).get("cached") else "model" for k in ("mapping", "plan"))
+            print(f"{name:<18} model calls {run['model_calls']} (expected {expected})  "
+                  f"{run['ms']:>8.1f} ms  model {run['model_ms']:>8.1f} ms  mapping/plan from {cached:<11}  "
+                  f"{'file written  ' if run['file_written'] else ''}"
+                  f"{'ok' if ok else 'MISMATCH'}", flush=True)
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "node": subprocess.check_output(["node", "--version"], text=True).strip(),
+            "rows": args.rows,
+            "latency_ms": args.latency_ms,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+    return 0 if all_ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
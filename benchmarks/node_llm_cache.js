@@ -0,0 +1,143 @@
+// benchmarks/node_llm_cache.js
+// Runs the workflow's mapping + plan path (the n8n Code nodes, straight from the workflow JSON) under
+// plain node, with the two agent nodes replaced by one call each to a chat model endpoint
+// (benchmarks/fake_model_server.py offline)
+// - Path: SampleHeaders → LogInit → LoadMappingTemplate → FlagHasCache → LLM Cache: Mapping
+//   → [AI Agent → ParseAgentJSON] → LLM Cache: Save Mapping → Log: MappingPath (ai)
+//   → Merge: Data + Agent → Parse Inputs → Transform & QA → LLM Cache: Plan
+//   → [Agent Plan (OpenAI) → Parse Agent Plan] → LLM Cache: Save Plan → MergeData+Agent
+// - Input JSON: the Sync: CSV + Webhook item {headers, rows, context}; context.strategy_json /
+//   overrides_json reach Transform & QA, so the plan prompt (and its cache key) follows the settings
+// - $env is process.env (MC_LLM_CACHE_PATH / MC_LLM_CACHE_TTL_SEC carry the cache across runs)
+// - Prints {ms, model_ms, model_calls, mapping, plan, decision_log_llm_cache} as one JSON line
+//
+// Usage: node benchmarks/node_llm_cache.js input.json --model-url http://127.0.0.1:8765 [--workflow wf.json]
+
+const fs = require("fs");
+const path = require("path");
+
+const args = process.argv.slice(2);
+const flag = (name, dflt) => {
+  const i = args.indexOf(name);
+  if (i === -1) return dflt;
+  const v = args[i + 1];
+  args.splice(i, 2);
+  return v;
+};
+const modelUrl = flag("--model-url", "http://127.0.0.1:8765").replace(/\/$/, "");
+const wfPath = flag("--workflow", path.join(__dirname, "..", "Shopify_Migration_Assistant_MVP (8).json"));
+const [inputPath] = args;
+if (!inputPath) {
+  console.error("usage: node node_llm_cache.js input.json [--model-url URL] [--workflow wf.json]");
+  process.exit(2);
+}
+
+const wf = JSON.parse(fs.readFileSync(wfPath, "utf8"));
+const nodes = Object.fromEntries(wf.nodes.map((n) => [n.name, n]));
+const AsyncFunction = Object.getPrototypeOf(async function () {}).constructor;
+const staticData = {};
+const outputs = {};
+
+const lookup = (name) => {
+  if (!(name in outputs)) throw new Error(`node "${name}" did not run`);
+  return { first: () => outputs[name][0], all: () => outputs[name] };
+};
+
+// One Code node run: inputs is a list of item lists (one per input connection)
+async function runCode(name, inputs) {
+  const fn = new AsyncFunction(
+    "$json", "$", "$input", "$env", "getWorkflowStaticData", "require",
+    nodes[name].parameters.jsCode
+  );
+  const $input = {
+    first: (i = 0) => (inputs[i] || [])[0],
+    all: (i = 0) => inputs[i] || [],
+  };
+  const log = console.log;
+  console.log = () => {};  // the nodes' debug logging
+  try {
+    outputs[name] = await fn.call({ helpers: {} }, (inputs[0][0] || {}).json || {}, lookup, $input, process.env,
+                                  () => staticData, require);
+  } finally {
+    console.log = log;
+  }
+  return outputs[name][0].json;
+}
+
+// n8n "={{ expr }}" parameter → string, evaluated against $json
+function render(template, $json) {
+  return template
+    .replace(/^=/, "")
+    .replace(/\{\{([\s\S]*?)\}\}/g, (_, expr) => new Function("$json", `return (${expr});`)($json));
+}
+
+let modelMs = 0;
+let modelCalls = 0;
+// Stand-in for an agent node + its Gemini chat model: one generateContent call, agent-shaped {output}
+async function runAgent(name, $json) {
+  const p = nodes[name].parameters;
+  const t = process.hrtime.bigint();
+  const res = await fetch(`${modelUrl}/v1beta/models/fake:generateContent`, {
+    method: "POST",
+    headers: { "content-type": "application/json" },
+    body: JSON.stringify({
+      systemInstruction: { parts: [{ text: p.options.systemMessage }] },
+      contents: [{ role: "user", parts: [{ text: render(p.text, $json) }] }],
+    }),
+  });
+  const body = await res.json();
+  modelMs += Number(process.hrtime.bigint() - t) / 1e6;
+  modelCalls++;
+  outputs[name] = [{ json: { output: body.candidates[0].content.parts[0].text } }];
+  return outputs[name];
+}
+
+const item = (json) => [{ json }];
+const summary = (c) => c && { hit: c.hit, bypass: c.bypass, stored: c.stored ?? null, written: c.written ?? null,
+                              age_sec: c.age_sec, entries: c.entries, stats: c.stats };
+
+(async () => {
+  const input = JSON.parse(fs.readFileSync(inputPath, "utf8"));
+  const t = process.hrtime.bigint();
+
+  let j = await runCode("SampleHeaders", [item(input)]);
+  j = await runCode("LogInit", [item(j)]);
+  j = await runCode("LoadMappingTemplate", [item(j)]);
+  j = await runCode("FlagHasCache", [item(j)]);
+  const look = await runCode("LLM Cache: Mapping", [item(j)]);
+  if (look.llm_cache.hit) {
+    await runCode("LLM Cache: Save Mapping", [item(look)]);
+  } else {
+    await runCode("ParseAgentJSON", [await runAgent("AI Agent", look)]);
+    await runCode("LLM Cache: Save Mapping", [outputs["ParseAgentJSON"]]);
+  }
+
+  await runCode("Log: MappingPath (ai)", [outputs["LLM Cache: Save Mapping"]]);
+  await runCode("Merge: Data + Agent", [outputs["SampleHeaders"], outputs["Log: MappingPath (ai)"]]);
+  await runCode("Parse Inputs", [outputs["Merge: Data + Agent"]]);
+  const rich = await runCode("Transform & QA", [outputs["Parse Inputs"]]);
+  const planLook = await runCode("LLM Cache: Plan", [item(rich)]);
+  if (planLook.llm_cache.hit) {
+    await runCode("LLM Cache: Save Plan", [item(planLook)]);
+  } else {
+    await runCode("Parse Agent Plan", [await runAgent("Agent Plan (OpenAI)", planLook)]);
+    await runCode("LLM Cache: Save Plan", [outputs["Parse Agent Plan"]]);
+  }
+  const merged = await runCode("MergeData+Agent", [item(rich), outputs["LLM Cache: Save Plan"]]);
+
+  console.log(
+    JSON.stringify({
+      ms: Math.round(Number(process.hrtime.bigint() - t) / 1e5) / 10,
+      model_ms: Math.round(modelMs * 10) / 10,
+      model_calls: modelCalls,
+      mapping: summary(outputs["LLM Cache: Save Mapping"][0].json.llm_cache),
+      plan: summary(outputs["LLM Cache: Save Plan"][0].json.llm_cache),
+      mapping_pairs: (outputs["LLM Cache: Save Mapping"][0].json.mapping || []).length,
+      plan_strategy: merged.strategy || null,
+      decision_log_llm_cache: merged.decision_log.llm_cache || null,
+    })
+  );
+})().catch((e) => {
+  console.error(e.stack || String(e));
+  process.exit(1);
+});
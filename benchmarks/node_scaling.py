@@ -0,0 +1,147 @@
+# benchmarks/node_scaling.py
+# Scaling benchmark for the n8n "Transform & QA" Code node itself (transform_qa_10_19.js under node)
+# - Generated Woo exports (default up to 200k rows, a share of variations without a Parent ref
+#   so the name-root fallback in groupRowsWooAware is exercised)
+# - Times the working-tree node and, with --baseline-rev, the same file at an earlier git revision
+#   (e.g. the commit before the grouping index / attribute cache); checks both give the same output
+# - Input rows as the workflow's array block by default; --row-format objects for older baselines
+# - Writes JSON for run-to-run comparison
+#
+# Usage: python -m benchmarks.node_scaling --sizes 25000 50000 100000 200000 --baseline-rev <rev>
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generator import CatalogSpec
+from benchmarks.run import REPO_ROOT, catalog_path, _git_rev
+
+DEFAULT_SIZES = [25_000, 50_000, 100_000, 200_000]
+NODE_FILE = "transform_qa_10_19.js"
+HARNESS = os.path.join(REPO_ROOT, "benchmarks", "node_transform.js")
+
+def node_input(csv_path: str, strategy_json: str, row_format: str = "arrays") -> str:
+    """CSV → the item Transform & QA receives ({headers, rows, ...}); cached next to the CSV.
+
+    row_format "arrays" is the workflow's block (one array per row in headers order);
+    "objects" is the per-row dicts that revisions before the block input expect.
+    """
+    key = hashlib.sha256((strategy_json or "").encode()).hexdigest()[:8]
+    path = csv_path[:-len(".csv")] + f".node_{row_format}_{key}.json"
+    if os.path.exists(path):
+        return path
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        rows = list(reader) if row_format == "arrays" else [dict(zip(headers, r)) for r in reader]
+    item = {"headers": headers, "rows": rows, "mapping": [], "strict_mode": False,
+            "strategy": json.loads(strategy_json or "{}"), "overrides": {}}
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump(item, f)
+    os.replace(path + ".part", path)
+    return path
+
+def run_node(input_path: str, node_path: str, out_path: str, timeout: int, heap_mb: int) -> Dict[str, Any]:
+    cmd = ["node", f"--max-old-space-size={heap_mb}", HARNESS, input_path, node_path, "--out", out_path]
+    t = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True)
+    except subprocess.TimeoutExpired:
+        return {"timed_out": True, "wall_sec": round(time.perf_counter() - t, 2)}
+    except subprocess.CalledProcessError as e:
+        return {"error": (e.stderr or "").strip()[-500:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def comparable(path: str) -> Dict[str, Any]:
+    """Node response minus run-specific fields (timestamps, timings)."""
+    with open(path, encoding="utf-8") as f:
+        js = json.load(f)
+    log = js.get("decision_log") or {}
+    log.pop("timings", None)
+    for k in ("started_at", "completed_at"):
+        (log.get("meta") or {}).pop(k, None)
+    return js
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Transform & QA node scaling benchmark (node)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--baseline-rev", help="git revision whose transform_qa_10_19.js is timed as the baseline")
+    ap.add_argument("--out", default="node_bench_results.json")
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "migration_copilot_bench"))
+    ap.add_argument("--strategy", default='{"fix_missing_price":"zero"}')
+    ap.add_argument("--missing-parent-rate", type=float, default=0.2)
+    ap.add_argument("--row-format", choices=["arrays", "objects"], default="arrays",
+                    help="input rows as the workflow's array block, or as objects (baselines before the block input)")
+    ap.add_argument("--timeout", type=int, default=1800, help="seconds per node run")
+    ap.add_argument("--heap-mb", type=int, default=8192)
+    args = ap.parse_args(argv)
+
+    if shutil.which("node") is None:
+        print("node not found on PATH", file=sys.stderr)
+        return 2
+    work = tempfile.mkdtemp(prefix="mc_node_bench_")
+    variants = {"current": os.path.join(REPO_ROOT, NODE_FILE)}
+    if args.baseline_rev:
+        base_path = os.path.join(work, "baseline.js")
+        with open(base_path, "w", encoding="utf-8") as f:
+            f.write(subprocess.check_output(["git", "show", f"{args.baseline_rev}:{NODE_FILE}"],
+                                            cwd=REPO_ROOT, text=True))
+        variants = {"baseline": base_path, **variants}
+
+    spec0 = CatalogSpec(missing_parent_rate=args.missing_parent_rate)
+    results = []
+    try:
+        for size in args.sizes:
+            input_path = node_input(catalog_path(replace(spec0, rows=size), args.data_dir), args.strategy,
+                                    args.row_format)
+            res: Dict[str, Any] = {"size": size}
+            outs = {}
+            for name, node_path in variants.items():
+                outs[name] = os.path.join(work, f"{name}_{size}.json")
+                res[name] = run_node(input_path, node_path, outs[name], args.timeout, args.heap_mb)
+            cur, base = res["current"], res.get("baseline")
+            line = f"{size:>9,} rows  current {cur.get('ms', float('nan')) / 1000:>8.2f}s"
+            if base is not None:
+                if "ms" in base and "ms" in cur:
+                    res["speedup"] = round(base["ms"] / max(cur["ms"], 0.1), 2)
+                    res["same_output"] = comparable(outs["baseline"]) == comparable(outs["current"])
+                    line += (f"  baseline {base['ms'] / 1000:>8.2f}s  x{res['speedup']:<6}"
+                             f"  same output: {'yes' if res['same_output'] else 'NO'}")
+                else:
+                    line += "  baseline " + ("timed out" if base.get("timed_out") else "failed")
+            print(line, flush=True)
+            for name in outs.values():
+                if os.path.exists(name):
+                    os.remove(name)
+            results.append(res)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "baseline_rev": args.baseline_rev,
+            "node": subprocess.check_output(["node", "--version"], text=True).strip(),
+            "strategy_json": args.strategy,
+            "row_format": args.row_format,
+            "spec": {k: v for k, v in spec0.to_dict().items() if k != "rows"},
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+// benchmarks/node_transform.js
+// Runs an n8n Code node file (default: transform_qa_10_19.js) under plain node, outside n8n
+// - Input JSON: the item that reaches Transform & QA: {headers, rows, strategy, overrides, strict_mode}
+//   (rows as arrays in headers order, as the workflow sends them, or as objects)
+// - $json is that input; $("<node>") lookups throw, as they do for a node that did not run
+// - Prints {ms, rows_in, products, csv_bytes, heap_mb, timings} as one JSON line; --out writes the response
+//
+// Usage: node benchmarks/node_transform.js input.json [node.js] [--repeat N] [--out response.json]
+
+const fs = require("fs");
+const path = require("path");
+
+const args = process.argv.slice(2);
+const flag = (name, dflt) => {
+  const i = args.indexOf(name);
+  if (i === -1) return dflt;
+  const v = args[i + 1];
+  args.splice(i, 2);
+  return v;
+};
+const repeat = Math.max(1, parseInt(flag("--repeat", "1"), 10));
+const outPath = flag("--out", null);
+const [inputPath, nodePath = path.join(__dirname, "..", "transform_qa_10_19.js")] = args;
+if (!inputPath) {
+  console.error("usage: node node_transform.js input.json [node.js] [--repeat N] [--out response.json]");
+  process.exit(2);
+}
+
+const input = JSON.parse(fs.readFileSync(inputPath, "utf8"));
+const nodeFn = new Function("$json", "$", fs.readFileSync(nodePath, "utf8"));
+const lookup = (name) => {
+  throw new Error(`node "${name}" did not run`);
+};
+
+let best = Infinity;
+let result = null;
+for (let i = 0; i < repeat; i++) {
+  const t = process.hrtime.bigint();
+  result = nodeFn(input, lookup);
+  best = Math.min(best, Number(process.hrtime.bigint() - t) / 1e6);
+}
+
+const json = result[0].json;
+if (outPath) fs.writeFileSync(outPath, JSON.stringify(json));
+console.log(
+  JSON.stringify({
+    ms: Math.round(best * 10) / 10,
+    rows_in: (input.rows || []).length,
+    products: json.decision_log.transforms.find((t) => t.rule === "slugify_handle").applied_to,
+    csv_bytes: (json.files.shopify_csv_parts || [{ base64: json.files.shopify_csv_base64 || "" }]).reduce(
+      (n, p) => n + Buffer.byteLength(p.base64, "base64"),
+      0
+    ),
+    heap_mb: Math.round(process.memoryUsage().heapUsed / 1048576),
+    timings: json.decision_log.timings || [],
+  })
+);
@@ -0,0 +1,113 @@
+# benchmarks/parallel_scaling.py
+# Scaling benchmark for the sharded parallel transform (local_engine.run_transform(workers=N))
+# - One generated catalog per size, parsed once; transformed serially, then at each worker count
+# - Determinism check: every parallel run must match the serial run (response minus run-specific
+#   fields, CSV text, full QA issue list); a mismatch makes the exit status 1
+# - Times the transform ("expand" span) and the whole run_transform; writes JSON for comparison
+# - Each worker count gets its own shared pool (local_engine.shutdown_pool() in between) and one untimed
+#   warm-up run, so the timings are the steady state a long-running server sees: no process start-up,
+#   catalog already held by the workers
+#
+# Usage: python -m benchmarks.parallel_scaling --sizes 50000 200000 --workers 1 2 4 8
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generator import CatalogSpec
+from benchmarks.run import REPO_ROOT, catalog_path, stage_ms, _git_rev
+
+sys.path.insert(0, REPO_ROOT)
+import local_engine  # noqa: E402
+
+DEFAULT_SIZES = [50_000, 200_000]
+DEFAULT_WORKERS = [1, 2, 4, 8]
+
+def comparable(resp: Dict[str, Any]) -> Dict[str, Any]:
+    """Response + stored run → what must not depend on the worker count."""
+    state = local_engine.get_run(resp["run_id"])
+    log = dict(resp["decision_log"], timings=None, meta=dict(resp["decision_log"]["meta"], started_at=None,
+                                                               completed_at=None))
+    body = {k: v for k, v in resp.items() if k not in ("run_id", "files", "decision_log")}
+    return {
+        "response": dict(body, decision_log=log),
+        "csv": local_engine.build_csv(state["out"]),
+        "issues": local_engine._issue_records(state["issues"]),
+    }
+
+def run_once(catalog: Dict[str, Any], strategy: Dict[str, Any], overrides: Dict[str, Any], strict: bool,
+             workers: int) -> Dict[str, Any]:
+    t = time.perf_counter()
+    resp = local_engine.run_transform(catalog, strategy, overrides, strict, workers=workers)
+    wall = time.perf_counter() - t
+    ms = stage_ms(resp)
+    return {"resp": resp, "wall_sec": round(wall, 3), "expand_ms": ms.get("expand"), "stage_ms": ms}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Sharded parallel transform scaling benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS)
+    ap.add_argument("--out", default="parallel_bench_results.json")
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "migration_copilot_bench"))
+    ap.add_argument("--strategy", default='{"fix_missing_price":"zero"}')
+    ap.add_argument("--overrides", default="")
+    ap.add_argument("--strict", action="store_true")
+    ap.add_argument("--missing-parent-rate", type=float, default=0.2)
+    ap.add_argument("--min-groups", type=int, default=0,
+                    help="local_engine.PARALLEL_MIN_GROUPS for the run (0: shard every catalog)")
+    args = ap.parse_args(argv)
+
+    local_engine.PARALLEL_MIN_GROUPS = args.min_groups
+    strict, strategy, overrides = local_engine.parse_inputs(args.strict, args.strategy, args.overrides)
+    spec0 = CatalogSpec(missing_parent_rate=args.missing_parent_rate)
+    results, all_same = [], True
+    for size in args.sizes:
+        with open(catalog_path(replace(spec0, rows=size), args.data_dir), "rb") as f:
+            catalog = local_engine.load_catalog(f.read())
+        serial = run_once(catalog, strategy, overrides, strict, 1)
+        expected = comparable(serial["resp"])
+        res: Dict[str, Any] = {"size": size, "groups": len(catalog["groups"]), "runs": []}
+        for workers in args.workers:
+            if workers > 1:
+                local_engine.shutdown_pool()
+                run_once(catalog, strategy, overrides, strict, workers)  # warm-up: start the pool, ship the catalog
+            run = serial if workers == 1 else run_once(catalog, strategy, overrides, strict, workers)
+            same = workers == 1 or comparable(run["resp"]) == expected
+            all_same &= same
+            res["runs"].append({
+                "workers": workers, "wall_sec": run["wall_sec"], "expand_ms": run["expand_ms"],
+                "expand_speedup": round(serial["expand_ms"] / max(run["expand_ms"], 0.1), 2),
+                "same_output": same, "stage_ms": run["stage_ms"],
+            })
+            print(f"{size:>9,} rows  {workers} worker(s)  expand {run['expand_ms'] / 1000:>7.2f}s  "
+                  f"x{res['runs'][-1]['expand_speedup']:<5}  total {run['wall_sec']:>7.2f}s  "
+                  f"same as serial: {'yes' if same else 'NO'}", flush=True)
+        results.append(res)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "strategy_json": args.strategy,
+            "overrides_json": args.overrides,
+            "strict_mode": args.strict,
+            "spec": {k: v for k, v in spec0.to_dict().items() if k != "rows"},
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+    return 0 if all_same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
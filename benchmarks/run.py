@@ -0,0 +1,255 @@
+# benchmarks/run.py
+# End-to-end benchmark: generated catalogs at 1k / 10k / 100k / 500k rows through
+#   - "local":   local_engine in a fresh process per size (parse + transform + CSV artifact)
+#   - "webhook": webhook_client.post_catalog (what app.send_to_n8n sends) against a fresh
+#                local_server.py per size, or against --base-url (e.g. a real n8n instance)
+# Records wall time, peak RSS, request/response bytes, rows/sec and per-stage ms (decision_log.timings);
+# writes JSON for run-to-run comparison (--baseline prints the ratio against an earlier results file).
+#
+# Usage: python -m benchmarks.run --mode local --sizes 1000 10000 --out bench_results.json
+
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generator import CatalogSpec, generate_file
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 500_000]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------- Helpers -----------------------------
+def _rss_mb(kb_or_bytes: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(kb_or_bytes / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _proc_peak_rss_mb(pid: int) -> Optional[float]:
+    """VmHWM of another process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def stage_ms(resp: Dict[str, Any]) -> Dict[str, float]:
+    """decision_log.timings → {stage: ms}."""
+    return {t["stage"]: t["ms"] for t in (resp.get("decision_log") or {}).get("timings") or []}
+
+def catalog_path(spec: CatalogSpec, data_dir: str) -> str:
+    """Generate once per spec; later runs reuse the file."""
+    key = hashlib.sha256(json.dumps(spec.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+    path = os.path.join(data_dir, f"catalog_{spec.rows}_{key}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_file(spec, path + ".part")
+        os.replace(path + ".part", path)
+    return path
+
+# ------------------------- Local mode ---------------------------
+def _local_child(path: str, strategy_json: str, strict: bool) -> Dict[str, Any]:
+    # runs in a fresh process so ru_maxrss is this catalog's peak alone
+    sys.path.insert(0, REPO_ROOT)
+    import local_engine
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    strict_mode, strategy, overrides = local_engine.parse_inputs(strict, strategy_json, "")
+    catalog = local_engine.load_catalog(data)
+    t1 = time.perf_counter()
+    timer = local_engine.StageTimer()
+    local_engine.parse_timings(timer, catalog, cached=False)
+    resp = local_engine.run_transform(catalog, strategy, overrides, strict_mode, timer=timer)
+    t2 = time.perf_counter()
+    csv_meta = (resp.get("files") or {}).get("shopify_csv") or {}
+    return {
+        "rows": catalog["row_count"],
+        "parse_sec": round(t1 - t0, 3),
+        "transform_sec": round(t2 - t1, 3),
+        "wall_sec": round(t2 - t0, 3),
+        "request_bytes": len(data),
+        "response_bytes": len(json.dumps(resp, ensure_ascii=False).encode("utf-8")),
+        "csv_bytes": csv_meta.get("bytes"),
+        "csv_compressed_bytes": csv_meta.get("compressed_bytes"),
+        "peak_rss_mb": _rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+        "import_rss_mb": _rss_mb(base_rss),
+        "blocking": resp["qa"]["blocking"],
+        "warnings": resp["qa"]["warnings"],
+        "stage_ms": stage_ms(resp),
+    }
+
+def run_local(path: str, strategy_json: str, strict: bool) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(_local_child, path, strategy_json, strict).result()
+
+# ------------------------ Webhook mode --------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _start_server() -> tuple:
+    import requests
+    port = _free_port()
+    env = dict(os.environ, MC_SERVER_QUIET="1")
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "local_server.py"), "--port", str(port)],
+                            env=env, stdout=subprocess.DEVNULL, cwd=REPO_ROOT)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(base_url + "/healthz", timeout=1)
+            return proc, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("local_server.py did not start")
+
+def run_webhook(path: str, strategy_json: str, strict: bool, base_url: Optional[str], timeout: int) -> Dict[str, Any]:
+    sys.path.insert(0, REPO_ROOT)
+    from webhook_client import make_session, post_catalog
+
+    proc = None
+    if not base_url:
+        proc, base_url = _start_server()
+    try:
+        session = make_session(pool_size=1)
+        with open(path, "rb") as f:
+            data = f.read()
+        t0 = time.perf_counter()
+        _, _, r = post_catalog(session, base_url, "/webhook/migrate_v1", os.path.basename(path), data,
+                               strict, strategy_json, "", secret=os.getenv("MW_HMAC_SECRET", ""), timeout=timeout)
+        t1 = time.perf_counter()
+        r.raise_for_status()
+        resp = r.json()
+        files = resp.get("files") or {}
+        csv_meta = files.get("shopify_csv") or {}
+        download_bytes = 0
+        if csv_meta.get("artifact_id"):
+            url = base_url.rstrip("/") + "/webhook/migrate_v1/artifacts/" + csv_meta["artifact_id"]
+            with session.get(url, stream=True, timeout=timeout) as d:
+                for chunk in d.raw.stream(1 << 16, decode_content=False):
+                    download_bytes += len(chunk)
+        t2 = time.perf_counter()
+        rows = int(((resp.get("decision_log") or {}).get("meta") or {}).get("row_count") or 0)
+        return {
+            "rows": rows,
+            "request_sec": round(t1 - t0, 3),
+            "download_sec": round(t2 - t1, 3),
+            "wall_sec": round(t2 - t0, 3),
+            "request_bytes": len(r.request.body or b""),
+            "response_bytes": len(r.content),
+            "download_bytes": download_bytes,
+            "csv_bytes": csv_meta.get("bytes") or len(files.get("shopify_csv_base64") or "") * 3 // 4,
+            "peak_rss_mb": _proc_peak_rss_mb(proc.pid) if proc else None,
+            "blocking": (resp.get("qa") or {}).get("blocking"),
+            "warnings": (resp.get("qa") or {}).get("warnings"),
+            "stage_ms": stage_ms(resp),
+        }
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+# --------------------------- Main -------------------------------
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        base = {r["size"]: r for r in json.load(f).get("results", [])}
+    print(f"\nvs baseline {baseline_path}:")
+    for r in results:
+        b = base.get(r["size"])
+        if not b or not b.get("wall_sec") or not r.get("wall_sec"):
+            continue
+        rss = ""
+        if b.get("peak_rss_mb") and r.get("peak_rss_mb"):
+            rss = f"  peak RSS x{r['peak_rss_mb'] / b['peak_rss_mb']:.2f}"
+        print(f"  {r['size']:>9,} rows  wall x{r['wall_sec'] / b['wall_sec']:.2f}{rss}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Migration Copilot end-to-end benchmark")
+    ap.add_argument("--mode", choices=["local", "webhook"], default="local")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--base-url", default="", help="Webhook mode: existing server instead of a fresh local_server.py")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="Earlier results JSON to compare against")
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "migration_copilot_bench"))
+    ap.add_argument("--strategy", default='{"fix_missing_price":"zero"}', help="strategy_json sent with every run")
+    ap.add_argument("--strict", action="store_true")
+    ap.add_argument("--timeout", type=int, default=1800)
+    ap.add_argument("--seed", type=int, default=CatalogSpec.seed)
+    ap.add_argument("--variable-ratio", type=float, default=CatalogSpec.variable_ratio)
+    ap.add_argument("--variations-per-parent", type=int, default=CatalogSpec.variations_per_parent)
+    ap.add_argument("--pipe-ratio", type=float, default=CatalogSpec.pipe_ratio)
+    ap.add_argument("--wide-products", type=int, default=CatalogSpec.wide_products)
+    ap.add_argument("--missing-price-rate", type=float, default=CatalogSpec.missing_price_rate)
+    ap.add_argument("--missing-title-rate", type=float, default=CatalogSpec.missing_title_rate)
+    ap.add_argument("--missing-parent-rate", type=float, default=CatalogSpec.missing_parent_rate)
+    args = ap.parse_args(argv)
+
+    base_spec = CatalogSpec(
+        seed=args.seed, variable_ratio=args.variable_ratio, variations_per_parent=args.variations_per_parent,
+        pipe_ratio=args.pipe_ratio, wide_products=args.wide_products,
+        missing_price_rate=args.missing_price_rate, missing_title_rate=args.missing_title_rate,
+        missing_parent_rate=args.missing_parent_rate,
+    )
+    results = []
+    for size in args.sizes:
+        spec = replace(base_spec, rows=size)
+        path = catalog_path(spec, args.data_dir)
+        if args.mode == "local":
+            res = run_local(path, args.strategy, args.strict)
+        else:
+            res = run_webhook(path, args.strategy, args.strict, args.base_url or None, args.timeout)
+        res = {"size": size, **res}
+        res["rows_per_sec"] = round(res["rows"] / res["wall_sec"], 1) if res["wall_sec"] else None
+        results.append(res)
+        rss = f"{res['peak_rss_mb']:>8.1f} MB" if res.get("peak_rss_mb") is not None else "       —   "
+        print(f"{size:>9,} rows  {res['wall_sec']:>8.2f}s  {res['rows_per_sec']:>10,.0f} rows/s  "
+              f"peak {rss}  req {res['request_bytes']:>12,} B  resp {res['response_bytes']:>10,} B", flush=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "mode": args.mode,
+            "base_url": args.base_url or None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "strategy_json": args.strategy,
+            "strict_mode": args.strict,
+            "spec": {k: v for k, v in base_spec.to_dict().items() if k != "rows"},
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
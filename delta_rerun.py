@@ -0,0 +1,64 @@
+# delta_rerun.py
+# Client side of delta re-runs (app.py): what to re-transform, and folding the reply back in
+# - delta_handles(): the handles whose per_product override changed since the last submission, or
+#   None when the strategy or a catalog-wide override (rules, anything outside per_product) changed
+#   too; then the client sends a full run instead of asking for a delta
+# - merge_delta(): folds a delta response (changed groups plus the merged run's bounded lists) into
+#   the previous full response, so the result matches what a full run with the same inputs returns
+
+import json
+from typing import Any, Dict, List, Optional
+
+def _json_obj(s: str) -> Dict[str, Any]:
+    try:
+        obj = json.loads(s) if s and s.strip() else {}
+    except Exception:
+        obj = {}
+    return obj if isinstance(obj, dict) else {}
+
+def changed_handles(prev_overrides_json: str, overrides_json: str) -> List[str]:
+    """Handles whose per_product override differs between two overrides_json strings."""
+    def per_product(s):
+        pp = _json_obj(s).get("per_product")
+        return pp if isinstance(pp, dict) else {}
+    prev, cur = per_product(prev_overrides_json), per_product(overrides_json)
+    return [h for h in dict.fromkeys(list(prev) + list(cur)) if prev.get(h) != cur.get(h)]
+
+def delta_handles(last_submitted: Dict[str, Any], strategy_json: str, overrides_json: str) -> Optional[List[str]]:
+    """Handles to re-transform against the last run, or None when only a full run is valid:
+    the strategy or a catalog-wide override (anything outside per_product) changed since."""
+    catalog_wide = lambda s: {k: v for k, v in _json_obj(s).items() if k != "per_product"}
+    if _json_obj(last_submitted.get("strategy_json", "")) != _json_obj(strategy_json):
+        return None
+    if catalog_wide(last_submitted.get("overrides_json", "")) != catalog_wide(overrides_json):
+        return None
+    return changed_handles(last_submitted.get("overrides_json", ""), overrides_json)
+
+def merge_delta(last: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a delta response into the previous full response.
+
+    The delta already carries the merged run's issue index, overflow list, preview page and
+    applied overrides, in catalog order; everything else is kept from `last`.
+    """
+    js = dict(last)
+    qa = dict(last.get("qa") or {})
+    qa.update(delta.get("qa") or {})
+    js["qa"] = qa
+    js["gate"] = delta.get("gate") or {}
+    js["handles_with_overflow"] = delta.get("handles_with_overflow") or []
+    js["preview_transformed"] = delta.get("preview_transformed") or []
+
+    log = dict(last.get("decision_log") or {})
+    dlog = delta.get("decision_log") or {}
+    log["meta"] = dict(log.get("meta") or {}, **(dlog.get("meta") or {}))
+    log["transforms"] = dlog.get("transforms") or log.get("transforms")
+    applied = (dlog.get("overrides_applied") or {}).get("list") or []
+    log["overrides_applied"] = {"count": len(applied), "list": applied}
+    log["qa"] = {k: qa.get(k) for k in ("blocking", "warnings", "counts")}
+    log["gate"] = js["gate"]
+    log["timings"] = dlog.get("timings") or []
+    js["decision_log"] = log
+
+    js["files"] = delta.get("files") or {}
+    js["run_id"] = delta.get("run_id")
+    return js
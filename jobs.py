@@ -0,0 +1,154 @@
+# jobs.py
+# Background jobs for long transforms: submit returns a job id at once, clients poll status
+# - Stages run in order: parse → mapping → transform → csv; each reports done/total rows
+# - Worker pool bounds concurrent transforms; finished jobs keep their result until evicted
+# - cancel(): a queued job never starts; a running one stops at its next progress report
+#   (JobCancelled raised inside the work), so a stuck client no longer holds a worker
+# - Used by local_server (POST .../jobs, GET .../jobs/<id>, DELETE .../jobs/<id>)
+
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+STAGES = ["parse", "mapping", "transform", "csv"]
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_JOBS = 64
+FINISHED = ("done", "error", "cancelled")
+
+class JobCancelled(Exception):
+    """Raised from a cancelled job's progress callback to unwind the work."""
+
+class JobManager:
+    """Thread pool + bounded job table. `fn(progress)` does the work and returns the result."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.max_jobs = int(max_jobs)
+        self._pool = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="mc-job")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[Callable[[str, int, int], None]], Dict[str, Any]],
+               meta: Optional[Dict[str, Any]] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "done": 0,
+            "total": 0,
+            "stages": {s: {"state": "pending", "done": 0, "total": 0, "seconds": None} for s in STAGES},
+            "created_at": now,
+            "updated_at": now,
+            "meta": dict(meta or {}),
+            "error": None,
+            "result": None,
+            "_cancel": False,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict()
+            job["_future"] = self._pool.submit(self._run, job_id, fn)
+        return job_id
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """Ask a job to stop; False once it already finished, None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] in FINISHED:
+                return False
+            job["_cancel"] = True
+            if job["_future"].cancel():
+                job.update(status="cancelled", updated_at=time.time())
+            return True
+
+    def _evict(self) -> None:
+        # drop the oldest finished jobs first; running ones are never evicted
+        while len(self._jobs) > self.max_jobs:
+            victim = next((k for k, j in self._jobs.items() if j["status"] in FINISHED), None)
+            if victim is None:
+                return
+            self._jobs.pop(victim)
+
+    def _progress(self, job_id: str, stage: str, done: int, total: int) -> None:
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if job["_cancel"]:
+                raise JobCancelled(job_id)
+            if job["stage"] != stage:
+                # entering a new stage closes every earlier one
+                for s in STAGES[:STAGES.index(stage)] if stage in STAGES else []:
+                    info = job["stages"][s]
+                    if info["state"] != "done":
+                        info["state"] = "done"
+                        if info.get("_t0") is not None:
+                            info["seconds"] = round(now - info.pop("_t0"), 3)
+                info = job["stages"].setdefault(stage, {"state": "pending", "done": 0, "total": 0, "seconds": None})
+                info["state"] = "running"
+                info["_t0"] = now
+                job["stage"] = stage
+            info = job["stages"][stage]
+            info["done"], info["total"] = int(done), int(total)
+            job["done"], job["total"] = int(done), int(total)
+            job["updated_at"] = now
+
+    def _run(self, job_id: str, fn: Callable) -> None:
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+        try:
+            result = fn(lambda stage, done, total: self._progress(job_id, stage, done, total))
+        except JobCancelled:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.update(status="cancelled", updated_at=time.time())
+            return
+        except Exception as e:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.update(status="error", error=f"{type(e).__name__}: {e}",
+                               traceback=traceback.format_exc(limit=5), updated_at=time.time())
+            return
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for info in job["stages"].values():
+                if info["state"] == "running":
+                    info["state"] = "done"
+                    info["seconds"] = round(now - info.pop("_t0", now), 3)
+            job.update(status="done", result=result, updated_at=now)
+
+    def status(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """JSON-safe snapshot: status, current stage, per-stage counts, result when done."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snap = {k: v for k, v in job.items() if k not in ("result", "stages") and not k.startswith("_")}
+            snap["stages"] = [
+                {"name": s, **{k: v for k, v in info.items() if not k.startswith("_")}}
+                for s, info in job["stages"].items()
+            ]
+            if include_result and job["status"] == "done":
+                snap["result"] = job["result"]
+        snap["elapsed_sec"] = round(snap["updated_at"] - snap["created_at"], 3)
+        return snap
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j["status"]] = counts.get(j["status"], 0) + 1
+            return counts
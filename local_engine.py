@@ -0,0 +1,1703 @@
+# local_engine.py
+# In-process port of the n8n "Transform & QA" Code node (transform_qa_10_19.js)
+# - Same grouping, option selection, per-product overrides, quick-fixes, QA and gate
+# - Column-wise pandas operations instead of per-row dicts; only per-product decisions loop
+# - Returns the same response shape as the workflow (gate, qa, decision_log,
+#   handles_with_overflow, preview_transformed, files)
+# - files.shopify_csv is a gzip artifact id + sizes (artifact_store.py), not an inline base64 CSV
+# - Reference: the workflow's deployed Transform & QA node (transform_qa_10_19.js is kept identical);
+#   tests/test_local_engine_parity.py runs both on generated catalogs and compares the results
+# - decision_log.timings: per-stage spans (ms, rows in/out, bytes), same shape as the JS node's
+# - preview_page(): filtered, paginated, columnar pages over a stored run's output rows
+# - Simple-product expansion is lazy and stops one variant past strategy.max_variants_per_product
+#   (VARIANT_LIMIT_EXCEEDED), so a product with huge pipe lists never materializes every combination
+# - CSV export escapes the output in row blocks straight into the gzip artifact (never one string);
+#   strategy.csv_split_mb splits it into files.shopify_csv_parts at product boundaries
+# - qa is an issue index (counts per code / handle, samples, first page + cursor); the full list
+#   stays with the run and is paged by issues_page()
+# - workers > 1: groups are sharded by handle hash across worker processes (transform_groups per
+#   shard) and merged back in group order; same output as the serial run. The processes are one
+#   long-lived pool (forkserver/spawn, MC_TRANSFORM_WORKERS), started on first use, shut down at exit
+# - overrides.rules: one option choice for every handle with the same varying-attribute set,
+#   resolved through an attribute-set index in the same pass; per_product entries win
+
+import io
+import os
+import re
+import json
+import time
+import uuid
+import atexit
+import pickle
+import math
+import zlib
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import ArtifactStore, consumer_root
+
+# ---------------------------- Constants ----------------------------
+OPTION_NAME_CANDIDATES = [
+    "color", "size", "material", "style", "length", "width", "height",
+    "flavor", "capacity", "gender", "age", "activity", "strap", "pattern",
+]
+PRIORITY_ORDER = [
+    "Color", "Size", "Material", "Style", "Length", "Width", "Height",
+    "Flavor", "Capacity", "Gender", "Age", "Activity", "Strap", "Pattern",
+]
+PRIORITY_INDEX = {p.lower(): i for i, p in enumerate(PRIORITY_ORDER)}
+
+SHOPIFY_STD_COLS = [
+    "Handle", "Title", "Body (HTML)", "Vendor", "Tags",
+    "Option1 Name", "Option1 Value", "Option2 Name", "Option2 Value", "Option3 Name", "Option3 Value",
+    "Variant SKU", "Variant Price", "Variant Compare At Price", "Variant Inventory Qty",
+    "Variant Image", "Image Src", "Image Position",
+    "Metafields",  # always present (as in the deployed node), empty unless overflow was demoted
+]
+PRODUCT_LEVEL_COLS = [
+    "Handle", "Title", "Body (HTML)", "Vendor", "Tags", "Option1 Name", "Option2 Name", "Option3 Name",
+]
+VARIANT_COLS = [
+    "Option1 Value", "Option2 Value", "Option3 Value",
+    "Variant SKU", "Variant Price", "Variant Compare At Price", "Variant Inventory Qty",
+]
+NUMERIC_COLS = {"Variant Price", "Variant Compare At Price", "Variant Inventory Qty", "Image Position"}
+BLOCKING_CODES = {"REQ_MISSING_TITLE", "REQ_MISSING_PRICE"}
+PREVIEW_LIMIT = 50
+PREVIEW_PAGE_MAX = 500     # rows per preview_page call
+PREVIEW_FILTER_CACHE = 4   # filtered row selections memoized per run while paging
+GROUP_LEVEL = 1 << 62  # sort key for per-product records (after every variant line)
+MAX_RUNS = 8           # transformed runs kept for delta re-runs and deferred CSV downloads
+ARTIFACTS = ArtifactStore(root=consumer_root("engine"))  # entry points pick their own: use_artifacts()
+PROGRESS_EVERY = 500   # groups between progress callbacks in the transform loop
+DEFAULT_VARIANT_CAP = 100  # variant lines per product (Shopify's import limit)
+CSV_BLOCK_ROWS = 20_000    # output rows escaped at a time while writing the CSV
+CSV_CHUNK_BYTES = 1 << 20  # bytes buffered per write into a split CSV file
+ISSUE_PAGE = 100           # first issues, in order, inline in qa.issues; the rest via issues_page()
+ISSUE_PAGE_MAX = 1000      # issues per issues_page call
+ISSUE_SAMPLE = 5           # examples per code in qa.samples
+ISSUE_TOP_HANDLES = 20     # handles with the most issues in qa.handles.top
+PARALLEL_MIN_GROUPS = 2000  # below this many product groups, worker start-up costs more than it saves
+
+# progress(stage, done, total): stage in ("parse", "mapping", "transform", "csv"), counts in rows
+Progress = Callable[[str, int, int], None]
+ISSUE_KEYS = {
+    "DUP_VARIANT_COMBO": ["code", "field", "value", "handle"],
+    "DUP_OPTION_VALUES": ["code", "field", "value", "handle"],
+    "AUTO_SKU_ASSIGNED": ["code", "field", "value", "handle"],
+    "REQ_MISSING_TITLE": ["code", "field", "handle"],
+    "REQ_MISSING_PRICE": ["code", "field", "handle", "sku"],
+    "EXCESS_OPTION_DIMENSIONS": ["code", "field", "handle", "attrs"],
+    "VARIANT_LIMIT_EXCEEDED": ["code", "field", "handle", "value", "limit"],
+}
+
+_ATTR_NAME_RE = re.compile(r"^Attribute\s+(\d+)\s+name$", re.I)
+_ATTR_VALUE_RE = re.compile(r"^Attribute\s+(\d+)\s+value\(s\)$", re.I)
+_NAME_ROOT_RE = r"(-[a-z0-9]+){1,3}$"
+
+# ----------------------------- Timing ------------------------------
+class StageTimer:
+    """Back-to-back stage spans for decision_log.timings.
+
+    Each span: {stage, start_ms, ms, rows_in, rows_out, bytes} (+ extras such as cached).
+    start_ms is relative to the first span, so spans from the server, the parse step and
+    the transform line up on one waterfall.
+    """
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self._cursor_ms = 0.0
+        self._last = time.perf_counter()
+
+    def _add(self, stage: str, ms: float, rows_in: Any, rows_out: Any, nbytes: Any, extra: Dict[str, Any]) -> None:
+        self.spans.append({
+            "stage": stage, "start_ms": round(self._cursor_ms, 1), "ms": round(ms, 1),
+            "rows_in": rows_in, "rows_out": rows_out, "bytes": nbytes, **extra,
+        })
+        self._cursor_ms += ms
+
+    def mark(self, stage: str, rows_in: Any = None, rows_out: Any = None, nbytes: Any = None, **extra: Any) -> None:
+        """Close the span that started at the previous mark (or at construction)."""
+        now = time.perf_counter()
+        self._add(stage, (now - self._last) * 1000.0, rows_in, rows_out, nbytes, extra)
+        self._last = now
+
+    def extend(self, spans: List[Dict[str, Any]], **extra: Any) -> None:
+        """Append spans timed elsewhere (e.g. the parse spans kept on a catalog)."""
+        for sp in spans:
+            self._add(sp["stage"], sp["ms"], sp.get("rows_in"), sp.get("rows_out"), sp.get("bytes"), extra)
+        self._last = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        return round(self._cursor_ms, 1)
+
+# -------------------------- Input parsing --------------------------
+def read_catalog(file_bytes: bytes) -> pd.DataFrame:
+    """Parse an uploaded CSV the way "Extract from File" does: every cell a string, blanks as ''."""
+    if not file_bytes:
+        return pd.DataFrame()
+    return pd.read_csv(
+        io.BytesIO(file_bytes), dtype=str, keep_default_na=False, encoding="utf-8-sig"
+    )
+
+def _safe_json(raw: Any) -> Any:
+    if isinstance(raw, (dict, list)):
+        return raw
+    s = str(raw or "").lstrip("\ufeff").strip()
+    if not s:
+        return None
+    m = re.search(r"```(?:json)?\s*([\s\S]*?)```", s, re.I)
+    for cand in (s, m.group(1).strip() if m else None, s.replace("'", '"')):
+        if not cand:
+            continue
+        try:
+            return json.loads(cand)
+        except Exception:
+            continue
+    return None
+
+def parse_inputs(strict_mode: Any, strategy_json: Any, overrides_json: Any) -> Tuple[bool, dict, dict]:
+    """Mirror of the "Parse Inputs" node: normalize strict_mode / strategy / overrides."""
+    if isinstance(strict_mode, str):
+        strict = strict_mode.strip().lower() == "true"
+    else:
+        strict = bool(strict_mode)
+
+    strategy = _safe_json(strategy_json)
+    strategy = strategy if isinstance(strategy, dict) else {}
+
+    overrides = _safe_json(overrides_json)
+    overrides = overrides if isinstance(overrides, dict) else {}
+    pp = overrides.get("per_product")
+    if isinstance(pp, dict):
+        clean = {}
+        for handle, cfg in pp.items():
+            if not isinstance(cfg, dict):
+                continue
+            entry = {}
+            chosen = cfg.get("chosen_options")
+            if isinstance(chosen, list):
+                chosen = [c for c in chosen if c][:3]
+                if chosen:
+                    entry["chosen_options"] = chosen
+            if isinstance(cfg.get("overflow_to"), str) and cfg["overflow_to"]:
+                entry["overflow_to"] = cfg["overflow_to"]
+            if entry:
+                clean[handle] = entry
+        overrides = dict(overrides)
+        if clean:
+            overrides["per_product"] = clean
+    if "rules" in overrides:
+        overrides = dict(overrides, rules=_clean_rules(overrides["rules"]))
+    return strict, strategy, overrides
+
+def _clean_rules(rules: Any) -> List[Dict[str, Any]]:
+    """overrides.rules → [{varying_attributes, chosen_options (≤3), overflow_to?}], invalid rules dropped."""
+    out = []
+    for rule in rules if isinstance(rules, list) else []:
+        if not isinstance(rule, dict):
+            continue
+        attrs = rule.get("varying_attributes")
+        chosen = rule.get("chosen_options")
+        if not (isinstance(attrs, list) and isinstance(chosen, list)):
+            continue
+        attrs = [str(a) for a in attrs if a]
+        chosen = [c for c in chosen if c][:3]
+        if not (attrs and chosen):
+            continue
+        entry = {"varying_attributes": attrs, "chosen_options": chosen}
+        if isinstance(rule.get("overflow_to"), str) and rule["overflow_to"]:
+            entry["overflow_to"] = rule["overflow_to"]
+        out.append(entry)
+    return out
+
+def attr_set_key(names: List[Any]) -> Tuple[str, ...]:
+    """Order- and case-insensitive key of a varying-attribute set."""
+    return tuple(sorted({str(n).strip().lower() for n in names}))
+
+def rule_index(overrides: Dict[str, Any]) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+    """Attribute-set key → the first rule for that set (with its position as `rule`)."""
+    index: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    rules = overrides.get("rules")
+    for i, rule in enumerate(rules if isinstance(rules, list) else []):
+        if (isinstance(rule, dict) and isinstance(rule.get("varying_attributes"), list)
+                and isinstance(rule.get("chosen_options"), list) and rule["chosen_options"]):
+            index.setdefault(attr_set_key(rule["varying_attributes"]), dict(rule, rule=i))
+    return index
+
+def suggest_mapping(headers: List[str]) -> Dict[str, Any]:
+    """Port of the `mapping_suggester` tool: heuristic source detection + alias mapping."""
+    norm = lambda s: str(s or "").lower().strip()
+    woo_hints = ["short description", "regular price", "sale price", "attribute 1 name",
+                 "attribute 1 value(s)", "sku", "name", "images", "description"]
+    big_hints = ["product description", "price", "sale price", "option name", "option value",
+                 "sku", "product name", "image url"]
+    hs = {norm(h) for h in headers}
+    woo = sum(1 for h in woo_hints if h in hs)
+    big = sum(1 for h in big_hints if h in hs)
+    source = {"type": "custom", "confidence": 0.4}
+    if woo >= big and woo > 0:
+        source = {"type": "woo", "confidence": woo / len(woo_hints)}
+    if big > woo and big > 0:
+        source = {"type": "big", "confidence": big / len(big_hints)}
+
+    candidates = [
+        ("Title", ["name", "product name", "title"]),
+        ("Body (HTML)", ["short description", "product short description", "description",
+                         "product description", "long description", "body"]),
+        ("Variant SKU", ["sku", "item sku", "product sku"]),
+        ("Variant Price", ["regular price", "price", "base price"]),
+        ("Variant Compare At Price", ["sale price", "compare at price", "compare price"]),
+        ("Image Src", ["images", "image url", "image", "image urls", "picture", "pictures"]),
+        ("Option1 Name", ["attribute 1 name", "option name", "option1 name"]),
+        ("Option1 Value", ["attribute 1 value(s)", "option value", "option1 value"]),
+        ("Option2 Name", ["attribute 2 name", "option2 name"]),
+        ("Option2 Value", ["attribute 2 value(s)", "option2 value"]),
+        ("Option3 Name", ["attribute 3 name", "option3 name"]),
+        ("Option3 Value", ["attribute 3 value(s)", "option3 value"]),
+    ]
+    mapping = []
+    for original in headers:
+        n = norm(original)
+        for dst, srcs in candidates:
+            if n in srcs:
+                mapping.append({"source": original, "shopify": dst, "confidence": 0.9})
+                break
+    return {"source": source, "mapping": mapping}
+
+# ---------------------- Column-wise helpers ------------------------
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def _col(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series("", index=df.index, dtype=object)
+
+def _pick(df: pd.DataFrame, names: List[str]) -> pd.Series:
+    """Vectorized `pick(row, names)`: first non-empty value across the candidate columns."""
+    out = pd.Series("", index=df.index, dtype=object)
+    for n in reversed(names):
+        if n in df.columns:
+            s = df[n]
+            out = s.where(s != "", out)
+    return out
+
+def _kebab(s: pd.Series) -> pd.Series:
+    return (
+        s.str.lower().str.strip()
+        .str.replace("&", " and ", regex=False)
+        .str.replace(r"[^a-z0-9\s-]", "", regex=True)
+        .str.replace(r"\s+", "-", regex=True)
+        .str.replace(r"-+", "-", regex=True)
+    )
+
+def _title_case(s: pd.Series) -> pd.Series:
+    return (
+        s.str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.replace(r"\b\w", lambda m: m.group(0).upper(), regex=True, flags=re.ASCII)
+    )
+
+def _to_number(s: pd.Series) -> pd.Series:
+    """Vectorized `toNumber`: strip to [0-9.,-], first comma → dot, parseFloat prefix semantics."""
+    cleaned = (
+        s.str.replace(r"[^0-9.,-]", "", regex=True)
+        .str.replace(",", ".", n=1, regex=False)
+    )
+    num = cleaned.str.extract(r"^(-?(?:\d+\.?\d*|\.\d+))", expand=False)
+    return pd.to_numeric(num, errors="coerce")
+
+def _first_csv_part(s: pd.Series) -> pd.Series:
+    # first non-blank comma-separated part, trimmed (`firstImage`)
+    return s.str.extract(r"^(?:\s*,)*\s*([^,]*?)\s*(?:,|$)", expand=False).fillna("")
+
+def js_num(v: Any) -> Any:
+    """Render a float like JavaScript would in JSON (12.0 → 12)."""
+    if isinstance(v, (float, np.floating)):
+        if np.isnan(v):
+            return ""
+        return int(v) if float(v).is_integer() else float(v)
+    if isinstance(v, np.integer):
+        return int(v)
+    return v
+
+def _locale_key(name: str) -> Tuple[str, str]:
+    # Approximates String.prototype.localeCompare (case-insensitive first, lowercase first)
+    return (name.lower(), name.swapcase())
+
+# ------------------------- Catalog prep ----------------------------
+def _attribute_table(df: pd.DataFrame, headers: List[str]) -> pd.DataFrame:
+    """Long table of every row's attributes, in `getRowAttributes` order.
+
+    Columns: row, ord, name, name_lc, first (first value), vals (tuple of non-empty values).
+    """
+    names: Dict[str, str] = {}
+    vals: Dict[str, str] = {}
+    for h in headers:
+        m1 = _ATTR_NAME_RE.match(str(h))
+        m2 = _ATTR_VALUE_RE.match(str(h))
+        if m1:
+            names[m1.group(1)] = h
+        if m2:
+            vals[m2.group(1)] = h
+    pairs = sorted(set(names) | set(vals), key=int)
+
+    frames = []
+    rows = np.arange(len(df))
+    for ord_, idx in enumerate(pairs):
+        raw_name = _col(df, names.get(idx, "\0")).str.strip()
+        raw_val = _col(df, vals.get(idx, "\0")).str.strip()
+        keep = (raw_name != "").to_numpy()
+        if not keep.any():
+            continue
+        split = raw_val[keep].str.split("|").map(lambda xs: tuple(x.strip() for x in xs if x.strip()))
+        first = split.map(lambda t: t[0] if t else "")
+        first = first.where(first != "", raw_val[keep])
+        vals_t = split.where(split.map(len) > 0, first.map(lambda v: (v,) if v else ()))
+        frames.append(pd.DataFrame({
+            "row": rows[keep], "ord": ord_, "name": _title_case(raw_name[keep]).to_numpy(),
+            "first": first.to_numpy(), "vals": vals_t.to_numpy(),
+        }))
+
+    lower_cols: Dict[str, str] = {}
+    for h in df.columns:
+        lower_cols[str(h).lower()] = h  # last key wins, like Object.fromEntries
+    for j, cand in enumerate(OPTION_NAME_CANDIDATES):
+        if cand not in lower_cols:
+            continue
+        v = df[lower_cols[cand]].str.strip()
+        keep = (v != "").to_numpy()
+        if not keep.any():
+            continue
+        frames.append(pd.DataFrame({
+            "row": rows[keep], "ord": len(pairs) + j, "name": cand.title(),
+            "first": v[keep].to_numpy(), "vals": v[keep].map(lambda x: (x,)).to_numpy(),
+        }))
+
+    if not frames:
+        return pd.DataFrame({"row": [], "ord": [], "name": [], "name_lc": [], "first": [], "vals": []})
+    at = pd.concat(frames, ignore_index=True).sort_values(["row", "ord"], kind="stable")
+    at["name_lc"] = at["name"].str.lower()
+    return at.reset_index(drop=True)
+
+def _group_rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Port of `groupRowsWooAware` using a parent-name index instead of a scan per variation."""
+    typ = _pick(df, ["Type", "type"]).str.lower().to_numpy()
+    name = _col(df, "Name")
+    name_keb = _kebab(name)
+    sku_id_name = _pick(df, ["SKU", "ID", "Name"])
+    key_variable = sku_id_name.where(sku_id_name != "", name_keb).to_numpy()
+    id_sku_name = _pick(df, ["ID", "SKU", "Name"])
+    key_simple = id_sku_name.where(id_sku_name != "", name_keb).to_numpy()
+    parent_ref = _col(df, "Parent").to_numpy()
+    name_root = name.str.replace(_NAME_ROOT_RE, "", regex=True, flags=re.I).str.strip().str.lower().to_numpy()
+    name_lc = name.str.lower().to_numpy()
+
+    groups: List[Dict[str, Any]] = []
+    by_key: Dict[str, int] = {}
+    by_parent_name: Dict[str, int] = {}
+
+    def _new(key, parent=None):
+        by_key[key] = len(groups)
+        groups.append({"key": key, "parent": parent, "variants": [], "singles": []})
+        return by_key[key]
+
+    # First pass: register variable parents
+    for i in np.flatnonzero(typ == "variable"):
+        k = key_variable[i]
+        if k not in by_key:
+            g = _new(k, int(i))
+            if name_lc[i]:
+                by_parent_name.setdefault(name_lc[i], g)
+    # Second pass: attach variations (Parent ref, then name root, else orphan)
+    for i in np.flatnonzero(typ == "variation"):
+        g = by_key.get(parent_ref[i]) if parent_ref[i] else None
+        if g is None and name_root[i]:
+            g = by_parent_name.get(name_root[i])
+        if g is not None:
+            groups[g]["variants"].append(int(i))
+        else:
+            k = key_variable[i]
+            g = by_key[k] if k in by_key else _new(k)
+            groups[g]["singles"].append(int(i))
+    # Third pass: simples (and anything untyped)
+    for i in np.flatnonzero((typ != "variable") & (typ != "variation")):
+        k = key_simple[i]
+        g = by_key[k] if k in by_key else _new(k)
+        groups[g]["singles"].append(int(i))
+    return groups
+
+def prepare_catalog(df: pd.DataFrame, headers: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Parse-time work shared by every run on the same upload (grouping, attributes, cell parsing)."""
+    df = df.fillna("").astype(str) if len(df.columns) else df
+    headers = list(headers) if headers is not None else [str(c) for c in df.columns]
+    groups = _group_rows(df)
+
+    title = _pick(df, ["Name", "Product Name", "Title"])
+    title = title.where(title != "", "(Untitled)")
+    reg = _to_number(_pick(df, ["Regular price", "Price", "price", "Variant Price"]))
+    sale = _to_number(_pick(df, ["Sale price", "Sale Price", "Variant Compare At Price"]))
+    use_sale = (sale.notna() & (sale != 0) & reg.notna() & (reg != 0) & (sale < reg)).to_numpy()
+    cells = pd.DataFrame({
+        "type": _pick(df, ["Type", "type"]).str.lower(),
+        "title": title,
+        "handle": _kebab(title),
+        "body": _pick(df, ["description", "Description", "Body (HTML)", "Short description"]),
+        "vendor": _pick(df, ["Vendor", "Brand", "vendor"]),
+        "tags": _pick(df, ["Tags", "Tag", "tags"]),
+        "price": np.where(use_sale, sale, reg),
+        "compare": np.where(use_sale, reg, np.nan),
+        "sku": _pick(df, ["SKU", "Sku", "sku", "Variant SKU"]).str.strip(),
+        "stock": _to_number(_pick(df, ["Stock", "stock", "Stock Quantity", "Inventory"])),
+        "var_img": _first_csv_part(_pick(df, ["Variant Image", "Images", "Image URL", "image"])),
+        "images": _pick(df, ["Images", "Image URL", "image", "Image"]),
+    })
+
+    attrs = _attribute_table(df, headers)
+    # variantRows0 membership: each row belongs to at most one group's working set
+    member = np.full(len(df), -1, dtype=np.int64)
+    for gi, g in enumerate(groups):
+        for r in (g["variants"] or g["singles"]):
+            member[r] = gi
+    return {
+        "headers": headers,
+        "row_count": int(len(df)),
+        "groups": groups,
+        "cells": cells,
+        "attrs": attrs,
+        "member": member,
+    }
+
+def load_catalog(file_bytes: bytes) -> Dict[str, Any]:
+    """read_catalog + prepare_catalog; the two parse spans stay on the catalog as "parse_spans"."""
+    timer = StageTimer()
+    df = read_catalog(file_bytes)
+    timer.mark("read_csv", rows_out=int(len(df)), nbytes=len(file_bytes))
+    catalog = prepare_catalog(df)
+    timer.mark("group", rows_in=catalog["row_count"], rows_out=len(catalog["groups"]))
+    catalog["parse_spans"] = timer.spans
+    return catalog
+
+def parse_timings(timer: StageTimer, catalog: Dict[str, Any], cached: bool) -> None:
+    """Add a catalog's parse spans to `timer`; a cache hit shows as one zero-length span."""
+    if cached or not catalog.get("parse_spans"):
+        timer.mark("parse", rows_out=catalog["row_count"], cached=True)
+    else:
+        timer.extend(catalog["parse_spans"])
+
+# ------------------------ Option analysis --------------------------
+def _varying_by_group(catalog: Dict[str, Any], group_ids: List[int]) -> Dict[int, List[Tuple[str, int]]]:
+    """`analyzeVaryingAttributes` for many groups at once → {group: [(name, distinctCount), ...]}."""
+    at = catalog["attrs"]
+    if at.empty or not group_ids:
+        return {}
+    member = catalog["member"]
+    g = member[at["row"].to_numpy(dtype=np.int64)]
+    sel = np.isin(g, np.asarray(group_ids, dtype=np.int64))
+    sub = at.loc[sel, ["name", "vals"]].assign(g=g[sel])
+    if sub.empty:
+        return {}
+    # first-appearance order of names per group
+    names = sub.drop_duplicates(["g", "name"])[["g", "name"]]
+    ex = sub.explode("vals").dropna(subset=["vals"])
+    counts = ex.drop_duplicates(["g", "name", "vals"]).groupby(["g", "name"], sort=False).size().to_dict()
+    out: Dict[int, List[Tuple[str, int]]] = {}
+    for gi, nm in zip(names["g"].tolist(), names["name"].tolist()):
+        out.setdefault(gi, []).append((nm, int(counts.get((gi, nm), 0))))
+    return out
+
+def choose_options(varying: List[Tuple[str, int]], limit: int = 3, forced_priority: Any = None) -> Dict[str, List[str]]:
+    """Port of `chooseOptions`: priority order, then distinctness, then name."""
+    cands = [(n, c) for n, c in varying if c > 1]
+    cands.sort(key=lambda nc: (PRIORITY_INDEX.get(str(nc[0]).lower(), 999), -nc[1], _locale_key(nc[0])))
+    chosen = [n for n, _ in cands[:limit]]
+    overflow = [n for n, _ in cands[limit:]]
+    if isinstance(forced_priority, list) and forced_priority:
+        cand_lc = {n.lower() for n, _ in cands}
+        forced = [str(n).strip() for n in forced_priority]
+        forced = [n for n in forced if n.lower() in cand_lc][:limit]
+        forced_lc = [f.lower() for f in forced]
+        rest = [n for n, _ in cands if n.lower() not in forced_lc]
+        chosen = (forced + rest)[:limit]
+    return {"chosen": chosen, "overflow": overflow}
+
+def _override_options(per: Dict[str, Any], names_all: List[str], option_priority: Any) -> List[str]:
+    names_lc = [n.lower() for n in names_all]
+    cap = [str(s).lower() for s in per["chosen_options"]]
+    cap = [c for c in cap if c in names_lc][:3]
+    pri = [str(x).lower() for x in option_priority] if isinstance(option_priority, list) else []
+    cap.sort(key=lambda c: (pri.index(c) if c in pri else 999, _locale_key(c)))
+    return [names_all[names_lc.index(c)] for c in cap[:3]]
+
+def _attr_lookup(attrs: pd.DataFrame, rows: np.ndarray, names: np.ndarray, key: str) -> np.ndarray:
+    """Per (row, exact name) attribute lookup with last-wins semantics (`Object.fromEntries`)."""
+    if attrs.empty or not len(rows):
+        return np.full(len(rows), "", dtype=object)
+    idx = attrs.drop_duplicates(["row", "name"], keep="last").set_index(["row", "name"])[key]
+    found = idx.reindex(pd.MultiIndex.from_arrays([rows, names]))
+    return found.fillna("").to_numpy(dtype=object)
+
+def _pipe_values(vals: Tuple[str, ...]) -> List[str]:
+    # `splitPipeValues(a.values.join("|"))` — custom columns may still carry pipes
+    return [x.strip() for x in "|".join(vals).split("|") if x.strip()]
+
+def _distinct_pipe_values(vals: Tuple[str, ...]) -> Tuple[List[str], int]:
+    """Port of `pipeOptionValues` for one option: distinct values in first-seen order, and how many
+    repeats were merged away (`repeatedOptionValues`)."""
+    raw = _pipe_values(vals)
+    distinct = list(dict.fromkeys(raw))
+    return distinct, len(raw) - len(distinct)
+
+def variant_cap(strategy: Dict[str, Any]) -> int:
+    """strategy.max_variants_per_product when it is a positive integer, else the default."""
+    cap = strategy.get("max_variants_per_product")
+    return cap if isinstance(cap, int) and not isinstance(cap, bool) and cap > 0 else DEFAULT_VARIANT_CAP
+
+def _expand_combos(per_opt: List[List[str]], cap: int) -> List[Tuple[str, ...]]:
+    """Lazy port of the node's cartesian expansion: combinations in `itertools.product` order,
+    stopping at the first one past `cap` (enough for `_build_lines` to flag the product).
+    `per_opt` lists are distinct values (see `_distinct_pipe_values`), so every combination is too."""
+    return list(itertools.islice(itertools.product(*per_opt), cap + 1))
+
+def _overflow_values(attrs: pd.DataFrame, rows: List[int], overflow: List[str]) -> Dict[str, List[str]]:
+    """Port of `collectOverflowValues`."""
+    lc = {n.lower() for n in overflow}
+    sub = attrs[attrs["row"].isin(rows) & attrs["name_lc"].isin(lc)]
+    out: Dict[str, List[str]] = {}
+    for nm, vals in zip(sub["name"].to_numpy(), sub["vals"].to_numpy()):
+        bucket = out.setdefault(nm, [])
+        for v in vals:
+            if v not in bucket:
+                bucket.append(v)
+    return out
+
+def _overflow_html(overflow_map: Dict[str, List[str]]) -> str:
+    if not overflow_map:
+        return ""
+    chips = [f"{k}: {' | '.join(v)}" for k, v in overflow_map.items()]
+    return f"\n<p><em>• {' • '.join(chips)}</em></p>"
+
+# --------------------------- Transform -----------------------------
+def transform_groups(
+    catalog: Dict[str, Any],
+    group_ids: List[int],
+    strategy: Dict[str, Any],
+    overrides: Dict[str, Any],
+    progress: Optional[Progress] = None,
+) -> Dict[str, Any]:
+    """Build output rows, issues and applied overrides for a set of product groups.
+
+    Groups are independent here; the only cross-group step (overflow HTML lands on the first
+    titled row of a handle) is returned as `patches` and resolved in `_output_frame`.
+    """
+    groups = catalog["groups"]
+    cells = catalog["cells"]
+    attrs = catalog["attrs"]
+    per_product = overrides.get("per_product") if isinstance(overrides.get("per_product"), dict) else {}
+    rules = rule_index(overrides)
+    option_priority = strategy.get("option_priority")
+    sku_strategy = strategy.get("sku_generation") or "keep_parent"
+    cap = variant_cap(strategy)
+
+    varying = _varying_by_group(catalog, group_ids)
+    cell_type = cells["type"].to_numpy()
+    cell_title = cells["title"].to_numpy()
+    cell_handle = cells["handle"].to_numpy()
+    cell_images = cells["images"].to_numpy()
+    attr_row = attrs["row"].to_numpy()
+    attr_name = attrs["name"].to_numpy(dtype=object)
+    attr_vals = attrs["vals"].to_numpy(dtype=object)
+
+    line_g, line_row, line_idx, line_syn, line_clear = [], [], [], [], []
+    group_meta: Dict[int, Dict[str, Any]] = {}
+    group_issues: List[Tuple[int, Dict[str, Any]]] = []
+    group_applied: List[Tuple[int, Dict[str, Any]]] = []
+    patches: List[Tuple[int, str, str, str]] = []
+    image_g, image_src, image_pos = [], [], []
+
+    def group_rows(g):
+        return len(g["variants"]) + len(g["singles"]) + (g["parent"] is not None)
+    rows_total = sum(group_rows(groups[gi]) for gi in group_ids) if progress else 0
+    rows_done = 0
+
+    for n, gi in enumerate(group_ids):
+        g = groups[gi]
+        if progress:
+            if n % PROGRESS_EVERY == 0:
+                progress("transform", rows_done, rows_total)
+            rows_done += group_rows(g)
+        rows0 = g["variants"] or g["singles"]
+        if not rows0:
+            continue
+        pr = g["parent"] if g["parent"] is not None else rows0[0]
+        handle = cell_handle[pr]
+        var0 = varying.get(gi, [])
+        names_all = [n for n, c in var0 if c > 1]
+
+        per, rule = per_product.get(handle), None
+        if rules and not (per and isinstance(per.get("chosen_options"), list) and per["chosen_options"]):
+            per = rule = rules.get(attr_set_key(names_all))
+        has_override = bool(per and isinstance(per.get("chosen_options"), list) and per["chosen_options"])
+        if has_override:
+            chosen = _override_options(per, names_all, option_priority)
+        else:
+            chosen = choose_options(var0, 3, option_priority)["chosen"]
+
+        # Synthesize variants for "simple" with multi-value chosen attrs
+        expanded = None
+        if cell_type[pr] == "simple" and len(rows0) == 1 and chosen:
+            lo, hi = np.searchsorted(attr_row, [pr, pr + 1])
+            by_name = dict(zip(attr_name[lo:hi], attr_vals[lo:hi]))
+            by_lc = {k.lower(): v for k, v in by_name.items()}
+            if any(len(set(_pipe_values(by_lc.get(str(n).lower(), ())))) > 1 for n in chosen):
+                split = [_distinct_pipe_values(by_name.get(n, ())) for n in chosen]
+                per_opt = [vals or [""] for vals, _ in split]
+                expanded = _expand_combos(per_opt, cap)
+                repeated = sum(r for _, r in split)
+                if repeated:
+                    group_issues.append((gi, {"code": "DUP_OPTION_VALUES", "field": "Options",
+                                              "value": repeated, "handle": handle}))
+
+        if expanded is None:
+            line_g.extend([gi] * len(rows0))
+            line_row.extend(rows0)
+            line_idx.extend(range(len(rows0)))
+            line_syn.extend([("", "", "")] * len(rows0))
+            line_clear.extend([False] * len(rows0))
+        else:
+            n = len(expanded)
+            line_g.extend([gi] * n)
+            line_row.extend([pr] * n)
+            line_idx.extend(range(n))
+            line_syn.extend(tuple(combo) + ("",) * (3 - len(combo)) for combo in expanded)
+            line_clear.extend([sku_strategy == "generate_unique"] * n)
+
+        candidates = len(rows0) if expanded is None else math.prod(len(v) for v in per_opt)
+        group_meta[gi] = {"handle": handle, "title": cell_title[pr], "pr": pr, "chosen": chosen,
+                          "candidates": candidates}
+
+        imgs = [x.strip() for x in cell_images[pr].split(",") if x.strip()] if cell_images[pr] else []
+        image_g.extend([gi] * len(imgs))
+        image_src.extend(imgs)
+        image_pos.extend(range(1, len(imgs) + 1))
+
+        # Overflow → QA issue or applied override (+ optional Body/Metafields demotion)
+        chosen_lc = {c.lower() for c in chosen}
+        overflow_now = [n for n in names_all if n.lower() not in chosen_lc]
+        if has_override:
+            rec = {"type": "cap_options", "handle": handle, "chosen": chosen, "overflow": overflow_now}
+            if rule is not None:
+                rec["rule"] = rule["rule"]
+            group_applied.append((gi, rec))
+            if overflow_now and per.get("overflow_to") == "append_to_body_html":
+                rows_for_overflow = [pr] if expanded is not None else rows0
+                omap = _overflow_values(attrs, rows_for_overflow, overflow_now)
+                patches.append((gi, handle, _overflow_html(omap),
+                                json.dumps({"overflow": omap}, ensure_ascii=False, separators=(",", ":"))))
+        elif overflow_now:
+            group_issues.append((gi, {"code": "EXCESS_OPTION_DIMENSIONS", "field": "Options",
+                                      "handle": handle, "attrs": names_all}))
+
+    lines = _build_lines(catalog, group_meta, line_g, line_row, line_idx, line_syn, line_clear,
+                         strategy, overrides)
+    if progress:
+        progress("transform", rows_total, rows_total)
+    images = pd.DataFrame({"g": image_g, "Image Src": image_src, "Image Position": image_pos})
+    if len(images):
+        images["Handle"] = [group_meta[g]["handle"] for g in image_g]
+
+    # group-level records sort after every line of their group, like the JS loop
+    issues = lines["issues"]
+    if group_issues:
+        gl = pd.DataFrame([dict(rec, g=gi, idx=GROUP_LEVEL, sub=0) for gi, rec in group_issues])
+        issues = pd.concat([issues, gl], ignore_index=True) if len(issues) else gl
+    applied = lines["applied"]
+    if group_applied:
+        ga = pd.DataFrame([dict(rec, g=gi, idx=GROUP_LEVEL) for gi, rec in group_applied])
+        applied = pd.concat([applied, ga], ignore_index=True) if len(applied) else ga
+    return {
+        "group_ids": list(group_ids),
+        "lines": lines["rows"],
+        "images": images,
+        "issues": issues.sort_values(["g", "idx", "sub"], kind="stable").reset_index(drop=True),
+        "applied": applied.sort_values(["g", "idx"], kind="stable").reset_index(drop=True),
+        "patches": patches,
+    }
+
+def _build_lines(catalog, group_meta, line_g, line_row, line_idx, line_syn, line_clear, strategy, overrides):
+    """Column-wise variant line build: option values, dup combos, prices, SKUs, QA."""
+    cells = catalog["cells"]
+    attrs = catalog["attrs"]
+    g = np.asarray(line_g, dtype=np.int64)
+    row = np.asarray(line_row, dtype=np.int64)
+    n = len(g)
+    lines = pd.DataFrame({"g": g, "row": row, "idx": np.asarray(line_idx, dtype=np.int64)})
+    lines["pr"] = np.array([group_meta[x]["pr"] for x in line_g], dtype=np.int64)
+    lines["Handle"] = np.array([group_meta[x]["handle"] for x in line_g], dtype=object)
+
+    has_chosen = np.array([bool(group_meta[x]["chosen"]) for x in line_g], dtype=bool)
+    syn = np.array(line_syn, dtype=object).reshape(n, 3) if n else np.empty((0, 3), dtype=object)
+    for k in range(3):
+        chosen_k = np.array([(group_meta[x]["chosen"][k] if len(group_meta[x]["chosen"]) > k else "")
+                             for x in line_g], dtype=object)
+        looked = _attr_lookup(attrs, row, chosen_k, "first")
+        ov = np.where(syn[:, k] != "", syn[:, k], looked) if n else looked
+        lines[f"Option{k + 1} Name"] = chosen_k
+        lines[f"Option{k + 1} Value"] = np.where(chosen_k != "", ov, "")
+
+    combo = lines["Option1 Value"] + "||" + lines["Option2 Value"] + "||" + lines["Option3 Value"]
+    dup = has_chosen & lines.duplicated(["g", "Option1 Value", "Option2 Value", "Option3 Value"]).to_numpy()
+
+    # Variant cap: a product stops at its first kept line past the cap (later lines, repeats
+    # included, are never looked at by the node)
+    cap = variant_cap(strategy)
+    kept_no = pd.Series(~dup).groupby(g).cumsum().to_numpy() if n else np.array([], dtype=np.int64)
+    over = ~dup & (kept_no > cap)
+    limit_frame = None
+    if over.any():
+        first = lines[over].groupby("g")["idx"].min()
+        limit_frame = pd.DataFrame({
+            "g": first.index.to_numpy(), "idx": first.to_numpy(), "sub": 0, "code": "VARIANT_LIMIT_EXCEEDED",
+            "field": "Options", "handle": [group_meta[x]["handle"] for x in first.index],
+            "value": np.array([group_meta[x]["candidates"] for x in first.index], dtype=object),
+            "limit": np.full(len(first), cap, dtype=object),
+        })
+        keep = (lines["idx"] < lines["g"].map(first).fillna(np.inf)).to_numpy()
+        lines, combo = lines[keep].reset_index(drop=True), combo[keep].reset_index(drop=True)
+        g, row, dup = g[keep], row[keep], dup[keep]
+        line_clear = np.asarray(line_clear, dtype=bool)[keep]
+        n = len(g)
+
+    price = cells["price"].to_numpy()[row] if n else np.array([], dtype=float)
+    compare = cells["compare"].to_numpy()[row] if n else np.array([], dtype=float)
+    fmp = strategy.get("fix_missing_price") or None
+    mode = fmp if isinstance(fmp, str) else (str(fmp.get("mode")).lower() if isinstance(fmp, dict) else None)
+    missing = np.isnan(price) & ~dup
+    fix_type = np.full(n, "", dtype=object)
+    if mode == "zero":
+        fix_type[missing] = "fix_missing_price_zero"
+        price = np.where(missing, 0.0, price)
+    elif mode == "copy_compare_at":
+        has_cmp = ~np.isnan(compare)
+        fix_type[missing & has_cmp] = "fix_missing_price_copy_compare_at"
+        fix_type[missing & ~has_cmp] = "fix_missing_price_fallback_zero"
+        price = np.where(missing, np.where(has_cmp, compare, 0.0), price)
+
+    sku = cells["sku"].to_numpy()[row] if n else np.array([], dtype=object)
+    sku = np.where(np.asarray(line_clear, dtype=bool), "", sku) if n else sku
+    auto = (sku == "") & ~dup
+    if auto.any():
+        auto_sku = lines["Handle"] + "-" + (lines["idx"] + 1).astype(str).str.zfill(3)
+        sku = np.where(auto, auto_sku.to_numpy(), sku)
+    stock = cells["stock"].to_numpy()[row] if n else np.array([], dtype=float)
+    var_img = cells["var_img"].to_numpy()[row] if n else np.array([], dtype=object)
+
+    lines["Variant SKU"] = sku
+    lines["Variant Price"] = price
+    lines["Variant Compare At Price"] = compare
+    lines["Variant Inventory Qty"] = np.where(np.isnan(stock) | (stock == 0), np.nan, stock)
+    lines["Variant Image"] = var_img
+    lines["dup"] = dup
+    lines["combo"] = combo
+
+    # QA issues, tagged with (g, idx, sub) so they can be ordered exactly like the JS loop
+    issue_frames = [limit_frame] if limit_frame is not None else []
+    suppress_dup = overrides.get("dedupe_handles") is True
+    if dup.any() and not suppress_dup:
+        issue_frames.append(pd.DataFrame({
+            "g": g[dup], "idx": lines["idx"].to_numpy()[dup], "sub": 0, "code": "DUP_VARIANT_COMBO",
+            "field": "Options", "value": combo.to_numpy()[dup], "handle": lines["Handle"].to_numpy()[dup],
+        }))
+    if auto.any():
+        issue_frames.append(pd.DataFrame({
+            "g": g[auto], "idx": lines["idx"].to_numpy()[auto], "sub": 1, "code": "AUTO_SKU_ASSIGNED",
+            "field": "Variant SKU", "value": sku[auto], "handle": lines["Handle"].to_numpy()[auto],
+        }))
+    no_price = np.isnan(price) & ~dup
+    if no_price.any():
+        issue_frames.append(pd.DataFrame({
+            "g": g[no_price], "idx": lines["idx"].to_numpy()[no_price], "sub": 3, "code": "REQ_MISSING_PRICE",
+            "field": "Variant Price", "handle": lines["Handle"].to_numpy()[no_price], "sku": sku[no_price],
+        }))
+    issues = (pd.concat(issue_frames, ignore_index=True) if issue_frames
+              else pd.DataFrame({"g": [], "idx": [], "sub": [], "code": [], "field": [], "handle": []}))
+
+    fixed = fix_type != ""
+    applied = pd.DataFrame({
+        "g": g[fixed], "idx": lines["idx"].to_numpy()[fixed],
+        "type": fix_type[fixed], "handle": lines["Handle"].to_numpy()[fixed],
+    })
+
+    kept = lines[~dup]
+    return {"rows": kept.drop(columns=["dup", "combo"]), "issues": issues, "applied": applied}
+
+# ------------------------ Parallel transform -----------------------
+# One process pool for the whole process, started on first use and shut down at exit. Workers are
+# started by forkserver (spawn where there is none), never forked from the caller: the callers are
+# threaded (HTTP server, job threads, Streamlit) and a fork could inherit a lock some thread holds.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()
+# Worker side: (token, catalog) of the last catalog this process was sent
+_WORKER_CATALOG: Optional[Tuple[str, Dict[str, Any]]] = None
+
+def pool_workers() -> int:
+    """MC_TRANSFORM_WORKERS: processes in the shared transform pool (1 = no pool, serial)."""
+    try:
+        return max(1, int(os.getenv("MC_TRANSFORM_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+def transform_pool(workers: int) -> Tuple[ProcessPoolExecutor, int]:
+    """The shared pool and its size; created on first use with max(workers, MC_TRANSFORM_WORKERS)
+    processes. Its size is then fixed: larger requests are run on fewer shards (shutdown_pool() to resize)."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _POOL_SIZE = max(int(workers), pool_workers())
+            _POOL = ProcessPoolExecutor(max_workers=_POOL_SIZE, mp_context=ctx)
+        return _POOL, _POOL_SIZE
+
+def shutdown_pool() -> None:
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        pool, _POOL, _POOL_SIZE = _POOL, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+atexit.register(shutdown_pool)
+
+def shard_groups(catalog: Dict[str, Any], shards: int) -> List[List[int]]:
+    """Group ids → `shards` lists by a stable hash (crc32) of each group's handle.
+
+    Every group of a handle lands in the same shard; each shard keeps input order.
+    """
+    out: List[List[int]] = [[] for _ in range(shards)]
+    for handle, gids in _handle_index(catalog)["transform"].items():
+        out[zlib.crc32(str(handle).encode("utf-8")) % shards].extend(gids)
+    return [sorted(s) for s in out if s]
+
+def _transform_shard(token: str, payload: Optional[bytes], group_ids: List[int], strategy: Dict[str, Any],
+                     overrides: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """One shard in a pool worker. None when this worker does not hold the catalog and none was sent:
+    the caller re-submits with the pickled catalog, which the worker then keeps for later runs."""
+    global _WORKER_CATALOG
+    if _WORKER_CATALOG is None or _WORKER_CATALOG[0] != token:
+        if payload is None:
+            return None
+        _WORKER_CATALOG = (token, pickle.loads(payload))
+    return transform_groups(_WORKER_CATALOG[1], group_ids, strategy, overrides)
+
+def _concat_sorted(frames: List[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    filled = [f for f in frames if len(f)]
+    if not filled:
+        return frames[0]
+    if len(filled) == 1:
+        return filled[0]
+    return pd.concat(filled, ignore_index=True).sort_values(keys, kind="stable").reset_index(drop=True)
+
+def merge_batches(batches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """transform_groups results for disjoint shards → the batch a serial run over all of them returns."""
+    return {
+        "group_ids": sorted(gi for b in batches for gi in b["group_ids"]),
+        "lines": _concat_sorted([b["lines"] for b in batches], ["g", "idx"]),
+        "images": _concat_sorted([b["images"] for b in batches], ["g"]),
+        "issues": _concat_sorted([b["issues"] for b in batches], ["g", "idx", "sub"]),
+        "applied": _concat_sorted([b["applied"] for b in batches], ["g", "idx"]),
+        # overflow HTML for a handle is appended in group order, as the serial loop does
+        "patches": sorted((p for b in batches for p in b["patches"]), key=lambda p: p[0]),
+    }
+
+def transform_parallel(
+    catalog: Dict[str, Any],
+    strategy: Dict[str, Any],
+    overrides: Dict[str, Any],
+    workers: int,
+    progress: Optional[Progress] = None,
+) -> Dict[str, Any]:
+    """transform_groups over every group, sharded across `workers` processes of the shared pool.
+
+    Shards go out with only a catalog token; a worker that does not hold that catalog yet gets it
+    pickled (once per call, on demand) and keeps it, so re-runs on the same upload ship nothing.
+    Workers send back only their shard's frames; progress advances as shards finish.
+    """
+    groups = catalog["groups"]
+    shards = shard_groups(catalog, workers)
+    sizes = [sum(len(groups[gi]["variants"]) + len(groups[gi]["singles"]) + (groups[gi]["parent"] is not None)
+                 for gi in shard) for shard in shards]
+    rows_total, rows_done = sum(sizes), 0
+    if progress:
+        progress("transform", 0, rows_total)
+    token = catalog.setdefault("_pool_token", uuid.uuid4().hex)
+    payload: Optional[bytes] = None
+    pool, _ = transform_pool(workers)
+    batches: List[Dict[str, Any]] = []
+    pending: Dict[Any, int] = {}
+    try:
+        pending = {pool.submit(_transform_shard, token, None, shard, strategy, overrides): n
+                   for n, shard in enumerate(shards)}
+        while pending:
+            for fut in as_completed(list(pending)):
+                n = pending.pop(fut)
+                batch = fut.result()
+                if batch is None:
+                    if payload is None:
+                        payload = pickle.dumps(catalog, protocol=pickle.HIGHEST_PROTOCOL)
+                    pending[pool.submit(_transform_shard, token, payload, shards[n], strategy, overrides)] = n
+                    continue
+                batches.append(batch)
+                rows_done += sizes[n]
+                if progress:
+                    progress("transform", rows_done, rows_total)
+    except BrokenProcessPool:
+        shutdown_pool()  # a worker died; the next call starts a fresh pool
+        raise
+    except BaseException:
+        for fut in pending:  # e.g. a cancelled job's progress callback: drop the shards not started yet
+            fut.cancel()
+        raise
+    return merge_batches(batches)
+
+# ---------------------------- Assembly -----------------------------
+def _records(frame: pd.DataFrame, key: str, keys_for: Dict[str, List[str]], default: List[str]) -> List[Dict[str, Any]]:
+    """Frame → list of dicts in frame order, with only the keys each record type carries."""
+    if not len(frame):
+        return []
+    out: List[Optional[Dict[str, Any]]] = [None] * len(frame)
+    pos = np.arange(len(frame))
+    for kind, sub_pos in pd.Series(pos).groupby(frame[key].to_numpy(), sort=False):
+        cols = keys_for.get(kind, default)
+        sub = frame.iloc[sub_pos.to_numpy()][cols]
+        for p, rec in zip(sub_pos.tolist(), sub.to_dict("records")):
+            out[p] = rec
+    return out
+
+def _issue_records(issues: pd.DataFrame) -> List[Dict[str, Any]]:
+    return _records(issues, "code", ISSUE_KEYS, ["code", "field", "handle"])
+
+def issue_counts(issues: pd.DataFrame) -> Dict[str, int]:
+    """Issues per code, in order of first appearance."""
+    if not len(issues):
+        return {}
+    return {str(k): int(v) for k, v in issues.groupby("code", sort=False).size().items()}
+
+def issue_index(issues: pd.DataFrame, totals: Dict[str, Any]) -> Dict[str, Any]:
+    """The qa block: counts per code and per handle, ISSUE_SAMPLE examples per code and the
+    first ISSUE_PAGE issues; `next_cursor` (with the run id) pages the rest via issues_page()."""
+    n = int(len(issues))
+    handles: Dict[str, Any] = {"count": 0, "top": {}}
+    samples: Dict[str, List[Dict[str, Any]]] = {}
+    if n:
+        per_handle = issues.groupby("handle", sort=False).size()
+        top = per_handle.sort_values(ascending=False, kind="stable").head(ISSUE_TOP_HANDLES)
+        handles = {"count": int(len(per_handle)), "top": {str(h): int(c) for h, c in top.items()}}
+        for rec in _issue_records(issues.groupby("code", sort=False).head(ISSUE_SAMPLE)):
+            samples.setdefault(rec["code"], []).append(rec)
+    return {
+        "blocking": totals["blocking"],
+        "warnings": totals["warnings"],
+        "total": n,
+        "counts": issue_counts(issues),
+        "handles": handles,
+        "samples": samples,
+        "issues": _issue_records(issues.iloc[:ISSUE_PAGE]),
+        "next_cursor": str(ISSUE_PAGE) if n > ISSUE_PAGE else None,
+    }
+
+def _applied_records(applied: pd.DataFrame) -> List[Dict[str, Any]]:
+    recs = _records(applied, "type", {"cap_options": ["type", "handle", "chosen", "overflow"]}, ["type", "handle"])
+    if "rule" in applied.columns:
+        # overrides resolved from overrides.rules name their rule; per_product ones carry NaN here
+        for rec, rule in zip(recs, applied["rule"].tolist()):
+            if rule == rule and rule is not None:
+                rec["rule"] = int(rule)
+    return recs
+
+def _output_frame(catalog: Dict[str, Any], batch: Dict[str, Any]) -> pd.DataFrame:
+    """Interleave variant lines and image rows per group; fill product-level fields on idx 0."""
+    cells = catalog["cells"]
+    lines = batch["lines"].copy()
+    first = (lines["idx"] == 0).to_numpy()
+    pr = lines["pr"].to_numpy()
+    for col, src in (("Title", "title"), ("Body (HTML)", "body"), ("Vendor", "vendor"), ("Tags", "tags")):
+        lines[col] = np.where(first, cells[src].to_numpy()[pr], "")
+    lines["_first"] = first
+    lines["_part"] = 0
+    lines["_pos"] = lines["idx"]
+    images = batch["images"]
+    if len(images):
+        images = images.assign(_first=False, _part=1, _pos=images["Image Position"])
+        out = pd.concat([lines, images], ignore_index=True)
+    else:
+        out = lines
+    out = out.sort_values(["g", "_part", "_pos"], kind="stable").reset_index(drop=True)
+    for c in SHOPIFY_STD_COLS:
+        if c not in out.columns:
+            out[c] = ""
+    out = out.fillna({c: "" for c in ("Handle", "Title", "Body (HTML)", "Vendor", "Tags", "Image Src",
+                                        "Option1 Name", "Option2 Name", "Option3 Name",
+                                        "Option1 Value", "Option2 Value", "Option3 Value",
+                                        "Variant SKU", "Variant Image")})
+    out["Metafields"] = ""
+
+    # Overflow demotion lands on the first titled row of the handle (may be an earlier group)
+    if batch["patches"]:
+        first_rows = out.index[out["_first"].astype(bool)]
+        first_by_handle: Dict[str, int] = {}
+        for i, h in zip(first_rows, out.loc[first_rows, "Handle"]):
+            first_by_handle.setdefault(h, i)
+        for _, handle, html, mf in batch["patches"]:
+            i = first_by_handle.get(handle)
+            if i is None:
+                continue
+            out.at[i, "Body (HTML)"] = str(out.at[i, "Body (HTML)"]) + html
+            out.at[i, "Metafields"] = mf
+    return out
+
+def _counters(out: pd.DataFrame) -> Dict[str, int]:
+    lines = out[out["_part"] == 0]
+    return {
+        "slugify_handle": int((out["_first"].astype(bool) & (out["Handle"] != "")).sum()),
+        "numeric_parse_price": int(pd.to_numeric(lines["Variant Price"], errors="coerce").notna().sum()),
+        "numeric_parse_compare_at": int(pd.to_numeric(lines["Variant Compare At Price"], errors="coerce").notna().sum()),
+        "variant_image_first": int((lines["Variant Image"] != "").sum()),
+    }
+
+def _gate(issues: pd.DataFrame, strict_mode: bool) -> Tuple[Dict[str, Any], set]:
+    codes = issues["code"] if len(issues) else pd.Series([], dtype=object)
+    blocking = int(codes.isin(BLOCKING_CODES).sum())
+    warnings = int(len(codes) - blocking)
+    unresolved = set(issues.loc[codes == "EXCESS_OPTION_DIMENSIONS", "handle"]) if len(issues) else set()
+    needs_override = blocking > 0 if strict_mode else (blocking > 0 or len(unresolved) > 0)
+    reasons = []
+    if blocking > 0:
+        reasons.append("Missing required fields (Title or Variant Price).")
+    if not strict_mode and unresolved:
+        reasons.append("More than 3 varying attributes — resolve per product.")
+    return {"blocking": blocking, "warnings": warnings,
+            "gate": {"needs_override": needs_override, "reasons": reasons}}, unresolved
+
+def _decision_meta(catalog: Dict[str, Any], started_at: str) -> Dict[str, Any]:
+    return {
+        "started_at": started_at,
+        "signature": "|".join(catalog["headers"]),
+        "header_count": len(catalog["headers"]),
+        "row_count": catalog["row_count"],
+        "completed_at": _iso_now(),
+    }
+
+def _transforms(out: pd.DataFrame) -> List[Dict[str, Any]]:
+    counters = _counters(out)
+    return [{"rule": k, "applied_to": counters[k]} for k in
+            ("slugify_handle", "numeric_parse_price", "numeric_parse_compare_at", "variant_image_first")]
+
+def assemble_response(
+    catalog: Dict[str, Any],
+    out: pd.DataFrame,
+    issues_df: pd.DataFrame,
+    applied_df: pd.DataFrame,
+    strategy: Dict[str, Any],
+    strict_mode: bool,
+    source: Optional[Dict[str, Any]] = None,
+    policy: Optional[Dict[str, Any]] = None,
+    started_at: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    """QA roll-up, gate, handles_with_overflow, CSV and decision_log for a transformed catalog."""
+    started_at = started_at or _iso_now()
+    timer = timer or StageTimer()
+    applied = _applied_records(applied_df)
+    totals, unresolved = _gate(issues_df, strict_mode)
+    qa = issue_index(issues_df, totals)
+    timer.mark("qa", rows_in=int(len(out)), rows_out=qa["total"])
+    handles_with_overflow = _handles_with_overflow(catalog, unresolved, strategy)
+    timer.mark("overflow", rows_in=len(unresolved), rows_out=len(handles_with_overflow))
+    preview = preview_rows(out, 0, PREVIEW_LIMIT)
+    csv_metas = write_csv_artifacts(out, csv_split_bytes(strategy))
+    timer.mark("csv", rows_in=int(len(out)), rows_out=int(len(out)), nbytes=sum(m["bytes"] for m in csv_metas),
+               compressed_bytes=sum(m["compressed_bytes"] for m in csv_metas), files=len(csv_metas))
+
+    gate = totals["gate"]
+    policy_out = {"duplicate_handle": "flag_only", "missing_sku": "default_auto_suffix", **(policy or {})}
+    decision_log = {
+        "meta": _decision_meta(catalog, started_at),
+        "transforms": _transforms(out),
+        "qa": {"blocking": qa["blocking"], "warnings": qa["warnings"], "counts": qa["counts"]},
+        "gate": gate,
+        "policy": policy_out,
+        "strategy_applied": {
+            "strict_mode": strict_mode,
+            "option_priority": strategy.get("option_priority") if isinstance(strategy.get("option_priority"), list) else [],
+            "fix_missing_price": strategy.get("fix_missing_price"),
+            "fix_missing_title": strategy.get("fix_missing_title"),
+            "max_variants_per_product": variant_cap(strategy),
+        },
+        "overrides_applied": {"count": len(applied), "list": applied},
+        "timings": timer.spans,
+    }
+    return {
+        "ok": True,
+        "source": source or {"type": "custom", "confidence": 0.5},
+        "strategy": strategy,
+        "strict_mode": strict_mode,
+        "preview_transformed": preview,
+        "files": csv_files(csv_metas),
+        "qa": qa,
+        "gate": gate,
+        "decision_log": decision_log,
+        "handles_with_overflow": handles_with_overflow,
+    }
+
+def _handle_index(catalog: Dict[str, Any]) -> Dict[str, Dict[str, List[int]]]:
+    """handle → group ids, built once per catalog.
+
+    "transform" uses the per-group build's title row (parent or first working row);
+    "overflow" uses the handles_with_overflow pass (parent, first single, first variant).
+    """
+    idx = catalog.get("_handle_index")
+    if idx is not None:
+        return idx
+    handles = catalog["cells"]["handle"].to_numpy()
+    transform: Dict[str, List[int]] = {}
+    overflow: Dict[str, List[int]] = {}
+    for gi, g in enumerate(catalog["groups"]):
+        rows0 = g["variants"] or g["singles"]
+        if rows0:
+            pr = g["parent"] if g["parent"] is not None else rows0[0]
+            transform.setdefault(handles[pr], []).append(gi)
+        pr2 = g["parent"] if g["parent"] is not None else (g["singles"] or g["variants"] or [None])[0]
+        if pr2 is not None:
+            overflow.setdefault(handles[pr2], []).append(gi)
+    idx = {"transform": transform, "overflow": overflow}
+    catalog["_handle_index"] = idx
+    return idx
+
+def _handles_with_overflow(catalog: Dict[str, Any], unresolved: set, strategy: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if not unresolved:
+        return []
+    groups = catalog["groups"]
+    handles = catalog["cells"]["handle"].to_numpy()
+    titles = catalog["cells"]["title"].to_numpy()
+    index = _handle_index(catalog)["overflow"]
+    hits = sorted(gi for h in unresolved for gi in index.get(h, []))
+    varying = _varying_by_group(catalog, hits)
+    out = []
+    for gi in hits:
+        g = groups[gi]
+        pr = g["parent"] if g["parent"] is not None else (g["singles"] or g["variants"])[0]
+        var = varying.get(gi, [])
+        out.append({
+            "handle": handles[pr],
+            "title": titles[pr],
+            "varying_attributes": [n for n, c in var if c > 1],
+            "suggested_three": choose_options(var, 3, strategy.get("option_priority"))["chosen"][:3],
+        })
+    return out
+
+# ------------------------ Preview / CSV ----------------------------
+def _cell(v: Any) -> Any:
+    if isinstance(v, (float, np.floating)) and np.isnan(v):
+        return ""
+    return js_num(v)
+
+def preview_rows(out: pd.DataFrame, start: int, limit: int) -> List[Dict[str, Any]]:
+    """Rows as the JS node emits them: only the keys each row actually carries."""
+    recs = []
+    for _, r in out.iloc[start:start + limit].iterrows():
+        if r["_part"] == 1:
+            recs.append({"Handle": r["Handle"], "Image Src": r["Image Src"], "Image Position": int(r["Image Position"])})
+            continue
+        keys = (PRODUCT_LEVEL_COLS if r["_first"] else ["Handle"]) + VARIANT_COLS
+        rec = {k: _cell(r[k]) for k in keys}
+        if r["Variant Image"]:
+            rec["Variant Image"] = r["Variant Image"]
+        if r["Metafields"]:
+            rec["Metafields"] = r["Metafields"]
+        recs.append(rec)
+    return recs
+
+def _js_str(s: pd.Series, numeric: bool) -> pd.Series:
+    """String(v) for an output column: NaN → '', integral floats without '.0'."""
+    if not numeric:
+        return s.fillna("").astype(str)
+    num = pd.to_numeric(s.where(s != "", np.nan), errors="coerce").astype(float)
+    out = pd.Series("", index=s.index, dtype=object)
+    integral = num.notna() & (num == np.floor(num))
+    out[integral] = num[integral].astype(np.int64).astype(str)
+    frac = num.notna() & ~integral
+    if frac.any():
+        out[frac] = num[frac].map(repr)
+    return out
+
+def csv_escape(s: pd.Series) -> pd.Series:
+    """Vectorized `csvEscape`, including the formula-injection hardening."""
+    s = s.where(~s.str.match(r"^[=+\-@]"), "'" + s)
+    quote = s.str.contains(r'[",\n]', regex=True)
+    return s.where(~quote, '"' + s.str.replace('"', '""', regex=False) + '"')
+
+def _export_columns(out: pd.DataFrame, cols: List[str]) -> List[pd.Series]:
+    """Output columns as the CSV cells they become (unescaped): product-level fields only on
+    a product's first row, variant fields only on variant lines, numbers rendered like JS."""
+    product_level = out["_first"].astype(bool)
+    variant_line = out["_part"] == 0
+    series = []
+    for c in cols:
+        if c not in out.columns:
+            series.append(pd.Series("", index=out.index, dtype=object))
+            continue
+        col = out[c]
+        if c in ("Title", "Body (HTML)", "Vendor", "Tags", "Option1 Name", "Option2 Name", "Option3 Name"):
+            col = col.where(product_level, "")
+        elif c in VARIANT_COLS or c == "Variant Image":
+            col = col.where(variant_line, "")
+        series.append(_js_str(col, c in NUMERIC_COLS))
+    return series
+
+def _csv_columns(out: pd.DataFrame) -> List[str]:
+    return list(SHOPIFY_STD_COLS)
+
+def _csv_blocks(out: pd.DataFrame, cols: List[str]) -> Iterator[Tuple[np.ndarray, List[str]]]:
+    """(handles, escaped lines without newline), CSV_BLOCK_ROWS output rows at a time."""
+    for start in range(0, len(out), CSV_BLOCK_ROWS):
+        block = out.iloc[start:start + CSV_BLOCK_ROWS]
+        escaped = [csv_escape(s) for s in _export_columns(block, cols)]
+        yield block["Handle"].to_numpy(), escaped[0].str.cat(escaped[1:], sep=",").tolist()
+
+def iter_csv(out: pd.DataFrame) -> Iterator[str]:
+    """The Shopify CSV as text pieces (header, then one piece per block); columns are fixed
+    before the first row."""
+    if not len(out):
+        return
+    cols = _csv_columns(out)
+    yield ",".join(cols) + "\n"
+    for _, lines in _csv_blocks(out, cols):
+        yield "\n".join(lines) + "\n"
+
+def build_csv(out: pd.DataFrame) -> str:
+    return "".join(iter_csv(out))
+
+def csv_filename(part: int = 0) -> str:
+    day = datetime.now().strftime('%Y-%m-%d')
+    return f"shopify_products_{day}_part{part}.csv" if part else f"shopify_products_{day}.csv"
+
+def csv_split_bytes(strategy: Dict[str, Any]) -> int:
+    """strategy.csv_split_mb in bytes; 0 = one file."""
+    try:
+        mb = float(strategy.get("csv_split_mb") or 0)
+    except (TypeError, ValueError):
+        return 0
+    return int(mb * 1024 * 1024) if mb > 0 else 0
+
+class _SplitCsv:
+    """Port of the node's split CSV writer: files of at most `max_bytes` (header repeated), cut
+    only where Handle changes; a product larger than that gets a file to itself."""
+
+    def __init__(self, header: bytes, max_bytes: int):
+        self.header = header
+        self.max_bytes = max_bytes
+        self.files: List[Dict[str, Any]] = []
+        self._w = None
+        self._rows = self._bytes = 0
+        self._buf: List[bytes] = []
+        self._buf_len = 0
+        self._product: List[bytes] = []
+        self._product_len = 0
+        self._handle = None
+
+    def add(self, handle: str, line: bytes) -> None:
+        if handle != self._handle:
+            self._commit()
+            self._handle = handle
+        self._product.append(line)
+        self._product_len += len(line)
+
+    def end(self) -> List[Dict[str, Any]]:
+        self._commit()
+        self._close()
+        return self.files
+
+    def abort(self) -> None:
+        if self._w is not None:
+            self._w.abort()
+            self._w = None
+
+    def _emit(self, data: bytes) -> None:
+        self._buf.append(data)
+        self._buf_len += len(data)
+        if self._buf_len >= CSV_CHUNK_BYTES:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buf:
+            self._w.write(b"".join(self._buf))
+            self._buf, self._buf_len = [], 0
+
+    def _close(self) -> None:
+        if self._w is not None:
+            self._flush()
+            self.files.append(dict(self._w.close(), rows=self._rows))
+            self._w = None
+
+    def _commit(self) -> None:
+        if not self._product:
+            return
+        if self._w is None or (self._rows and self._bytes + self._product_len > self.max_bytes):
+            self._close()
+            self._w = ARTIFACTS.writer(csv_filename(len(self.files) + 1))
+            self._rows, self._bytes = 0, len(self.header)
+            self._emit(self.header)
+        for line in self._product:
+            self._emit(line)
+        self._rows += len(self._product)
+        self._bytes += self._product_len
+        self._product, self._product_len = [], 0
+
+def write_csv_artifacts(out: pd.DataFrame, split_bytes: int = 0) -> List[Dict[str, Any]]:
+    """Stream the Shopify CSV into gzip artifacts: one file, or several under `split_bytes`."""
+    if not split_bytes or not len(out):
+        return [ARTIFACTS.write_chunks((t.encode("utf-8") for t in iter_csv(out)), csv_filename())]
+    cols = _csv_columns(out)
+    split = _SplitCsv((",".join(cols) + "\n").encode("utf-8"), split_bytes)
+    try:
+        for handles, lines in _csv_blocks(out, cols):
+            for h, line in zip(handles, lines):
+                split.add(h, (line + "\n").encode("utf-8"))
+        files = split.end()
+    except BaseException:
+        split.abort()
+        raise
+    if len(files) > ARTIFACTS.max_items:
+        raise ValueError(f"CSV split into {len(files)} files, more than the {ARTIFACTS.max_items} the artifact "
+                         f"store keeps; raise csv_split_mb")
+    return files
+
+def write_csv_artifact(out: pd.DataFrame) -> Dict[str, Any]:
+    """Build the Shopify CSV and store it gzip-compressed; returns the artifact metadata."""
+    return write_csv_artifacts(out)[0]
+
+def csv_files(metas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """`files` entries for written CSV artifacts (split exports list every part)."""
+    return {"shopify_csv_parts": metas} if len(metas) > 1 else {"shopify_csv": metas[0]}
+
+# ----------------------------- Runs --------------------------------
+_RUNS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_RUNS_LOCK = threading.Lock()
+
+def _store_run(state: Dict[str, Any]) -> str:
+    run_id = str(uuid.uuid4())
+    with _RUNS_LOCK:
+        _RUNS[run_id] = state
+        while len(_RUNS) > MAX_RUNS:
+            _RUNS.popitem(last=False)
+    return run_id
+
+def use_artifacts(consumer: str) -> ArtifactStore:
+    """Point ARTIFACTS at the consumer's own subdirectory (idempotent, so app reruns keep the registry)."""
+    global ARTIFACTS
+    root = consumer_root(consumer)
+    if ARTIFACTS.root != root:
+        ARTIFACTS = ArtifactStore(root=root)
+    return ARTIFACTS
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    with _RUNS_LOCK:
+        state = _RUNS.get(run_id or "")
+        if state is not None:
+            _RUNS.move_to_end(run_id)
+        return state
+
+def run_artifact(run_id: str) -> Optional[Dict[str, Any]]:
+    """CSV artifact for a stored run, built on first request (delta responses defer the file)."""
+    state = get_run(run_id)
+    if state is None:
+        return None
+    meta = state.get("artifact")
+    if meta is None or ARTIFACTS.meta(meta["artifact_id"]) is None:
+        meta = state["artifact"] = write_csv_artifact(state["out"])
+    return meta
+
+# -------------------------- Preview pages --------------------------
+def _run_cache(state: Dict[str, Any], name: str, key: Any, build: Callable[[], Any]) -> Any:
+    """Small per-run memo (filtered selections, column list) so paging a filter is O(page)."""
+    with _RUNS_LOCK:
+        memo = state.setdefault(name, OrderedDict())
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key]
+    value = build()
+    with _RUNS_LOCK:
+        memo[key] = value
+        while len(memo) > PREVIEW_FILTER_CACHE:
+            memo.popitem(last=False)
+    return value
+
+def _preview_selection(state: Dict[str, Any], handle: str, issue: str, option: str) -> np.ndarray:
+    """Positions of the output rows matching every given filter (all rows when none is set).
+
+    handle / option: case-insensitive substring of Handle / any Option value;
+    issue: every row of the products that carry that QA code.
+    """
+    out = state["out"]
+    mask = np.ones(len(out), dtype=bool)
+    if handle:
+        mask &= out["Handle"].astype(str).str.lower().str.contains(handle.lower(), regex=False).to_numpy()
+    if issue:
+        issues = state["issues"]
+        groups = issues.loc[issues["code"] == issue, "g"].unique() if len(issues) else []
+        mask &= out["g"].isin(groups).to_numpy()
+    if option:
+        needle = option.lower()
+        hit = np.zeros(len(out), dtype=bool)
+        for k in (1, 2, 3):
+            col = out[f"Option{k} Value"].fillna("").astype(str).str.lower()
+            hit |= col.str.contains(needle, regex=False).to_numpy()
+        mask &= hit
+    return np.flatnonzero(mask)
+
+def preview_page(
+    run_id: str, offset: int = 0, limit: int = PREVIEW_LIMIT,
+    handle: str = "", issue: str = "", option: str = "",
+) -> Optional[Dict[str, Any]]:
+    """One page of a stored run's output rows, optionally filtered, in columnar form.
+
+    `data[i]` holds the page's values for `columns[i]` (the CSV cells, unescaped);
+    `positions` are the rows' indexes in the full output. None if the run is unknown/evicted.
+    """
+    state = get_run(run_id)
+    if state is None:
+        return None
+    offset = max(0, int(offset))
+    limit = max(1, min(int(limit), PREVIEW_PAGE_MAX))
+    handle, issue, option = (str(v or "").strip() for v in (handle, issue, option))
+    sel = _run_cache(state, "_preview_sel", (handle, issue, option),
+                     lambda: _preview_selection(state, handle, issue, option))
+    cols = _run_cache(state, "_preview_meta", "columns", lambda: _csv_columns(state["out"]))
+    codes = _run_cache(state, "_preview_meta", "issue_codes", lambda: issue_counts(state["issues"]))
+    picked = sel[offset:offset + limit]
+    page = state["out"].iloc[picked]
+    return {
+        "ok": True,
+        "run_id": run_id,
+        "total": int(len(state["out"])),
+        "matched": int(len(sel)),
+        "offset": offset,
+        "limit": limit,
+        "filters": {"handle": handle, "issue": issue, "option": option},
+        "columns": cols,
+        "positions": [int(p) for p in picked],
+        "data": [s.tolist() for s in _export_columns(page, cols)],
+        "issue_codes": codes,
+    }
+
+def _issue_selection(state: Dict[str, Any], code: str, handle: str) -> np.ndarray:
+    issues = state["issues"]
+    mask = np.ones(len(issues), dtype=bool)
+    if code and len(issues):
+        mask &= (issues["code"] == code).to_numpy()
+    if handle and len(issues):
+        mask &= (issues["handle"] == handle).to_numpy()
+    return np.flatnonzero(mask)
+
+def issues_page(
+    run_id: str, cursor: Any = 0, limit: int = ISSUE_PAGE, code: str = "", handle: str = "",
+) -> Optional[Dict[str, Any]]:
+    """The full issue list of a stored run, a page at a time (exact code / handle filters).
+
+    `cursor` is the offset into the (filtered) list: qa.next_cursor, or a page's next_cursor.
+    None if the run is unknown/evicted; ValueError on a malformed cursor.
+    """
+    state = get_run(run_id)
+    if state is None:
+        return None
+    offset = max(0, int(cursor or 0))
+    limit = max(1, min(int(limit), ISSUE_PAGE_MAX))
+    code, handle = str(code or "").strip(), str(handle or "").strip()
+    sel = _run_cache(state, "_issue_sel", (code, handle), lambda: _issue_selection(state, code, handle))
+    picked = sel[offset:offset + limit]
+    return {
+        "ok": True,
+        "run_id": run_id,
+        "total": int(len(state["issues"])),
+        "matched": int(len(sel)),
+        "cursor": str(offset),
+        "filters": {"code": code, "handle": handle},
+        "issues": _issue_records(state["issues"].iloc[picked]),
+        "next_cursor": str(offset + len(picked)) if offset + len(picked) < len(sel) else None,
+    }
+
+def _global_overrides(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in overrides.items() if k != "per_product"}
+
+# ----------------------------- Entry -------------------------------
+def run_transform(
+    catalog: Dict[str, Any],
+    strategy: Dict[str, Any],
+    overrides: Dict[str, Any],
+    strict_mode: bool,
+    source: Optional[Dict[str, Any]] = None,
+    policy: Optional[Dict[str, Any]] = None,
+    progress: Optional[Progress] = None,
+    timer: Optional[StageTimer] = None,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """Full transform of a prepared catalog. Pass the caller's `timer` to keep its spans
+    (upload receive, parse) ahead of the transform's in decision_log.timings.
+
+    `workers` > 1 shards the groups across that many processes of the shared pool (catalogs of at
+    least PARALLEL_MIN_GROUPS groups; at most the pool's size); the response is the same as a serial run's.
+    """
+    started_at = _iso_now()
+    timer = timer or StageTimer()
+    report = progress or (lambda stage, done, total: None)
+    headers = catalog["headers"]
+    if source is None:
+        report("mapping", 0, len(headers))
+        source = suggest_mapping(headers)["source"]
+    report("mapping", len(headers), len(headers))
+    timer.mark("mapping", rows_in=len(headers), rows_out=len(headers))
+    group_ids = list(range(len(catalog["groups"])))
+    workers = max(1, min(int(workers or 1), len(group_ids))) if len(group_ids) >= PARALLEL_MIN_GROUPS else 1
+    if workers > 1:
+        workers = min(workers, transform_pool(workers)[1])
+    if workers > 1:
+        batch = transform_parallel(catalog, strategy, overrides, workers, progress=progress)
+    else:
+        batch = transform_groups(catalog, group_ids, strategy, overrides, progress=progress)
+    timer.mark("expand", rows_in=catalog["row_count"], rows_out=int(len(batch["lines"])), groups=len(group_ids),
+               workers=workers)
+    out = _output_frame(catalog, batch)
+    timer.mark("output", rows_in=int(len(batch["lines"]) + len(batch["images"])), rows_out=int(len(out)))
+    report("csv", 0, len(out))
+    resp = assemble_response(catalog, out, batch["issues"], batch["applied"], strategy, strict_mode,
+                             source=source, policy=policy, started_at=started_at, timer=timer)
+    report("csv", len(out), len(out))
+    resp["run_id"] = _store_run({
+        "catalog": catalog, "strategy": strategy, "overrides": overrides,
+        "out": out, "issues": batch["issues"], "applied": batch["applied"],
+        "artifact": resp["files"].get("shopify_csv"),  # None when split: /csv builds one file on request
+    })
+    return resp
+
+def run_delta(
+    base_run_id: str,
+    changed_handles: List[str],
+    strategy: Dict[str, Any],
+    overrides: Dict[str, Any],
+    strict_mode: bool,
+    timer: Optional[StageTimer] = None,
+) -> Optional[Dict[str, Any]]:
+    """Re-transform only the groups behind `changed_handles`, reusing the rest of a stored run.
+
+    Returns None when a full run is required (unknown/evicted run, or the strategy or a
+    catalog-wide override changed). The response carries the changed groups, plus the merged
+    run's issue index, overflow list, preview page and applied overrides (each already bounded
+    or small), so the client's merge into the previous response equals a full run.
+    """
+    base = get_run(base_run_id)
+    if base is None or base["strategy"] != strategy or _global_overrides(base["overrides"]) != _global_overrides(overrides):
+        return None
+    started_at = _iso_now()
+    timer = timer or StageTimer()
+    catalog = base["catalog"]
+    changed = [h for h in dict.fromkeys(changed_handles or []) if h]
+    index = _handle_index(catalog)["transform"]
+    gids = sorted({gi for h in changed for gi in index.get(h, [])})
+
+    batch = transform_groups(catalog, gids, strategy, overrides)
+    timer.mark("expand", rows_out=int(len(batch["lines"])), groups=len(gids))
+    part = _output_frame(catalog, batch)
+    timer.mark("output", rows_in=int(len(batch["lines"]) + len(batch["images"])), rows_out=int(len(part)))
+
+    def _merge(old: pd.DataFrame, new: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        kept = old[~old["g"].isin(gids)] if len(old) else old
+        if not len(new):
+            return kept.reset_index(drop=True)
+        if not len(kept):
+            return new
+        return pd.concat([kept, new], ignore_index=True).sort_values(keys, kind="stable").reset_index(drop=True)
+
+    out = _merge(base["out"], part, ["g", "_part", "_pos"])
+    issues_df = _merge(base["issues"], batch["issues"], ["g", "idx", "sub"])
+    applied_df = _merge(base["applied"], batch["applied"], ["g", "idx"])
+    run_id = _store_run({
+        "catalog": catalog, "strategy": strategy, "overrides": overrides,
+        "out": out, "issues": issues_df, "applied": applied_df,
+    })
+    timer.mark("merge", rows_in=int(len(base["out"])), rows_out=int(len(out)))
+
+    totals, unresolved = _gate(issues_df, strict_mode)
+    groups_payload: Dict[str, Dict[str, Any]] = {}
+    new_issues = _issue_records(batch["issues"])
+    new_applied = _applied_records(batch["applied"])
+    for h in changed:
+        rows = part[part["Handle"] == h]
+        groups_payload[h] = {
+            "rows": preview_rows(rows, 0, PREVIEW_LIMIT),
+            "row_count": int(len(rows)),
+            "issues": [i for i in new_issues if i.get("handle") == h],
+            "overrides_applied": [a for a in new_applied if a.get("handle") == h],
+        }
+    timer.mark("qa", rows_in=int(len(part)), rows_out=len(new_issues))
+    handles_with_overflow = _handles_with_overflow(catalog, unresolved, strategy)
+    timer.mark("overflow", rows_in=len(unresolved), rows_out=len(handles_with_overflow))
+    # one deferred file can't carry a split export, so split runs write their parts now
+    split_bytes = csv_split_bytes(strategy)
+    files = {"deferred": True, "run_id": run_id}
+    if split_bytes:
+        metas = write_csv_artifacts(out, split_bytes)
+        files = csv_files(metas)
+        timer.mark("csv", rows_in=int(len(out)), rows_out=int(len(out)),
+                   nbytes=sum(m["bytes"] for m in metas), files=len(metas))
+    return {
+        "ok": True,
+        "delta": True,
+        "run_id": run_id,
+        "base_run_id": base_run_id,
+        "changed_handles": changed,
+        "groups": groups_payload,
+        "handles_with_overflow": handles_with_overflow,
+        "preview_transformed": preview_rows(out, 0, PREVIEW_LIMIT),
+        "qa": issue_index(issues_df, totals),
+        "gate": totals["gate"],
+        "decision_log": {
+            "meta": dict(_decision_meta(catalog, started_at), delta_groups=len(gids)),
+            "transforms": _transforms(out),
+            "overrides_applied": {"count": int(len(applied_df)), "list": _applied_records(applied_df)},
+            "timings": timer.spans,
+        },
+        "files": files,
+    }
+
+def run_local(
+    file_bytes: bytes, strict_mode: Any, strategy_json: Any, overrides_json: Any, cache: Any = None,
+    progress: Optional[Progress] = None, workers: int = 1,
+) -> Dict[str, Any]:
+    """Parse + transform an upload in-process; what `send_to_n8n` returns, without the round trip.
+
+    `cache` (an upload_cache.CatalogCache) skips re-parsing an upload seen before.
+    """
+    strict, strategy, overrides = parse_inputs(strict_mode, strategy_json, overrides_json)
+    timer = StageTimer()
+    if progress:
+        progress("parse", 0, 0)
+    if cache is not None:
+        catalog, hit = cache.get_or_parse(file_bytes)
+    else:
+        catalog, hit = load_catalog(file_bytes), False
+    parse_timings(timer, catalog, hit)
+    if progress:
+        progress("parse", catalog["row_count"], catalog["row_count"])
+    return run_transform(catalog, strategy, overrides, strict, progress=progress, timer=timer, workers=workers)
@@ -0,0 +1,438 @@
+# local_server.py
+# Local stand-in for the n8n "migrate_v1" webhook (dev / benchmarking, no n8n needed)
+# - Same request contract as app.send_to_n8n(): multipart 'file' + x-* auth headers + settings as form
+#   fields (query params / x-*-json headers from older clients still take precedence)
+# - Same Verify HMAC rule (ts.request_id.digest) when MW_HMAC_SECRET is set
+# - Runs local_engine in-process and replies with the workflow's response shape
+# - Parsed catalogs live in a digest-keyed LRU; re-runs may send only x-file-digest
+#   (409 digest_not_cached tells the client to fall back to a full upload)
+# - Digest-only re-runs may add base_run_id + changed_handles: only those handles are
+#   re-transformed and the reply is a delta; the full CSV is fetched from /runs/<id>/csv
+# - Results carry only an artifact id; GET /artifacts/<id> streams the gzip file as-is
+#   (kept under MC_ARTIFACT_DIR/server, apart from batch runs and the app)
+# - Async: POST /jobs (same body) → 202 {job_id}; GET /jobs/<id> → stage + row counts,
+#   and the full response once status == "done"; DELETE /jobs/<id> cancels (409 job_finished)
+# - GET /runs/<id>/preview?offset=&limit=&handle=&issue=&option= → one filtered, columnar page
+# - GET /runs/<id>/issues?cursor=&limit=&code=&handle= → the full QA issue list, page by page
+# - MC_TRANSFORM_WORKERS > 1: full transforms shard product groups across local_engine's shared
+#   process pool (that many processes, started on the first large transform, kept until exit)
+# - Uploads are read, split and sha256-hashed in one streaming pass (read_multipart); a body whose
+#   hash differs from x-file-digest is rejected (400 digest_mismatch) before it is parsed, and the
+#   HMAC is checked before the body is read at all
+# - decision_log.timings starts with the server's own spans (receive, parse);
+#   x-server-ms carries the total handler time for the client's waterfall
+# - Errors are always JSON: 400 bad_body for a non-object JSON body, 500 transform_failed when
+#   parsing / transforming raises
+#
+# Usage: python local_server.py --port 5678   → N8N_BASE_URL=http://localhost:5678
+
+import os
+import re
+import hmac
+import json
+import time
+import shutil
+import traceback
+import hashlib
+import argparse
+import email.policy
+from email.parser import BytesHeaderParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import local_engine
+from jobs import JobManager, DEFAULT_WORKERS
+from upload_cache import CatalogCache, DEFAULT_MAX_BYTES
+
+WEBHOOK_PATH = "/webhook/migrate_v1"
+MAX_SKEW_SEC = 300
+RUN_CSV_RE = re.compile(r"^" + re.escape(WEBHOOK_PATH) + r"/runs/([0-9a-f-]{36})/csv$")
+RUN_PREVIEW_RE = re.compile(r"^" + re.escape(WEBHOOK_PATH) + r"/runs/([0-9a-f-]{36})/preview$")
+RUN_ISSUES_RE = re.compile(r"^" + re.escape(WEBHOOK_PATH) + r"/runs/([0-9a-f-]{36})/issues$")
+ARTIFACT_RE = re.compile(r"^" + re.escape(WEBHOOK_PATH) + r"/artifacts/([A-Za-z0-9_-]{1,64})$")
+JOBS_PATH = WEBHOOK_PATH + "/jobs"
+JOB_RE = re.compile(r"^" + re.escape(JOBS_PATH) + r"/([0-9a-f]{32})$")
+STREAM_CHUNK = 1 << 16
+
+CATALOG_CACHE = CatalogCache(int(os.getenv("MC_CATALOG_CACHE_BYTES", DEFAULT_MAX_BYTES)))
+JOBS = JobManager(workers=int(os.getenv("MC_JOB_WORKERS", DEFAULT_WORKERS)))
+TRANSFORM_WORKERS = local_engine.pool_workers()  # shards per full transform (the shared pool's size)
+
+# -------------------------- Helpers -----------------------------
+def _boundary(content_type: str) -> bytes:
+    msg = BytesHeaderParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n")
+    boundary = msg.get_param("boundary")
+    if not boundary:
+        raise ValueError("multipart body without a boundary")
+    return str(boundary).encode("latin-1")
+
+def read_multipart(stream: Any, length: int, content_type: str, chunk: int = STREAM_CHUNK
+                   ) -> Tuple[Dict[str, str], Dict[str, Tuple[str, bytes, str]]]:
+    """Read a multipart/form-data body off `stream` in one pass → ({field: text},
+    {field: (filename, bytes, sha256)}).
+
+    File parts are hashed as their bytes arrive, so checking x-file-digest (and keying the
+    catalog cache) needs no second pass over the upload, and the body is never held twice.
+    """
+    delim = b"\r\n--" + _boundary(content_type)
+    buf = bytearray(b"\r\n")  # the first boundary has no leading CRLF
+    remaining = length
+    fields: Dict[str, str] = {}
+    files: Dict[str, Tuple[str, bytes, str]] = {}
+
+    def fill() -> bool:
+        nonlocal remaining
+        if remaining <= 0:
+            return False
+        data = stream.read(min(chunk, remaining))
+        if not data:
+            raise ValueError("multipart body ended early")
+        remaining -= len(data)
+        buf.extend(data)
+        return True
+
+    def find(token: bytes, start: int = 0) -> int:
+        while True:
+            at = buf.find(token, start)
+            if at != -1:
+                return at
+            start = max(0, len(buf) - len(token) + 1)
+            if not fill():
+                raise ValueError("malformed multipart body")
+
+    del buf[:find(delim) + len(delim)]
+    while True:
+        while len(buf) < 2 and fill():
+            pass
+        if buf[:2] == b"--":
+            break  # closing boundary
+        end = find(b"\r\n\r\n")
+        head = BytesHeaderParser(policy=email.policy.HTTP).parsebytes(bytes(buf[2:end + 4]))
+        del buf[:end + 4]
+        name = head.get_param("name", header="content-disposition")
+        filename = head.get_filename()
+        digest = hashlib.sha256()
+        payload = bytearray()
+        while True:
+            at = buf.find(delim)
+            if at != -1:
+                piece = buf[:at]
+                del buf[:at + len(delim)]
+            else:
+                piece = buf[:max(0, len(buf) - len(delim) + 1)]
+                del buf[:len(piece)]
+                if not fill():
+                    raise ValueError("malformed multipart body")
+            if filename is not None:
+                digest.update(piece)
+            payload += piece
+            if at != -1:
+                break
+        if not name:
+            continue
+        if filename is not None:
+            files[name] = (filename, payload, digest.hexdigest())
+        else:
+            fields[name] = payload.decode("utf-8", "replace")
+    while remaining > 0:
+        fill()
+        buf.clear()
+    return fields, files
+
+def verify_hmac(headers: Dict[str, str]) -> Tuple[bool, str]:
+    """Mirror of the Verify HMAC node. Without MW_HMAC_SECRET every request is accepted."""
+    secret = os.getenv("MW_HMAC_SECRET", "")
+    if not secret:
+        return True, ""
+    ts = headers.get("x-timestamp", "")
+    rid = headers.get("x-request-id", "")
+    sig = headers.get("x-signature", "").lower()
+    digest = headers.get("x-file-digest", "").lower()
+    if not ts.isdigit() or abs(int(time.time()) - int(ts)) > MAX_SKEW_SEC:
+        return False, "stale_timestamp"
+    if not rid or not digest or not sig:
+        return False, "missing_auth_headers"
+    expected = hmac.new(secret.encode("utf-8"), f"{ts}.{rid}.{digest}".encode("utf-8"), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(sig, expected):
+        return False, "bad_signature"
+    return True, ""
+
+def run_inputs(query: Dict[str, str], headers: Dict[str, str], form: Dict[str, Any]) -> Tuple[bool, dict, dict]:
+    """Precedence as in the Parse Inputs node: query > x-* headers > form body."""
+    def first(*vals):
+        for v in vals:
+            if v not in (None, ""):
+                return v
+        return None
+    return local_engine.parse_inputs(
+        first(query.get("strict_mode"), headers.get("x-strict-mode"), form.get("strict_mode")) or False,
+        first(query.get("strategy"), headers.get("x-strategy-json"), form.get("strategy_json")),
+        first(query.get("overrides"), headers.get("x-overrides-json"), form.get("overrides_json")),
+    )
+
+def execute(
+    query: Dict[str, str],
+    headers: Dict[str, str],
+    form: Dict[str, Any],
+    upload: Optional[bytes],
+    catalog: Optional[Dict[str, Any]],
+    progress: Optional[local_engine.Progress] = None,
+    timer: Optional[local_engine.StageTimer] = None,
+    digest: str = "",
+) -> Tuple[Dict[str, Any], bool]:
+    """Parse (unless cached) and transform one request; shared by the webhook and background jobs.
+
+    `digest` is the upload's sha256 when read_multipart already computed it.
+    """
+    report = progress or (lambda stage, done, total: None)
+    timer = timer or local_engine.StageTimer()
+    hit = catalog is not None
+    if catalog is None:
+        report("parse", 0, 0)
+        catalog, hit = CATALOG_CACHE.get_or_parse(upload, digest or None)
+    local_engine.parse_timings(timer, catalog, hit)
+    report("parse", catalog["row_count"], catalog["row_count"])
+
+    strict, strategy, overrides = run_inputs(query, headers, form)
+    resp = None
+    base_run_id = form.get("base_run_id")
+    changed = form.get("changed_handles")
+    if base_run_id and isinstance(changed, list):
+        base = local_engine.get_run(base_run_id)
+        if base is not None and base["catalog"] is catalog:
+            resp = local_engine.run_delta(base_run_id, [str(h) for h in changed], strategy, overrides, strict,
+                                          timer=timer)
+    if resp is None:
+        resp = local_engine.run_transform(catalog, strategy, overrides, strict, progress=progress, timer=timer,
+                                          workers=TRANSFORM_WORKERS)
+    resp["request_id"] = headers.get("x-request-id")
+    return resp, hit
+
+# -------------------------- Handler -----------------------------
+class WebhookHandler(BaseHTTPRequestHandler):
+    server_version = "MigrationCopilotLocal/1.0"
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        if os.getenv("MC_SERVER_QUIET") != "1":
+            super().log_message(fmt, *args)
+
+    def _headers(self) -> Dict[str, str]:
+        return {k.lower(): v for k, v in self.headers.items()}
+
+    def _length(self) -> int:
+        return int(self.headers.get("content-length") or 0)
+
+    def _body(self) -> bytes:
+        length = self._length()
+        return self.rfile.read(length) if length else b""
+
+    def _discard_body(self) -> None:
+        # rejected before reading: drain the request without buffering it
+        remaining = self._length()
+        while remaining > 0:
+            data = self.rfile.read(min(STREAM_CHUNK, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+
+    def _send_json(self, status: int, obj: Any, extra: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json; charset=utf-8")
+        self.send_header("content-length", str(len(data)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_artifact(self, meta: Dict[str, Any]) -> None:
+        # gzip bytes go out untouched; HTTP clients decompress (or keep them compressed)
+        path = local_engine.ARTIFACTS.path(meta["artifact_id"])
+        self.send_response(200)
+        self.send_header("content-type", f"{meta['mime']}; charset=utf-8")
+        self.send_header("content-encoding", "gzip")
+        self.send_header("content-length", str(meta["compressed_bytes"]))
+        self.send_header("content-disposition", f'attachment; filename="{meta["filename"]}"')
+        self.send_header("x-artifact-id", meta["artifact_id"])
+        self.send_header("x-uncompressed-length", str(meta["bytes"]))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, STREAM_CHUNK)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            self._send_json(200, {"ok": True, "catalog_cache": CATALOG_CACHE.stats(), "jobs": JOBS.stats()})
+            return
+        m = JOB_RE.match(url.path)
+        if m:
+            job = JOBS.status(m.group(1))
+            if job is None:
+                self._send_json(404, {"ok": False, "error": "job_not_found", "job_id": m.group(1)})
+                return
+            self._send_json(200, dict(job, ok=job["status"] not in ("error", "cancelled")))
+            return
+        m = RUN_CSV_RE.match(url.path)
+        if m:
+            meta = local_engine.run_artifact(m.group(1))
+            if meta is None:
+                self._send_json(404, {"ok": False, "error": "run_not_found", "run_id": m.group(1)})
+                return
+            self._send_artifact(meta)
+            return
+        m = RUN_PREVIEW_RE.match(url.path)
+        if m:
+            q = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+            try:
+                offset, limit = int(q.get("offset") or 0), int(q.get("limit") or local_engine.PREVIEW_LIMIT)
+            except ValueError:
+                self._send_json(400, {"ok": False, "error": "bad_page", "hint": "offset and limit must be integers."})
+                return
+            page = local_engine.preview_page(m.group(1), offset, limit,
+                                             q.get("handle", ""), q.get("issue", ""), q.get("option", ""))
+            if page is None:
+                self._send_json(404, {"ok": False, "error": "run_not_found", "run_id": m.group(1)})
+                return
+            self._send_json(200, page)
+            return
+        m = RUN_ISSUES_RE.match(url.path)
+        if m:
+            q = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+            try:
+                page = local_engine.issues_page(m.group(1), q.get("cursor") or 0,
+                                                int(q.get("limit") or local_engine.ISSUE_PAGE),
+                                                q.get("code", ""), q.get("handle", ""))
+            except ValueError:
+                self._send_json(400, {"ok": False, "error": "bad_cursor", "hint": "cursor and limit must be integers."})
+                return
+            if page is None:
+                self._send_json(404, {"ok": False, "error": "run_not_found", "run_id": m.group(1)})
+                return
+            self._send_json(200, page)
+            return
+        m = ARTIFACT_RE.match(url.path)
+        if m:
+            meta = local_engine.ARTIFACTS.meta(m.group(1))
+            if meta is None:
+                self._send_json(404, {"ok": False, "error": "artifact_not_found", "artifact_id": m.group(1)})
+                return
+            self._send_artifact(meta)
+            return
+        self._send_json(404, {"ok": False, "error": "not_found"})
+
+    def do_DELETE(self) -> None:
+        # cancel a background job; like GET, the unguessable job id is the only credential
+        m = JOB_RE.match(urlsplit(self.path).path)
+        if not m:
+            self._send_json(404, {"ok": False, "error": "not_found"})
+            return
+        cancelled = JOBS.cancel(m.group(1))
+        if cancelled is None:
+            self._send_json(404, {"ok": False, "error": "job_not_found", "job_id": m.group(1)})
+            return
+        job = JOBS.status(m.group(1), include_result=False)
+        if not cancelled:
+            self._send_json(409, {"ok": False, "error": "job_finished", "job_id": m.group(1), "status": job["status"]})
+            return
+        self._send_json(200, dict(job, ok=True))
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path not in (WEBHOOK_PATH, JOBS_PATH):
+            self._send_json(404, {"ok": False, "error": "not_found"})
+            return
+        timer = local_engine.StageTimer()
+        headers = self._headers()
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+
+        # the signature covers headers only: check it before reading (let alone parsing) the body
+        ok, reason = verify_hmac(headers)
+        if not ok:
+            self._discard_body()
+            self._send_json(401, {"ok": False, "error": "unauthorized", "reason": reason,
+                                  "request_id": headers.get("x-request-id")})
+            return
+
+        content_type = headers.get("content-type", "")
+        upload_digest = ""
+        if content_type.startswith("multipart/form-data"):
+            # receive, split and hash in one pass; the upload is verified before anything parses it
+            try:
+                form, files = read_multipart(self.rfile, self._length(), content_type)
+            except ValueError as e:
+                self._send_json(400, {"ok": False, "error": "bad_multipart", "hint": str(e)})
+                return
+            upload = files.get("file") or next(iter(files.values()), None)
+            if upload is None:
+                self._send_json(400, {"ok": False, "error": "missing_file",
+                                      "hint": "Upload must include a multipart field named 'file'."})
+                return
+            upload_bytes, upload_digest, catalog = upload[1], upload[2], None
+            timer.mark("receive", nbytes=self._length(), file_bytes=len(upload_bytes))
+            claimed = headers.get("x-file-digest", "").lower()
+            if claimed and claimed != upload_digest:
+                self._send_json(400, {"ok": False, "error": "digest_mismatch", "file_digest": claimed,
+                                      "computed_digest": upload_digest, "request_id": headers.get("x-request-id")})
+                return
+        else:
+            body = self._body()
+            timer.mark("receive", nbytes=len(body))
+            # Digest-only re-run: {"strict_mode", "strategy_json", "overrides_json",
+            #                      optional "base_run_id" + "changed_handles"} + x-file-digest
+            try:
+                form = json.loads(body or b"{}")
+            except ValueError:
+                self._send_json(400, {"ok": False, "error": "bad_json"})
+                return
+            if not isinstance(form, dict):
+                self._send_json(400, {"ok": False, "error": "bad_body",
+                                      "hint": "Digest-only body must be a JSON object."})
+                return
+            digest = headers.get("x-file-digest", "").lower()
+            catalog = CATALOG_CACHE.get(digest) if digest else None
+            if catalog is None:
+                self._send_json(409, {"ok": False, "error": "digest_not_cached", "file_digest": digest})
+                return
+            upload_bytes = None
+
+        if url.path == JOBS_PATH:
+            # parse + transform off the request thread; the upload is parsed inside the job
+            cached = catalog is not None or headers.get("x-file-digest", "").lower() in CATALOG_CACHE
+            job_id = JOBS.submit(
+                lambda progress: execute(query, headers, form, upload_bytes, catalog, progress,
+                                         digest=upload_digest)[0],
+                meta={"request_id": headers.get("x-request-id")},
+            )
+            self._send_json(202, {"ok": True, "job_id": job_id, "status_url": f"{JOBS_PATH}/{job_id}",
+                                  "request_id": headers.get("x-request-id")},
+                            {"x-catalog-cache": "hit" if cached else "stored"})
+            return
+
+        try:
+            resp, hit = execute(query, headers, form, upload_bytes, catalog, timer=timer, digest=upload_digest)
+        except Exception as e:
+            # same contract as the n8n webhook: a JSON error, never a dropped connection
+            self.log_error("transform failed: %s", traceback.format_exc(limit=5))
+            self._send_json(500, {"ok": False, "error": "transform_failed", "hint": f"{type(e).__name__}: {e}",
+                                  "request_id": headers.get("x-request-id")})
+            return
+        self._send_json(200, resp, {"x-catalog-cache": "hit" if hit else "stored",
+                                    "x-server-ms": f"{timer.total_ms:.1f}"})
+
+def serve(host: str = "127.0.0.1", port: int = 5678) -> ThreadingHTTPServer:
+    local_engine.use_artifacts("server")
+    return ThreadingHTTPServer((host, port), WebhookHandler)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local stand-in for the n8n migrate_v1 webhook")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5678)
+    args = ap.parse_args()
+    httpd = serve(args.host, args.port)
+    print(f"Serving {WEBHOOK_PATH} on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,174 @@
+# session_store.py
+# Keeps Streamlit sessions (app.py) small: large blobs on disk, derived views memoized within a budget
+# - BlobStore: raw uploads and decoded CSVs spilled to temp files named by their sha256; session
+#   state keeps only {digest, bytes}. Reads go through a read-only mmap, so a blob is paged in
+#   only while something (an upload, a parse) actually reads it; downloads get a plain file (reader())
+# - Content-addressed: the same upload in several sessions is one file; bounded by total bytes
+#   on disk, least recently used files deleted first (MC_SESSION_BLOB_DIR, default <tmp>)
+# - put() hashes while it writes (one chunked pass); the digest doubles as the x-file-digest header
+# - ViewCache: per-session LRU of views derived from a response (summary markdown, pretty JSON),
+#   keyed by (response id, view), bounded by bytes; the app sizes it from MC_SESSION_BUDGET_MB
+
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_BUDGET_MB = 64
+WRITE_CHUNK_BYTES = 1 << 20
+
+def default_root() -> str:
+    return os.getenv("MC_SESSION_BLOB_DIR") or os.path.join(tempfile.gettempdir(), "migration_copilot_blobs")
+
+def approx_nbytes(obj: Any) -> int:
+    """Rough in-memory size of a view or response (its JSON length for containers)."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj)
+    if isinstance(obj, str):
+        return len(obj.encode("utf-8", "surrogatepass"))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    try:
+        return len(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+class BlobStore:
+    """Thread-safe, byte-bounded, content-addressed blob files shared by every session."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or default_root()
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest + ".bin")
+
+    def put(self, data: Any, digest: Optional[str] = None) -> Dict[str, Any]:
+        """Spill `data` (any bytes-like) to disk once; returns the handle sessions keep.
+
+        Without a known digest the blob is hashed chunk by chunk in the same pass that writes it.
+        """
+        view = memoryview(data)
+        if digest and os.path.exists(self.path(digest)):
+            self._touch(digest, len(view))
+            return {"digest": digest, "bytes": len(view)}
+        os.makedirs(self.root, exist_ok=True)
+        h = hashlib.sha256()
+        tmp = os.path.join(self.root, f"{uuid.uuid4().hex}.part")
+        with open(tmp, "wb") as f:
+            for i in range(0, len(view), WRITE_CHUNK_BYTES):
+                h.update(view[i:i + WRITE_CHUNK_BYTES])
+                f.write(view[i:i + WRITE_CHUNK_BYTES])
+        digest = digest or h.hexdigest()
+        os.replace(tmp, self.path(digest))
+        self._touch(digest, len(view))
+        return {"digest": digest, "bytes": len(view)}
+
+    def _touch(self, digest: str, size: int) -> None:
+        evicted = []
+        with self._lock:
+            if digest in self._items:
+                self._items.move_to_end(digest)
+            else:
+                self._items[digest] = size
+                self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                old, old_size = self._items.popitem(last=False)
+                self._bytes -= old_size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self.path(old))
+            except OSError:
+                pass
+
+    def open(self, digest: str) -> Optional[mmap.mmap]:
+        """Read-only mmap over the blob (None if unknown or evicted); empty blobs map to b""."""
+        path = self.path(digest or "")
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except (OSError, ValueError):
+            return None
+        self._touch(digest, size)
+        return mm if mm is not None else b""
+
+    def reader(self, digest: str) -> Optional[BinaryIO]:
+        """Buffered file over the blob (None if unknown or evicted), for callers that stream it."""
+        try:
+            f = open(self.path(digest or ""), "rb")
+        except OSError:
+            return None
+        self._touch(digest, os.fstat(f.fileno()).st_size)
+        return f
+
+    def read_bytes(self, digest: str) -> Optional[bytes]:
+        mm = self.open(digest)
+        if mm is None:
+            return None
+        try:
+            return bytes(mm)
+        finally:
+            if isinstance(mm, mmap.mmap):
+                mm.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+class ViewCache:
+    """LRU of derived views keyed by (response id, view name), bounded by `budget` bytes.
+
+    A view larger than the whole budget is built and returned but not kept.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = int(budget)
+        self._items: "OrderedDict[Tuple[Hashable, str], Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, response_id: Hashable, name: str, build: Callable[[], Any]) -> Any:
+        key = (response_id, name)
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+        self.misses += 1
+        value = build()
+        size = approx_nbytes(value)
+        if size <= self.budget:
+            self._items[key] = (value, size)
+            self._bytes += size
+            self.shrink()
+        return value
+
+    def shrink(self) -> None:
+        """Evict least recently used views until the cache fits its (possibly lowered) budget."""
+        while self._bytes > self.budget and self._items:
+            _, (_, size) = self._items.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._items), "bytes": self._bytes, "budget": self.budget,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,21 @@
+# tests/conftest.py
+# Puts the repo root on sys.path so tests import local_engine / benchmarks the way the scripts do
+# - server: one local_server.py per test session, for the tests that go over HTTP
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+@pytest.fixture(scope="session")
+def server():
+    """local_server.py on an ephemeral port, started the way benchmarks/run.py starts it."""
+    from benchmarks.run import _start_server
+    proc, base_url = _start_server()
+    yield base_url
+    proc.terminate()
+    proc.wait(timeout=10)
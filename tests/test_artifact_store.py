@@ -0,0 +1,55 @@
+# tests/test_artifact_store.py
+# Eviction stays within one consumer's files; download loaders hand Streamlit a file, not bytes
+# - Each consumer (server, batch, app, downloads) has its own subdirectory under MC_ARTIFACT_DIR
+# - Within one directory, files another process wrote are kept until they are min_age old
+
+import io
+import os
+import time
+
+import pytest
+
+from artifact_store import ArtifactStore, consumer_root
+from session_store import BlobStore
+
+def _write(store, text):
+    return store.write_text(text, "shopify_products.csv")["artifact_id"]
+
+def test_consumers_do_not_evict_each_other(tmp_path, monkeypatch):
+    monkeypatch.setenv("MC_ARTIFACT_DIR", str(tmp_path))
+    server = ArtifactStore(root=consumer_root("server"), max_items=1)
+    batch = ArtifactStore(root=consumer_root("batch"), max_items=1)
+    kept = _write(server, "a,b\n1,2\n")
+    for i in range(3):
+        _write(batch, f"a,b\n{i},{i}\n")
+    assert server.read_bytes(kept) == b"a,b\n1,2\n"
+    assert len(os.listdir(batch.root)) == 1
+
+def test_young_files_from_another_process_survive_eviction(tmp_path):
+    first = ArtifactStore(root=str(tmp_path), max_items=1, min_age=600)
+    second = ArtifactStore(root=str(tmp_path), max_items=1, min_age=600)
+    serving = _write(first, "x\n")
+    own_old = _write(second, "y\n")
+    _write(second, "z\n")
+    # second's own older file goes, first's young one stays
+    assert not os.path.exists(second.path(own_old))
+    assert first.read_bytes(serving) == b"x\n"
+
+    past = time.time() - 601
+    os.utime(first.path(serving), (past, past))
+    _write(second, "w\n")
+    assert not os.path.exists(first.path(serving))
+
+def test_download_handles_are_plain_binary_files(tmp_path):
+    download_data_util = pytest.importorskip("streamlit.runtime.download_data_util")
+    store = ArtifactStore(root=str(tmp_path / "art"))
+    aid = _write(store, "Handle,Title\nshirt,Shirt\n")
+    blobs = BlobStore(root=str(tmp_path / "blobs"))
+    digest = blobs.put(b"Handle\nmug\n")["digest"]
+
+    for f, expected in ((io.BufferedReader(store.open(aid)), b"Handle,Title\nshirt,Shirt\n"),
+                        (blobs.reader(digest), b"Handle\nmug\n")):
+        with f:
+            data, _ = download_data_util.convert_data_to_bytes_and_infer_mime(f, TypeError("unsupported"))
+        assert data == expected
+    assert blobs.reader("0" * 64) is None
@@ -0,0 +1,109 @@
+# tests/test_delta_rerun.py
+# Delta re-runs: only edited per_product handles are re-transformed, and the merged reply is a full run
+# - delta_handles() (the app's check) sends a full run once the strategy or a catalog-wide override
+#   changed; run_delta() refuses those too, and local_server then answers with a full transform
+# - merge_delta(previous response, delta) must equal a full run with the same inputs, apart from the
+#   run's identity (run_id, files, timings, timestamps) — engine in-process and over HTTP
+
+import json
+
+import pytest
+import requests
+
+import local_engine
+from local_server import WEBHOOK_PATH
+from benchmarks.generator import CatalogSpec, generate_bytes
+from delta_rerun import delta_handles, merge_delta
+from webhook_client import post_catalog, sha256_hex
+
+DATA = generate_bytes(CatalogSpec(rows=400, seed=3))
+
+def comparable(resp):
+    out = {k: v for k, v in resp.items() if k not in ("run_id", "files", "request_id", "delta")}
+    log = dict(out["decision_log"])
+    log.pop("timings")
+    log["meta"] = {k: v for k, v in log["meta"].items() if k not in ("started_at", "completed_at", "delta_groups")}
+    out["decision_log"] = log
+    return out
+
+@pytest.fixture(scope="module")
+def overflow_handles():
+    first = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json="")
+    handles = [item["handle"] for item in first["handles_with_overflow"]]
+    assert len(handles) >= 4
+    return handles
+
+def _overrides(per_product, **catalog_wide):
+    return json.dumps(dict(catalog_wide, per_product=per_product))
+
+def _edits(handles):
+    # before: one override; after: it is dropped (handle overflows again) and two later handles get one
+    before = _overrides({handles[0]: {"chosen_options": ["Color", "Size"]}})
+    after = _overrides({handles[1]: {"chosen_options": ["Color"]},
+                        handles[3]: {"chosen_options": ["Size", "Color", "Material"]}})
+    return before, after
+
+def test_only_per_product_edits_allow_a_delta(overflow_handles):
+    before, after = _edits(overflow_handles)
+    last = {"strategy_json": '{"fix_missing_price":"zero"}', "overrides_json": before}
+    assert delta_handles(last, '{"fix_missing_price": "zero"}', after) == \
+        [overflow_handles[0], overflow_handles[1], overflow_handles[3]]
+    assert delta_handles(last, '{"fix_missing_price":"copy_compare_at"}', after) is None
+    assert delta_handles(last, "", after) is None
+    rules = [{"varying_attributes": ["Color", "Size", "Material", "Pattern"], "chosen_options": ["Color"]}]
+    assert delta_handles(last, last["strategy_json"], _overrides({}, rules=rules)) is None
+
+def test_merged_delta_equals_full_run(overflow_handles):
+    before, after = _edits(overflow_handles)
+    base = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json=before)
+    handles = delta_handles({"strategy_json": "", "overrides_json": before}, "", after)
+    strict, strategy, overrides = local_engine.parse_inputs(False, "", after)
+    delta = local_engine.run_delta(base["run_id"], handles, strategy, overrides, strict)
+    assert delta["delta"] and delta["decision_log"]["meta"]["delta_groups"] == 3
+
+    merged = merge_delta(base, delta)
+    full = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json=after)
+    assert comparable(merged) == comparable(full)
+    csv = lambda resp: local_engine.ARTIFACTS.read_bytes(local_engine.run_artifact(resp["run_id"])["artifact_id"])
+    assert csv(merged) == csv(full)
+
+def test_engine_refuses_a_delta_across_a_strategy_change(overflow_handles):
+    before, after = _edits(overflow_handles)
+    base = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json=before)
+    strict, strategy, overrides = local_engine.parse_inputs(False, '{"fix_missing_price":"zero"}', after)
+    assert local_engine.run_delta(base["run_id"], [overflow_handles[1]], strategy, overrides, strict) is None
+
+def _rerun(base_url, strategy_json, overrides_json, **delta):
+    body = dict(strict_mode="false", strategy_json=strategy_json, overrides_json=overrides_json, **delta)
+    headers = {"x-file-digest": sha256_hex(DATA), "x-digest-only": "true", "content-type": "application/json"}
+    r = requests.post(base_url + WEBHOOK_PATH, data=json.dumps(body), headers=headers, timeout=60)
+    r.raise_for_status()
+    return r.json()
+
+def _server_csv(base_url, resp):
+    meta = resp["files"].get("shopify_csv")
+    path = f"/artifacts/{meta['artifact_id']}" if meta else f"/runs/{resp['run_id']}/csv"
+    r = requests.get(base_url + WEBHOOK_PATH + path, timeout=60)
+    r.raise_for_status()
+    return r.content
+
+def test_server_delta_rerun_and_strategy_change(server, overflow_handles):
+    before, after = _edits(overflow_handles)
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", DATA, False, "", before)
+    base = r.json()
+    handles = delta_handles({"strategy_json": "", "overrides_json": before}, "", after)
+
+    delta = _rerun(server, "", after, base_run_id=base["run_id"], changed_handles=handles)
+    assert delta.get("delta") and delta["changed_handles"] == handles
+    full = _rerun(server, "", after)
+    assert "delta" not in full
+    merged = merge_delta(base, delta)
+    assert comparable(merged) == comparable(full)
+    assert _server_csv(server, merged) == _server_csv(server, full)
+
+    # a strategy change is a full run, even if a client still asks for a delta
+    strategy = '{"fix_missing_price":"zero"}'
+    assert delta_handles({"strategy_json": "", "overrides_json": after}, strategy, after) is None
+    changed = _rerun(server, strategy, after, base_run_id=delta["run_id"], changed_handles=[])
+    assert "delta" not in changed and changed["strategy"] == {"fix_missing_price": "zero"}
+    assert "shopify_csv" in changed["files"]
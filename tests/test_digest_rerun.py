@@ -0,0 +1,95 @@
+# tests/test_digest_rerun.py
+# Digest-keyed re-runs: an upload is parsed once and later requests send only its sha256
+# - CatalogCache: LRU by bytes; an entry larger than the whole budget is not kept
+# - local_server: digest-only re-runs reuse the parsed catalog (x-catalog-cache: hit); an unknown or
+#   evicted digest is 409 digest_not_cached, and a full upload afterwards makes the digest usable again
+
+import json
+
+import pytest
+import requests
+
+import local_engine
+from local_server import WEBHOOK_PATH
+from upload_cache import CatalogCache, catalog_nbytes
+from benchmarks.generator import CatalogSpec, generate_bytes
+from webhook_client import post_catalog, sha256_hex
+
+def _catalog(seed):
+    return generate_bytes(CatalogSpec(rows=300, seed=seed))
+
+def _digest_only(base_url, digest, strategy_json=""):
+    body = {"strict_mode": "false", "strategy_json": strategy_json, "overrides_json": ""}
+    headers = {"x-file-digest": digest, "x-digest-only": "true", "content-type": "application/json"}
+    return requests.post(base_url + WEBHOOK_PATH, data=json.dumps(body), headers=headers, timeout=60)
+
+def _upload(base_url, data, strategy_json=""):
+    _, _, r = post_catalog(requests, base_url, WEBHOOK_PATH, "catalog.csv", data, False, strategy_json, "")
+    r.raise_for_status()
+    return r
+
+def test_catalog_cache_is_a_byte_bounded_lru():
+    cache = CatalogCache(max_bytes=100)
+    cache.put("a", {"n": 1}, nbytes=40)
+    cache.put("b", {"n": 2}, nbytes=40)
+    assert cache.get("a") == {"n": 1}       # a is now the most recent
+    cache.put("c", {"n": 3}, nbytes=40)     # over budget: b goes
+    assert "b" not in cache and "a" in cache and "c" in cache
+    cache.put("huge", {"n": 4}, nbytes=101)
+    assert "huge" not in cache and "a" in cache
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"], stats["hits"]) == (2, 80, 1, 1)
+
+def test_get_or_parse_parses_once():
+    data = _catalog(11)
+    cache = CatalogCache()
+    first, hit = cache.get_or_parse(data)
+    assert not hit and sha256_hex(data) in cache
+    again, hit = cache.get_or_parse(data, sha256_hex(data))
+    assert hit and again is first
+
+def test_digest_only_rerun_reuses_the_parsed_upload(server):
+    data = _catalog(12)
+    full = _upload(server, data)
+    assert full.headers["x-catalog-cache"] in ("stored", "hit")
+
+    r = _digest_only(server, sha256_hex(data), '{"fix_missing_price":"zero"}')
+    assert r.status_code == 200 and r.headers["x-catalog-cache"] == "hit"
+    rerun = r.json()
+    assert rerun["strategy"] == {"fix_missing_price": "zero"}
+    stages = [s["stage"] for s in rerun["decision_log"]["timings"]]
+    assert "parse" in stages and "read_csv" not in stages   # one cached span instead of the parse spans
+    assert "read_csv" in [s["stage"] for s in full.json()["decision_log"]["timings"]]
+    assert rerun["decision_log"]["meta"]["row_count"] == full.json()["decision_log"]["meta"]["row_count"]
+
+def test_unknown_digest_is_409_and_a_full_upload_recovers(server):
+    data = _catalog(13)
+    digest = sha256_hex(data)
+    r = _digest_only(server, digest)
+    assert r.status_code == 409
+    assert r.json() == {"ok": False, "error": "digest_not_cached", "file_digest": digest}
+
+    _upload(server, data)  # the client's fallback
+    assert _digest_only(server, digest).status_code == 200
+
+@pytest.fixture
+def small_cache_server(monkeypatch):
+    """A server whose catalog cache holds one of the test catalogs but not two."""
+    from benchmarks.run import _start_server
+    size = catalog_nbytes(local_engine.load_catalog(_catalog(14)))
+    monkeypatch.setenv("MC_CATALOG_CACHE_BYTES", str(int(size * 1.5)))
+    proc, base_url = _start_server()
+    yield base_url
+    proc.terminate()
+    proc.wait(timeout=10)
+
+def test_evicted_digest_falls_back_to_a_full_upload(small_cache_server):
+    first, second = _catalog(14), _catalog(15)
+    _upload(small_cache_server, first)
+    assert _digest_only(small_cache_server, sha256_hex(first)).status_code == 200
+    _upload(small_cache_server, second)   # evicts the first catalog
+
+    r = _digest_only(small_cache_server, sha256_hex(first))
+    assert r.status_code == 409 and r.json()["error"] == "digest_not_cached"
+    assert _upload(small_cache_server, first).headers["x-catalog-cache"] == "stored"
+    assert _digest_only(small_cache_server, sha256_hex(first)).headers["x-catalog-cache"] == "hit"
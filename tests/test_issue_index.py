@@ -0,0 +1,77 @@
+# tests/test_issue_index.py
+# The qa issue index: counts per code / handle, bounded samples, first page + cursor for the rest
+# - Walking next_cursor from qa through issues_page() yields the full issue list, in order, once
+# - Malformed cursors are rejected (ValueError in the engine, 400 bad_cursor from local_server)
+
+import pytest
+import requests
+
+import local_engine
+from local_server import WEBHOOK_PATH
+from benchmarks.generator import CatalogSpec, generate_bytes
+from webhook_client import post_catalog
+
+DATA = generate_bytes(CatalogSpec(rows=1500, seed=5, missing_price_rate=0.05))
+
+@pytest.fixture(scope="module")
+def run():
+    return local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json="")
+
+def _all_issues(run_id):
+    return local_engine._issue_records(local_engine.get_run(run_id)["issues"])
+
+def test_index_is_bounded_and_consistent(run):
+    qa, issues = run["qa"], _all_issues(run["run_id"])
+    assert qa["total"] == len(issues) > local_engine.ISSUE_PAGE
+    assert sum(qa["counts"].values()) == qa["total"]
+    assert qa["issues"] == issues[:local_engine.ISSUE_PAGE]
+    assert qa["next_cursor"] == str(local_engine.ISSUE_PAGE)
+    for code, sample in qa["samples"].items():
+        assert sample == [i for i in issues if i["code"] == code][:local_engine.ISSUE_SAMPLE]
+    top = qa["handles"]["top"]
+    assert len(top) <= local_engine.ISSUE_TOP_HANDLES
+    assert list(top.values()) == sorted(top.values(), reverse=True)
+    assert all(sum(i["handle"] == h for i in issues) == n for h, n in top.items())
+    assert run["decision_log"]["qa"]["counts"] == qa["counts"]
+
+def test_cursor_walk_returns_every_issue_once(run):
+    got, cursor = list(run["qa"]["issues"]), run["qa"]["next_cursor"]
+    while cursor is not None:
+        page = local_engine.issues_page(run["run_id"], cursor, 150)
+        assert page["cursor"] == cursor and len(page["issues"]) <= 150
+        got += page["issues"]
+        cursor = page["next_cursor"]
+    assert got == _all_issues(run["run_id"])
+
+def test_filters_and_bad_cursor(run):
+    issues = _all_issues(run["run_id"])
+    page = local_engine.issues_page(run["run_id"], 0, 1000, code="REQ_MISSING_PRICE")
+    assert page["issues"] == [i for i in issues if i["code"] == "REQ_MISSING_PRICE"]
+    assert page["matched"] == run["qa"]["counts"]["REQ_MISSING_PRICE"] and page["next_cursor"] is None
+    handle = next(iter(run["qa"]["handles"]["top"]))
+    page = local_engine.issues_page(run["run_id"], 0, 1000, handle=handle)
+    assert page["issues"] == [i for i in issues if i["handle"] == handle]
+
+    assert len(local_engine.issues_page(run["run_id"], 0, 10 ** 6)["issues"]) == \
+        min(len(issues), local_engine.ISSUE_PAGE_MAX)
+    with pytest.raises(ValueError):
+        local_engine.issues_page(run["run_id"], "abc")
+    assert local_engine.issues_page("0" * 36) is None
+
+def test_server_issue_pages(server):
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", DATA, False, "", "")
+    resp = r.json()
+    url = f"{server}{WEBHOOK_PATH}/runs/{resp['run_id']}/issues"
+
+    page = requests.get(url, params={"cursor": resp["qa"]["next_cursor"], "limit": 50}, timeout=30).json()
+    assert page["ok"] and page["cursor"] == resp["qa"]["next_cursor"] and len(page["issues"]) == 50
+    assert page["next_cursor"] == str(int(resp["qa"]["next_cursor"]) + 50)
+    coded = requests.get(url, params={"code": "EXCESS_OPTION_DIMENSIONS"}, timeout=30).json()
+    assert coded["matched"] == resp["qa"]["counts"]["EXCESS_OPTION_DIMENSIONS"]
+    assert {i["code"] for i in coded["issues"]} == {"EXCESS_OPTION_DIMENSIONS"}
+
+    for params in ({"cursor": "abc"}, {"limit": "many"}):
+        bad = requests.get(url, params=params, timeout=30)
+        assert bad.status_code == 400 and bad.json()["error"] == "bad_cursor"
+    missing = requests.get(f"{server}{WEBHOOK_PATH}/runs/{'0' * 36}/issues", timeout=30)
+    assert missing.status_code == 404 and missing.json()["error"] == "run_not_found"
@@ -0,0 +1,119 @@
+# tests/test_jobs.py
+# Background jobs: submit returns at once, status reports the running stage with row counts, cancel stops work
+# - JobManager directly, with work gated on events so each state is observed, not raced
+# - local_server: POST .../jobs → 202, GET .../jobs/<id> until done, DELETE on unknown / finished jobs
+
+import threading
+import time
+
+import requests
+
+from jobs import JobManager, STAGES
+from local_server import JOBS_PATH
+from benchmarks.generator import CatalogSpec, generate_bytes
+from webhook_client import post_catalog
+
+def _wait(jobs, job_id, statuses, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.status(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+def test_submit_poll_and_result():
+    jobs = JobManager(workers=1)
+    in_transform, release = threading.Event(), threading.Event()
+
+    def work(progress):
+        progress("parse", 10, 10)
+        progress("transform", 4, 10)
+        in_transform.set()
+        release.wait(5)
+        progress("transform", 10, 10)
+        progress("csv", 10, 10)
+        return {"ok": True}
+
+    job_id = jobs.submit(work, meta={"request_id": "r1"})
+    assert in_transform.wait(5)
+    job = jobs.status(job_id)
+    assert (job["status"], job["stage"], job["done"], job["total"]) == ("running", "transform", 4, 10)
+    states = {s["name"]: s["state"] for s in job["stages"]}
+    assert states == {"parse": "done", "mapping": "done", "transform": "running", "csv": "pending"}
+    assert "result" not in job and not any(k.startswith("_") for k in job)
+
+    release.set()
+    job = _wait(jobs, job_id, ("done",))
+    assert job["result"] == {"ok": True} and job["meta"] == {"request_id": "r1"}
+    assert [s["name"] for s in job["stages"]] == STAGES and all(s["state"] == "done" for s in job["stages"])
+    assert "result" not in jobs.status(job_id, include_result=False)
+
+def test_failed_job_reports_the_error():
+    jobs = JobManager(workers=1)
+
+    def work(progress):
+        progress("parse", 0, 0)
+        raise ValueError("bad catalog")
+
+    job = _wait(jobs, jobs.submit(work), ("error",))
+    assert job["error"] == "ValueError: bad catalog" and "traceback" in job
+
+def test_cancel_queued_and_running_jobs():
+    jobs = JobManager(workers=1)
+    started, calls = threading.Event(), []
+
+    def long_work(progress):
+        started.set()
+        while True:  # stops only through cancellation
+            progress("transform", 1, 2)
+            time.sleep(0.01)
+
+    running = jobs.submit(long_work)
+    assert started.wait(5)
+    queued = jobs.submit(lambda progress: calls.append("ran"))
+    assert jobs.cancel(queued) is True
+    assert jobs.status(queued)["status"] == "cancelled"
+
+    assert jobs.cancel(running) is True
+    assert _wait(jobs, running, ("cancelled",))["stage"] == "transform"
+    assert jobs.cancel(running) is False      # already finished
+    assert jobs.cancel("0" * 32) is None
+    done = _wait(jobs, jobs.submit(lambda progress: {"ok": True}), ("done",))  # the worker is free again
+    assert done["result"] == {"ok": True} and calls == []
+    assert jobs.stats() == {"cancelled": 2, "done": 1}
+
+def test_eviction_keeps_running_jobs():
+    jobs = JobManager(workers=1, max_jobs=2)
+    release = threading.Event()
+    blocker = jobs.submit(lambda progress: release.wait(5))
+    queued = [jobs.submit(lambda progress: None) for _ in range(3)]  # unfinished: none can be evicted
+    assert jobs.status(blocker) is not None and all(jobs.status(j) for j in queued)
+    release.set()
+    for j in queued:
+        _wait(jobs, j, ("done",))
+    jobs.submit(lambda progress: None)
+    assert jobs.status(blocker) is None and jobs.status(queued[0]) is None  # oldest finished go first
+    assert jobs.status(queued[2]) is not None
+
+def test_server_job_lifecycle(server):
+    data = generate_bytes(CatalogSpec(rows=500, seed=21))
+    _, _, r = post_catalog(requests, server, JOBS_PATH, "catalog.csv", data, False, "", "")
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+    assert r.json()["status_url"] == f"{JOBS_PATH}/{job_id}"
+
+    deadline = time.time() + 60
+    while True:
+        job = requests.get(server + JOBS_PATH + "/" + job_id, timeout=10).json()
+        if job["status"] in ("done", "error") or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done" and job["ok"]
+    assert job["result"]["decision_log"]["meta"]["row_count"] == 500
+    assert "shopify_csv" in job["result"]["files"]
+
+    r = requests.delete(server + JOBS_PATH + "/" + job_id, timeout=10)
+    assert r.status_code == 409 and r.json()["error"] == "job_finished"
+    assert requests.delete(server + JOBS_PATH + "/" + "0" * 32, timeout=10).status_code == 404
+    assert requests.get(server + JOBS_PATH + "/" + "0" * 32, timeout=10).status_code == 404
@@ -0,0 +1,77 @@
+# tests/test_llm_cache.py
+# The workflow's LLM response cache, run under node (benchmarks/node_llm_cache.js) against
+# benchmarks/fake_model_server.py; skipped when node is not on PATH
+# - cold miss → repeat hit (no model call, cache file untouched) → llm_cache=bypass → TTL expiry
+# - the plan key follows the prompt inputs: another strategy re-asks the plan model, not the mapping one
+
+import json
+import shutil
+import threading
+import time
+
+import pytest
+
+from benchmarks import fake_model_server
+from benchmarks.generator import CatalogSpec
+from benchmarks.llm_cache import file_stamp, run_path, sync_item
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node not found on PATH")
+
+SETTINGS = {"strategy_json": json.dumps({"fix_missing_price": "skip"}), "overrides_json": ""}
+
+@pytest.fixture(scope="module")
+def model_url():
+    httpd = fake_model_server.serve("127.0.0.1", 0, 0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+@pytest.fixture
+def run(model_url, tmp_path):
+    cache = str(tmp_path / "llm_cache.json")
+
+    def _run(item, **env):
+        before = file_stamp(cache)
+        out = run_path(item, str(tmp_path), model_url, {"MC_LLM_CACHE_PATH": cache, **env})
+        out["file_written"] = file_stamp(cache) != before
+        return out
+    return _run
+
+def _item(**context):
+    return sync_item(CatalogSpec(rows=200, seed=3), dict(SETTINGS, **context))
+
+def _cached(out):
+    return {k: v["cached"] for k, v in out["decision_log_llm_cache"].items()}
+
+def test_cold_miss_then_repeat_hit(run):
+    cold = run(_item())
+    assert cold["model_calls"] == 2 and cold["file_written"]
+    assert _cached(cold) == {"mapping": False, "plan": False}
+    assert cold["mapping"]["stored"] and cold["plan"]["stored"]
+
+    repeat = run(_item())
+    assert repeat["model_calls"] == 0 and not repeat["file_written"]   # lookups never rewrite the file
+    assert _cached(repeat) == {"mapping": True, "plan": True}
+    assert repeat["plan_strategy"] == cold["plan_strategy"] and repeat["mapping_pairs"] == cold["mapping_pairs"]
+
+def test_bypass_asks_the_model_and_keeps_the_cache(run):
+    run(_item())
+    bypass = run(_item(llm_cache="bypass"))
+    assert bypass["model_calls"] == 2 and bypass["mapping"]["bypass"] and bypass["plan"]["bypass"]
+    after = run(_item())
+    assert after["model_calls"] == 0 and _cached(after) == {"mapping": True, "plan": True}
+
+def test_expired_entries_are_asked_again(run):
+    run(_item())
+    time.sleep(1.2)
+    expired = run(_item(), MC_LLM_CACHE_TTL_SEC="1")
+    assert expired["model_calls"] == 2 and _cached(expired) == {"mapping": False, "plan": False}
+    assert expired["plan"]["stats"]["expired"] >= 1
+
+def test_plan_key_follows_the_strategy(run):
+    base = run(_item())
+    other = run(_item(strategy_json=json.dumps({"fix_missing_price": "zero"})))
+    keys = lambda out: {k: v["key"] for k, v in out["decision_log_llm_cache"].items()}
+    assert keys(other)["mapping"] == keys(base)["mapping"] and keys(other)["plan"] != keys(base)["plan"]
+    assert other["model_calls"] == 1 and _cached(other) == {"mapping": True, "plan": False}
+    assert run(_item(strategy_json=json.dumps({"fix_missing_price": "zero"})))["model_calls"] == 0
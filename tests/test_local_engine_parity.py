@@ -0,0 +1,161 @@
+# tests/test_local_engine_parity.py
+# local_engine.run_local against the workflow's Transform & QA node, run under node by
+# benchmarks/node_transform.js, on generated Woo and custom catalogs
+# - Reference is the deployed node (the workflow JSON's jsCode); transform_qa_10_19.js must match it
+# - Compares the CSV bytes, qa, gate, handles_with_overflow and decision_log.overrides_applied
+# - Cases cover sku_generation "generate_unique" on expanded simple products, no fix_missing_price
+#   with missing prices, and the Metafields column both empty and written by overflow demotion
+# - "woo_repeats" adds simple products whose pipe lists repeat values (merged before expansion,
+#   one DUP_OPTION_VALUES per product)
+# - Skipped when node is not on PATH
+
+import os
+import io
+import csv
+import json
+import base64
+import random
+import shutil
+import subprocess
+
+import pytest
+
+import local_engine
+from benchmarks.generator import HEADERS, CatalogSpec, generate_bytes
+from benchmarks.run import REPO_ROOT
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node not found on PATH")
+
+HARNESS = os.path.join(REPO_ROOT, "benchmarks", "node_transform.js")
+NODE_FILE = os.path.join(REPO_ROOT, "transform_qa_10_19.js")
+WORKFLOW = os.path.join(REPO_ROOT, "Shopify_Migration_Assistant_MVP (8).json")
+
+CUSTOM_HEADERS = ["Title", "SKU", "Price", "Sale Price", "Color", "Size", "Material", "Style", "Vendor",
+                  "Tags", "Image URL"]
+
+def custom_bytes(products: int, seed: int = 11) -> bytes:
+    """Flat non-Woo export: one row per variant, no Type/Parent, option columns by name; some titles
+    repeat (one handle, several groups), some SKUs and prices are blank, some cells pipe-delimited."""
+    rnd = random.Random(seed)
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(CUSTOM_HEADERS)
+    for p in range(products):
+        title = f"Shirt {p % (products // 2)}" if p % 7 == 0 else f"Item {p}"
+        for v in range(rnd.randint(1, 4)):
+            color = "|".join(rnd.sample(["Red", "Blue", "Green"], 2)) if rnd.random() < 0.2 else rnd.choice(["Red", "Blue"])
+            w.writerow([
+                title,
+                "" if rnd.random() < 0.1 else f"C{p:04d}-{v}",
+                "" if rnd.random() < 0.05 else f"{rnd.randint(5, 90)}.50",
+                rnd.choice(["", "", "4.00"]),
+                color,
+                rnd.choice(["S", "M", "L"]),
+                rnd.choice(["", "Cotton", "Wool"]),
+                rnd.choice(["", "", "Slim", "Classic"]),
+                rnd.choice(["Acme", ""]),
+                "custom,generated",
+                f"https://cdn.example.com/c{p}.jpg",
+            ])
+    return buf.getvalue().encode("utf-8")
+
+def woo_repeats_bytes() -> bytes:
+    """Generated Woo catalog plus simple products with repeated values in their pipe lists."""
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=HEADERS, lineterminator="\n")
+    for n, (colors, sizes) in enumerate([("Red|Red|Blue", "S|M"), ("Red|" * 40 + "Blue", "S|S|S|S"),
+                                          ("Navy|Navy", "L|XL|L"), ("Olive|Olive", "M")]):
+        w.writerow({"ID": f"9{n:03d}", "Type": "simple", "SKU": f"R{n}", "Name": f"Repeat {n}",
+                    "Regular price": "10.00", "Attribute 1 name": "Color", "Attribute 1 value(s)": colors,
+                    "Attribute 2 name": "Size", "Attribute 2 value(s)": sizes})
+    return generate_bytes(CatalogSpec(rows=300, seed=5)) + buf.getvalue().encode("utf-8")
+
+FIXTURES = {
+    "woo": lambda: generate_bytes(CatalogSpec(rows=600, seed=3, missing_parent_rate=0.1)),
+    "custom": lambda: custom_bytes(150),
+    "woo_repeats": woo_repeats_bytes,
+}
+
+@pytest.fixture(scope="module")
+def deployed_node(tmp_path_factory):
+    with open(WORKFLOW, encoding="utf-8") as f:
+        nodes = {n["name"]: n for n in json.load(f)["nodes"]}
+    path = tmp_path_factory.mktemp("node") / "transform_qa_deployed.js"
+    path.write_text(nodes["Transform & QA"]["parameters"]["jsCode"], encoding="utf-8")
+    return str(path)
+
+def run_node(node_path: str, data: bytes, strategy: dict, overrides: dict, work) -> dict:
+    reader = csv.reader(io.StringIO(data.decode("utf-8")))
+    headers = next(reader)
+    item = {"headers": headers, "rows": list(reader), "mapping": [], "strict_mode": False,
+            "strategy": strategy, "overrides": overrides}
+    inp, out = work / "input.json", work / "response.json"
+    inp.write_text(json.dumps(item), encoding="utf-8")
+    subprocess.run(["node", HARNESS, str(inp), node_path, "--out", str(out)], capture_output=True, text=True,
+                   check=True)
+    return json.loads(out.read_text(encoding="utf-8"))
+
+def comparable_node(resp: dict) -> dict:
+    return {
+        "csv": base64.b64decode(resp["files"]["shopify_csv_base64"]),
+        "qa": resp["qa"],
+        "gate": resp["gate"],
+        "handles_with_overflow": resp["handles_with_overflow"],
+        "overrides_applied": resp["decision_log"]["overrides_applied"],
+    }
+
+def comparable_local(resp: dict) -> dict:
+    qa = dict(resp["qa"], next_cursor=None)  # the node keeps no run to page from
+    return {
+        "csv": local_engine.build_csv(local_engine.get_run(resp["run_id"])["out"]).encode("utf-8"),
+        "qa": qa,
+        "gate": resp["gate"],
+        "handles_with_overflow": resp["handles_with_overflow"],
+        "overrides_applied": resp["decision_log"]["overrides_applied"],
+    }
+
+def demote_overflow(data: bytes, strategy: dict) -> dict:
+    """per_product overrides moving every overflowing handle's extra options to Body/Metafields."""
+    resp = local_engine.run_local(data, False, json.dumps(strategy), "")
+    per_product = {}
+    for h in resp["handles_with_overflow"]:  # a shared handle is listed once per group; first with options wins
+        if h["suggested_three"]:
+            per_product.setdefault(h["handle"], {"chosen_options": h["suggested_three"],
+                                                 "overflow_to": "append_to_body_html"})
+    return {"per_product": per_product}
+
+CASES = {
+    "default": ({"fix_missing_price": "zero"}, False),
+    "generate_unique_no_price_fix": ({"sku_generation": "generate_unique"}, False),
+    "metafields": ({"fix_missing_price": "copy_compare_at"}, True),
+}
+
+@pytest.mark.parametrize("case", list(CASES))
+@pytest.mark.parametrize("fixture", list(FIXTURES))
+def test_local_engine_matches_node(fixture, case, deployed_node, tmp_path):
+    data = FIXTURES[fixture]()
+    strategy, demote = CASES[case]
+    overrides = demote_overflow(data, strategy) if demote else {}
+    if demote:
+        assert overrides["per_product"], "fixture has no overflowing handles"
+
+    expected = comparable_node(run_node(deployed_node, data, strategy, overrides, tmp_path))
+    local = comparable_local(local_engine.run_local(data, False, json.dumps(strategy), json.dumps(overrides)))
+    assert local["csv"] == expected["csv"]
+    for key in ("qa", "gate", "handles_with_overflow", "overrides_applied"):
+        assert local[key] == expected[key], key
+
+    header = next(csv.reader(io.StringIO(expected["csv"].decode("utf-8"))))
+    assert header[-1] == "Metafields"
+    written = [r for r in csv.DictReader(io.StringIO(expected["csv"].decode("utf-8"))) if r["Metafields"]]
+    assert bool(written) == demote
+
+    repo_file = comparable_node(run_node(NODE_FILE, data, strategy, overrides, tmp_path))
+    assert repo_file == expected
+
+def test_generate_unique_replaces_expanded_skus():
+    # only Woo attribute values pipe-expand; custom option columns are single values
+    data = FIXTURES["woo"]()
+    keep = local_engine.run_local(data, False, '{"fix_missing_price":"zero"}', "")
+    unique = local_engine.run_local(data, False, '{"fix_missing_price":"zero","sku_generation":"generate_unique"}', "")
+    assert unique["qa"]["counts"].get("AUTO_SKU_ASSIGNED", 0) > keep["qa"]["counts"].get("AUTO_SKU_ASSIGNED", 0)
@@ -0,0 +1,66 @@
+# tests/test_multipart.py
+# webhook_client.MultipartBody → local_server.read_multipart round trips
+# - one pass: every byte is read once, in chunks of at most `chunk`, and the file part is hashed as it
+#   arrives (the digest matches sha256 of the upload whatever the chunk size)
+# - local_server answers 400 digest_mismatch when x-file-digest disagrees with the upload
+
+import io
+import hashlib
+
+import requests
+
+import local_server
+from local_server import WEBHOOK_PATH
+from webhook_client import MultipartBody, post_catalog, sha256_hex
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self.reads.append((size, len(data)))
+        return data
+
+def parse(body: MultipartBody, chunk: int = local_server.STREAM_CHUNK):
+    return local_server.read_multipart(io.BytesIO(body.read()), len(body), body.content_type, chunk=chunk)
+
+def test_quotes_and_newlines_in_names_stay_inside_the_header():
+    content = b"Name,Regular price\nA,1\n"
+    body = MultipartBody({'strategy "json"': '{"a": 1}', "strict_mode": "false"}, "file",
+                         'evil"; name="x"\r\nX-Injected: 1\r\n.csv', content)
+    fields, files = parse(body)
+    assert fields == {'strategy %22json%22': '{"a": 1}', "strict_mode": "false"}
+    assert list(files) == ["file"]
+    filename, payload, digest = files["file"]
+    assert filename == 'evil%22; name=%22x%22%0D%0AX-Injected: 1%0D%0A.csv'
+    assert bytes(payload) == content
+    assert digest == hashlib.sha256(content).hexdigest()
+
+def test_single_pass_hashing_across_chunk_sizes():
+    # bytes that look like the start of a boundary, so some chunk edges split a near-match
+    content = b"".join(b"Row %d,\r\n--%x\r\n-" % (i, i) for i in range(2000))
+    body = MultipartBody({"strict_mode": "false"}, "file", "catalog.csv", content)
+    raw = body.read()
+    for chunk in (1, 7, 64, 1000, 4096, len(raw) + 1):
+        stream = CountingReader(raw)
+        fields, files = local_server.read_multipart(stream, len(raw), body.content_type, chunk=chunk)
+        assert fields == {"strict_mode": "false"}
+        _, payload, digest = files["file"]
+        assert bytes(payload) == content and digest == hashlib.sha256(content).hexdigest()
+        assert sum(n for _, n in stream.reads) == len(raw)          # nothing read twice or left behind
+        assert all(0 < size <= chunk for size, _ in stream.reads)
+
+def test_server_rejects_a_digest_mismatch(server):
+    content = b"Handle,Title,Regular price\nshirt,Shirt,10\n"
+    wrong = sha256_hex(b"another upload")
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", content, False, "", "",
+                           file_digest=wrong)
+    assert r.status_code == 400
+    js = r.json()
+    assert js["error"] == "digest_mismatch" and not js["ok"]
+    assert (js["file_digest"], js["computed_digest"]) == (wrong, sha256_hex(content))
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", content, False, "", "",
+                           file_digest=sha256_hex(content).upper())
+    assert r.status_code == 200
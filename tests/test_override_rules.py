@@ -0,0 +1,104 @@
+# tests/test_override_rules.py
+# Rule-based overrides: one option choice for every product with the same varying-attribute set
+# - parse_inputs() drops malformed rules exactly like the Parse Inputs node's sanitizeRules (run under
+#   node when it is on PATH); the attribute-set key ignores order and case, the first rule for a set wins
+# - per_product entries beat rules; a bulk fix stays a few hundred bytes in the request body
+
+import json
+import os
+import shutil
+import subprocess
+from collections import Counter
+
+import pytest
+import requests
+
+import local_engine
+from local_server import WEBHOOK_PATH
+from benchmarks.generator import CatalogSpec, generate_bytes
+from webhook_client import post_catalog
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKFLOW = os.path.join(REPO_ROOT, "Shopify_Migration_Assistant_MVP (8).json")
+DATA = generate_bytes(CatalogSpec(rows=3000, seed=7, wide_products=40))
+
+BAD_AND_GOOD_RULES = [
+    "not a rule",
+    {"varying_attributes": "Color,Size", "chosen_options": ["Color"]},       # attributes not a list
+    {"varying_attributes": ["Color", "Size"]},                                # no chosen_options
+    {"varying_attributes": ["", None], "chosen_options": ["Color"]},          # no attributes left
+    {"varying_attributes": ["Color", "Size"], "chosen_options": ["", None]},  # nothing chosen
+    {"varying_attributes": ["Color", "Size", "Material", "Style"],
+     "chosen_options": ["Color", "", "Size", "Material", "Style"], "overflow_to": 7},
+    {"varying_attributes": ["Color", 5, "Size"], "chosen_options": ["Size"], "overflow_to": "append_to_body_html"},
+]
+CLEAN_RULES = [
+    {"varying_attributes": ["Color", "Size", "Material", "Style"], "chosen_options": ["Color", "Size", "Material"]},
+    {"varying_attributes": ["Color", "5", "Size"], "chosen_options": ["Size"], "overflow_to": "append_to_body_html"},
+]
+
+@pytest.fixture(scope="module")
+def overflow():
+    js = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json="")
+    return js["handles_with_overflow"]
+
+def _rule(attrs, chosen):
+    return {"varying_attributes": list(attrs), "chosen_options": list(chosen)}
+
+def test_malformed_rules_are_dropped():
+    _, _, overrides = local_engine.parse_inputs(False, "", json.dumps({"rules": BAD_AND_GOOD_RULES}))
+    assert overrides["rules"] == CLEAN_RULES
+    _, _, overrides = local_engine.parse_inputs(False, "", json.dumps({"rules": {"Color": "Size"}}))
+    assert overrides["rules"] == []
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node not found on PATH")
+def test_sanitize_rules_in_the_workflow_agrees():
+    script = """
+const fs = require("fs");
+const wf = JSON.parse(fs.readFileSync(process.argv[1], "utf8"));
+const code = wf.nodes.find((n) => n.name === "Parse Inputs").parameters.jsCode;
+const quiet = { log() {}, warn() {}, error() {} };
+const item = { json: { context: { overrides_json: process.argv[2] } } };
+const out = new Function("$input", "$json", "console", code)({ first: () => item }, item.json, quiet);
+process.stdout.write(JSON.stringify(out[0].json.overrides));
+"""
+    for rules in (BAD_AND_GOOD_RULES, {"Color": "Size"}):
+        raw = json.dumps({"rules": rules})
+        js = json.loads(subprocess.run(["node", "-e", script, WORKFLOW, raw], check=True,
+                                       capture_output=True, text=True).stdout)
+        assert js == local_engine.parse_inputs(False, "", raw)[2]
+
+def test_rule_index_keys_ignore_order_and_case():
+    first = _rule(["size", "COLOR", "Material", "Style"], ["Color"])
+    index = local_engine.rule_index({"rules": [first, _rule(["Color", "Size", "Material", "Style"], ["Size"])]})
+    assert list(index) == [("color", "material", "size", "style")]
+    assert index[("color", "material", "size", "style")] == dict(first, rule=0)
+
+def test_one_rule_resolves_every_product_with_that_set(overflow):
+    by_set = Counter(tuple(item["varying_attributes"]) for item in overflow)
+    attrs, n = by_set.most_common(1)[0]
+    assert n > 1
+    targets = {item["handle"] for item in overflow if tuple(item["varying_attributes"]) == attrs}
+    rule = _rule(reversed([a.upper() for a in attrs]), ["Color", "Size", "Material"])
+    exception = sorted(targets)[0]
+    overrides = json.dumps({"rules": [rule],
+                            "per_product": {exception: {"chosen_options": ["Size", "Color"]}}})
+    assert len(overrides) < 400
+
+    js = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json=overrides)
+    left = {item["handle"] for item in js["handles_with_overflow"]}
+    assert not (targets & left) and len(left) == len(overflow) - len(targets)
+    applied = {a["handle"]: a for a in js["decision_log"]["overrides_applied"]["list"]}
+    assert set(applied) == targets
+    assert all(applied[h].get("rule") == 0 for h in targets - {exception})
+    assert "rule" not in applied[exception] and sorted(applied[exception]["chosen"]) == ["Color", "Size"]
+
+def test_rules_travel_in_the_request_body(server, overflow):
+    attrs = Counter(tuple(item["varying_attributes"]) for item in overflow).most_common(1)[0][0]
+    overrides = json.dumps({"rules": [_rule(attrs, ["Color", "Size", "Material"])]})
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", DATA, False, "", overrides)
+    js = r.json()
+    assert "overrides" not in r.request.url and "x-overrides-json" not in r.request.headers
+    local = local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json=overrides)
+    assert js["decision_log"]["overrides_applied"] == local["decision_log"]["overrides_applied"]
+    assert js["handles_with_overflow"] == local["handles_with_overflow"]
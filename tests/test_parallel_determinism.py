@@ -0,0 +1,77 @@
+# tests/test_parallel_determinism.py
+# run_transform(workers=N) must return what a serial run returns: response, CSV bytes, full QA issue list
+# - Generated catalog with shared handles (untitled products all become "untitled", so several groups
+#   land on one handle and one shard) and repeated variant combos (DUP_VARIANT_COMBO)
+# - PARALLEL_MIN_GROUPS is patched below the catalog's group count so the sharded path really runs
+# - The shared pool is long-lived: it is reused across runs (the catalog ships to a worker once) and
+#   sized on first use, so each worker count starts from shutdown_pool()
+
+import pytest
+
+import local_engine
+from benchmarks.generator import CatalogSpec, generate_bytes
+from benchmarks.parallel_scaling import comparable
+
+SPEC = CatalogSpec(rows=3000, seed=7, missing_title_rate=0.05, missing_parent_rate=0.2)
+
+@pytest.fixture(scope="module")
+def catalog():
+    return local_engine.load_catalog(generate_bytes(SPEC))
+
+@pytest.fixture(scope="module")
+def parsed():
+    return local_engine.parse_inputs(False, '{"fix_missing_price":"zero"}', "")
+
+def _run(catalog, parsed, workers):
+    strict, strategy, overrides = parsed
+    resp = local_engine.run_transform(catalog, strategy, overrides, strict, workers=workers)
+    expand = next(s for s in resp["decision_log"]["timings"] if s["stage"] == "expand")
+    return resp, expand["workers"]
+
+def test_fixture_has_shared_handles_and_dup_combos(catalog, parsed):
+    resp, _ = _run(catalog, parsed, 1)
+    shared = [h for h, gids in local_engine._handle_index(catalog)["transform"].items() if len(gids) > 1]
+    assert "untitled" in shared
+    assert resp["qa"]["counts"].get("DUP_VARIANT_COMBO", 0) > 0
+    issues = local_engine._issue_records(local_engine.get_run(resp["run_id"])["issues"])
+    assert any(i["handle"] == "untitled" for i in issues)
+
+@pytest.fixture
+def fresh_pool():
+    local_engine.shutdown_pool()
+    yield
+    local_engine.shutdown_pool()
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_sharded_run_matches_serial(catalog, parsed, monkeypatch, fresh_pool, workers):
+    monkeypatch.setattr(local_engine, "PARALLEL_MIN_GROUPS", 100)
+    assert len(catalog["groups"]) >= local_engine.PARALLEL_MIN_GROUPS
+    serial, used = _run(catalog, parsed, 1)
+    assert used == 1
+    parallel, used = _run(catalog, parsed, workers)
+    assert used == workers
+
+    expected, got = comparable(serial), comparable(parallel)
+    assert got["csv"].encode("utf-8") == expected["csv"].encode("utf-8")
+    assert got["issues"] == expected["issues"]
+    dup = [i for i in got["issues"] if i["code"] == "DUP_VARIANT_COMBO"]
+    assert dup and dup == [i for i in expected["issues"] if i["code"] == "DUP_VARIANT_COMBO"]
+    assert [i for i in got["issues"] if i["handle"] == "untitled"] == \
+        [i for i in expected["issues"] if i["handle"] == "untitled"]
+    assert got["response"] == expected["response"]
+
+    # input order: output rows and issues follow the catalog's group order, not shard completion order
+    state = local_engine.get_run(parallel["run_id"])
+    assert state["out"]["g"].is_monotonic_increasing
+    assert state["issues"]["g"].is_monotonic_increasing
+
+def test_pool_is_reused_and_sized_from_env(catalog, parsed, monkeypatch, fresh_pool):
+    monkeypatch.setattr(local_engine, "PARALLEL_MIN_GROUPS", 100)
+    monkeypatch.setenv("MC_TRANSFORM_WORKERS", "3")
+    first, used = _run(catalog, parsed, 2)
+    pool, size = local_engine.transform_pool(2)
+    assert (used, size) == (2, 3)
+    second, used = _run(catalog, parsed, 8)  # capped at the pool's size
+    assert used == 3 and local_engine.transform_pool(2)[0] is pool
+    assert comparable(second)["csv"] == comparable(first)["csv"]
+    assert pool._mp_context.get_start_method() != "fork"
@@ -0,0 +1,86 @@
+# tests/test_preview_page.py
+# Paged, filterable preview of a stored run: columnar pages that add up to the exported CSV
+# - preview_page(): offset/limit paging (limit clamped to PREVIEW_PAGE_MAX), handle / issue / option filters
+# - local_server: GET .../runs/<id>/preview, 400 bad_page for non-integer paging, 404 for unknown runs
+
+import csv
+import io
+
+import pytest
+import requests
+
+import local_engine
+from local_server import WEBHOOK_PATH
+from benchmarks.generator import CatalogSpec, generate_bytes
+from webhook_client import post_catalog
+
+DATA = generate_bytes(CatalogSpec(rows=1500, seed=5, missing_price_rate=0.05))
+
+@pytest.fixture(scope="module")
+def run():
+    return local_engine.run_local(file_bytes=DATA, strict_mode=False, strategy_json="", overrides_json="")
+
+def _csv_rows(run_id):
+    text = local_engine.ARTIFACTS.read_bytes(local_engine.run_artifact(run_id)["artifact_id"]).decode("utf-8")
+    return list(csv.reader(io.StringIO(text)))
+
+def _rows(page):
+    return [list(r) for r in zip(*page["data"])] if page["data"] else []
+
+def test_pages_add_up_to_the_csv(run):
+    header, *body = _csv_rows(run["run_id"])
+    rows, positions, offset = [], [], 0
+    while True:
+        page = local_engine.preview_page(run["run_id"], offset, 400)
+        assert page["columns"] == header and page["total"] == page["matched"] == len(body)
+        if not page["positions"]:
+            break
+        rows += _rows(page)
+        positions += page["positions"]
+        offset += len(page["positions"])
+    assert positions == list(range(len(body)))
+    assert [[str(v) for v in r] for r in rows] == body
+
+def test_limit_is_clamped(run):
+    page = local_engine.preview_page(run["run_id"], 0, 10 ** 6)
+    assert page["limit"] == local_engine.PREVIEW_PAGE_MAX == len(page["positions"])
+    assert local_engine.preview_page(run["run_id"], -5, 0)["offset"] == 0
+    assert local_engine.preview_page("0" * 36, 0, 10) is None
+
+def test_filters_select_matching_rows(run):
+    state = local_engine.get_run(run["run_id"])
+    out, issues = state["out"], state["issues"]
+
+    page = local_engine.preview_page(run["run_id"], 0, 500, handle="PRODUCT-1")
+    assert page["matched"] and all("product-1" in h for h in out["Handle"].iloc[page["positions"]])
+
+    page = local_engine.preview_page(run["run_id"], 0, 500, issue="REQ_MISSING_PRICE")
+    groups = set(issues.loc[issues["code"] == "REQ_MISSING_PRICE", "g"])
+    assert page["matched"] == int(out["g"].isin(groups).sum())
+    assert page["issue_codes"] == run["qa"]["counts"]
+
+    page = local_engine.preview_page(run["run_id"], 0, 500, option="navy", handle="product-1")
+    picked = out.iloc[page["positions"]]
+    assert page["matched"] and page["filters"] == {"handle": "product-1", "issue": "", "option": "navy"}
+    assert all("navy" in " ".join(str(r[f"Option{k} Value"]).lower() for k in (1, 2, 3))
+               for _, r in picked.iterrows())
+
+    # a filter's pages are contiguous slices of one selection
+    first = local_engine.preview_page(run["run_id"], 0, 7, issue="DUP_VARIANT_COMBO")
+    second = local_engine.preview_page(run["run_id"], 7, 7, issue="DUP_VARIANT_COMBO")
+    both = local_engine.preview_page(run["run_id"], 0, 14, issue="DUP_VARIANT_COMBO")
+    assert first["positions"] + second["positions"] == both["positions"]
+
+def test_server_preview_pages(server):
+    _, _, r = post_catalog(requests, server, WEBHOOK_PATH, "catalog.csv", DATA, False, "", "")
+    run_id = r.json()["run_id"]
+    url = f"{server}{WEBHOOK_PATH}/runs/{run_id}/preview"
+
+    page = requests.get(url, params={"offset": 10, "limit": 5, "issue": "REQ_MISSING_PRICE"}, timeout=30).json()
+    assert page["ok"] and page["offset"] == 10 and len(page["positions"]) == 5
+    assert page["filters"]["issue"] == "REQ_MISSING_PRICE" and len(page["data"]) == len(page["columns"])
+
+    bad = requests.get(url, params={"offset": "ten"}, timeout=30)
+    assert bad.status_code == 400 and bad.json()["error"] == "bad_page"
+    missing = requests.get(f"{server}{WEBHOOK_PATH}/runs/{'0' * 36}/preview", timeout=30)
+    assert missing.status_code == 404 and missing.json()["error"] == "run_not_found"
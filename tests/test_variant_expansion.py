@@ -0,0 +1,54 @@
+# tests/test_variant_expansion.py
+# Simple products with pipe-delimited option values: lazy cartesian expansion, variant cap, and
+# repeated values merged before expansion (one DUP_OPTION_VALUES per product)
+
+import io
+import csv
+import json
+
+import local_engine
+from benchmarks.generator import HEADERS
+
+def catalog_bytes(products):
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=HEADERS, lineterminator="\n")
+    w.writeheader()
+    for n, attrs in enumerate(products):
+        row = {"ID": str(n + 1), "Type": "simple", "SKU": f"S{n}", "Name": f"Shirt {n}", "Regular price": "10"}
+        for i, (name, values) in enumerate(attrs, 1):
+            row[f"Attribute {i} name"] = name
+            row[f"Attribute {i} value(s)"] = values
+        w.writerow(row)
+    return buf.getvalue().encode("utf-8")
+
+def run(data, strategy=None):
+    resp = local_engine.run_local(data, False, json.dumps(strategy or {}), "")
+    state = local_engine.get_run(resp["run_id"])
+    return resp, state["out"][state["out"]["_part"] == 0], local_engine._issue_records(state["issues"])
+
+def test_repeated_values_are_merged_before_expansion():
+    # 3 options x 200 listed values each, but only 2 distinct per option: 8 variants, not 8,000,000 combos
+    values = "|".join(["Red", "Blue"] * 100)
+    data = catalog_bytes([[("Color", values), ("Size", "|".join(["S", "M"] * 100)),
+                           ("Material", "|".join(["Wool", "Silk"] * 100))]])
+    resp, lines, issues = run(data)
+    assert len(lines) == 8
+    assert not lines.duplicated(["Option1 Value", "Option2 Value", "Option3 Value"]).any()
+    assert [i for i in issues if i["code"] in ("DUP_OPTION_VALUES", "DUP_VARIANT_COMBO")] == [
+        {"code": "DUP_OPTION_VALUES", "field": "Options", "value": 594, "handle": "shirt-0"}]
+    assert resp["qa"]["counts"].get("DUP_VARIANT_COMBO") is None
+
+def test_cap_counts_distinct_combinations_only():
+    data = catalog_bytes([[("Color", "Red|Red|Blue|Green|Blue"), ("Size", "S|M|S")]])
+    _, lines, issues = run(data, {"max_variants_per_product": 4})
+    assert len(lines) == 4
+    limit = [i for i in issues if i["code"] == "VARIANT_LIMIT_EXCEEDED"]
+    assert limit == [{"code": "VARIANT_LIMIT_EXCEEDED", "field": "Options", "handle": "shirt-0", "value": 6,
+                      "limit": 4}]
+    assert [i["value"] for i in issues if i["code"] == "DUP_OPTION_VALUES"] == [3]
+
+def test_only_repeats_is_not_expanded():
+    data = catalog_bytes([[("Color", "Red|Red"), ("Size", "M")]])
+    _, lines, issues = run(data)
+    assert len(lines) == 1
+    assert not [i for i in issues if i["code"] == "DUP_OPTION_VALUES"]
@@ -4,8 +4,23 @@
  * - Demotes overflow to Body(HTML) + Metafields when overflow_to === "append_to_body_html"
  * - Supports quick-fixes: strategy.fix_missing_price ("zero" | "copy_compare_at"), strategy.fix_missing_title {mode:"prefix", prefix:"Untitled"}
  * - Expands "simple" products with pipe-delimited values into cartesian combos for the chosen 3 options
+ *   (lazily, capped by strategy.max_variants_per_product → VARIANT_LIMIT_EXCEEDED); repeated values in an
+ *   option's list are merged first, so every generated combination is distinct, with one DUP_OPTION_VALUES
+ *   issue per product instead of one DUP_VARIANT_COMBO per repeated combination
+ *   and, with strategy.sku_generation === "generate_unique", auto SKUs instead of the source row's
  * - Suppresses EXCESS_OPTION_DIMENSIONS for overridden handles
+ * - overrides.rules: [{varying_attributes, chosen_options, overflow_to}] apply one choice to every handle
+ *   with that varying-attribute set (attribute-set index, one lookup per product); per_product wins
  * - Emits preview_transformed, files.shopify_csv_base64, qa/gate, decision_log, handles_with_overflow
+ * - QA issues go into an index (counts per code / handle, a few samples per code, first page)
+ *   instead of one unbounded array; decision_log.qa carries only the counts
+ * - CSV export streams rows through a fixed column schema into 1 MB chunks, base64-encoded as they
+ *   arrive; strategy.csv_split_mb splits it at product boundaries into files.shopify_csv_parts
+ * - decision_log.timings: per-stage spans (upstream extract/mapping + group/expand/qa/csv/overflow)
+ * - Indexed grouping (parent-name map) and per-row attribute cache: each row is scanned once per run
+ * - Input rows as a compact block (headers + one array per row); request metadata stays in $json.context
+ * - Same code as the workflow's "Transform & QA" node (the reference local_engine.py is checked against);
+ *   the CSV always carries the Metafields column, empty unless overflow was demoted
  */
 
 const startedAt = new Date();
@@ -58,14 +73,39 @@ const titleCase = (s) =>
     .replace(/\b\w/g, (c) => c.toUpperCase());
 
 /* ---------------- inputs ---------------- */
+// Rows arrive as a block: one array per row in `headers` order (Sync: CSV + Webhook);
+// row objects (older callers) pass through as they are
+function rowObjects(cols, rows) {
+  if (!rows.length || !Array.isArray(rows[0])) return rows;
+  const out = new Array(rows.length);
+  for (let i = 0; i < rows.length; i++) {
+    const a = rows[i];
+    const r = {};
+    for (let c = 0; c < cols.length; c++) r[cols[c]] = a[c] ?? "";
+    out[i] = r;
+  }
+  return out;
+}
+
 const headers = Array.isArray($json.headers) ? $json.headers : [];
-const rowsIn = Array.isArray($json.rows) ? $json.rows : [];
+const rowsIn = rowObjects(headers, Array.isArray($json.rows) ? $json.rows : []);
 const mappingArr = Array.isArray($json.mapping) ? $json.mapping : [];
 
 const strategy =
   $json.strategy && typeof $json.strategy === "object" ? $json.strategy : {};
 const strict_mode = !!$json.strict_mode;
 
+// Variant lines per product (Shopify's import limit); strategy.max_variants_per_product overrides
+const DEFAULT_VARIANT_CAP = 100;
+const variantCap =
+  Number.isInteger(strategy.max_variants_per_product) && strategy.max_variants_per_product > 0
+    ? strategy.max_variants_per_product
+    : DEFAULT_VARIANT_CAP;
+
+// Split the CSV into files of at most this many MB (Shopify's product import takes 15 MB); 0 = one file
+const csvSplitBytes =
+  Number(strategy.csv_split_mb) > 0 ? Math.floor(Number(strategy.csv_split_mb) * 1024 * 1024) : 0;
+
 const overrides =
   $json.overrides && typeof $json.overrides === "object" ? $json.overrides : {};
 const perProduct =
@@ -73,6 +113,18 @@ const perProduct =
     ? overrides.per_product
     : {};
 
+// Rule overrides, indexed by varying-attribute set (case- and order-insensitive); first rule per set wins
+const attrSetKey = (names) =>
+  [...new Set(names.map((n) => toStr(n).trim().toLowerCase()))].sort().join("\u0000");
+const ruleIndex = new Map();
+(Array.isArray(overrides.rules) ? overrides.rules : []).forEach((rule, i) => {
+  if (!rule || !Array.isArray(rule.varying_attributes)) return;
+  if (!Array.isArray(rule.chosen_options) || !rule.chosen_options.length) return;
+  const key = attrSetKey(rule.varying_attributes);
+  if (!ruleIndex.has(key)) ruleIndex.set(key, { ...rule, rule: i });
+});
+const hasChosen = (per) => !!(per && Array.isArray(per.chosen_options) && per.chosen_options.length);
+
 let source = $json.source || { type: "custom", confidence: 0.5 };
 
 // policy defaults
@@ -120,7 +172,29 @@ const OPTION_NAME_CANDIDATES = [
   "pattern",
 ];
 
+// Row key per option-name candidate (last case-insensitive match wins, like Object.fromEntries
+// on lowercased keys); taken from the headers once instead of lowercasing every row
+function candidateKeys(keys) {
+  const lower = {};
+  for (const k of keys) lower[String(k).toLowerCase()] = k;
+  return OPTION_NAME_CANDIDATES.filter((c) => c in lower).map((c) => [c, lower[c]]);
+}
+const CANDIDATE_KEYS = headers.length ? candidateKeys(headers) : null;
+
+// getRowAttributes() result per row object, computed once per run; expanded views share
+// their source row's entry (see expandSimpleRowToVariants)
+const attrCache = new WeakMap();
+
 function getRowAttributes(row) {
+  let attrs = attrCache.get(row);
+  if (!attrs) {
+    attrs = scanRowAttributes(row);
+    attrCache.set(row, attrs);
+  }
+  return attrs;
+}
+
+function scanRowAttributes(row) {
   const attrs = [];
   // Woo-style pairs
   for (const p of ATTR_PAIRS) {
@@ -140,12 +214,9 @@ function getRowAttributes(row) {
     attrs.push({ name, rawName, values: vals, value: first });
   }
   // Custom optionish columns
-  const lowerRow = Object.fromEntries(
-    Object.entries(row).map(([k, v]) => [String(k).toLowerCase(), v])
-  );
-  for (const cand of OPTION_NAME_CANDIDATES) {
-    if (lowerRow[cand] != null) {
-      const v = toStr(lowerRow[cand]).trim();
+  for (const [cand, key] of CANDIDATE_KEYS || candidateKeys(Object.keys(row))) {
+    if (row[key] != null) {
+      const v = toStr(row[key]).trim();
       if (v) attrs.push({ name: titleCase(cand), rawName: cand, values: [v], value: v });
     }
   }
@@ -241,6 +312,13 @@ function groupRowsWooAware(rows) {
         byKey.set(key, { key, parent: r, variants: [], singles: [], parentImages: [] });
     }
   }
+  // Parent name → first variable group with that name, for the name-root fallback below
+  const byParentName = new Map();
+  for (const gr of byKey.values()) {
+    const pn = toStr(gr.parent?.Name || "").toLowerCase();
+    if (pn && !byParentName.has(pn)) byParentName.set(pn, gr);
+  }
+
   // Second pass: attach variations
   for (const r of rows) {
     const t = typeOf(r);
@@ -251,13 +329,7 @@ function groupRowsWooAware(rows) {
       if (!g) {
         // fallback: try name root
         const base = toStr(r["Name"]).replace(/(-[a-z0-9]+){1,3}$/i, "").trim().toLowerCase();
-        for (const gr of byKey.values()) {
-          const pn = toStr(gr.parent?.Name || "").toLowerCase();
-          if (base && pn && base === pn) {
-            g = gr;
-            break;
-          }
-        }
+        if (base) g = byParentName.get(base) || null;
       }
       if (g) g.variants.push(r);
       else {
@@ -286,32 +358,55 @@ function splitPipeValues(v) {
   if (!truthy(v)) return [];
   return String(v).split("|").map((s) => s.trim()).filter(Boolean);
 }
-function cartesian(arrs) {
-  return arrs.reduce((acc, curr) => {
-    if (!acc.length) return curr.map((x) => [x]);
-    const out = [];
-    for (const a of acc) for (const b of curr) out.push([...a, b]);
-    return out;
-  }, []);
-}
-function expandSimpleRowToVariants(r, chosen) {
-  const attrs = getRowAttributes(r);
-  const byName = Object.fromEntries(attrs.map((a) => [a.name, a]));
-  const perOptValues = chosen.map((n) => {
+// Distinct pipe values per chosen option (first-seen order): a repeated value would only add
+// duplicate combinations to the cartesian product
+function pipeOptionValues(r, chosen) {
+  const byName = Object.fromEntries(getRowAttributes(r).map((a) => [a.name, a]));
+  return chosen.map((n) => {
     const a = byName[n];
     if (!a) return [""];
-    const pipe = splitPipeValues(a.values?.length ? a.values.join("|") : a.value);
+    const pipe = [...new Set(splitPipeValues(a.values?.length ? a.values.join("|") : a.value))];
     return pipe.length ? pipe : [""];
   });
-  const combos = cartesian(perOptValues); // [[opt1,opt2,opt3], ...]
-  return combos.map((vals) => {
-    const clone = { ...r };
+}
+// How many values pipeOptionValues merged away across the chosen options
+function repeatedOptionValues(r, chosen) {
+  const byName = Object.fromEntries(getRowAttributes(r).map((a) => [a.name, a]));
+  return chosen.reduce((n, name) => {
+    const a = byName[name];
+    const pipe = a ? splitPipeValues(a.values?.length ? a.values.join("|") : a.value) : [];
+    return n + pipe.length - new Set(pipe).size;
+  }, 0);
+}
+// Lazy cartesian expansion (last option varies fastest). Each combination is a view over the
+// source row: untouched fields are shared through the prototype, only the synthetic option
+// picks are own properties. The caller stops pulling once the variant cap is reached.
+function* expandSimpleRowToVariants(
+  r,
+  chosen,
+  skuStrategy = "keep_parent",
+  perOptValues = pipeOptionValues(r, chosen)
+) {
+  const attrs = getRowAttributes(r);
+  const pos = perOptValues.map(() => 0);
+  for (;;) {
+    const view = Object.create(r);
     for (let i = 0; i < chosen.length; i++) {
-      clone[`__synthetic_opt_${i + 1}_name`] = chosen[i];
-      clone[`__synthetic_opt_${i + 1}_value`] = vals[i] || "";
+      view[`__synthetic_opt_${i + 1}_name`] = chosen[i];
+      view[`__synthetic_opt_${i + 1}_value`] = perOptValues[i][pos[i]] || "";
     }
-    return clone;
-  });
+
+    // Blank the SKU if generating unique (will trigger auto-generation later); shadowing on the
+    // view leaves the shared source row untouched
+    if (skuStrategy === "generate_unique") {
+      view["SKU"] = view["Sku"] = view["sku"] = view["Variant SKU"] = "";
+    }
+    attrCache.set(view, attrs); // synthetic keys are not attributes
+    yield view;
+    let k = pos.length - 1;
+    while (k >= 0 && ++pos[k] === perOptValues[k].length) pos[k--] = 0;
+    if (k < 0) return;
+  }
 }
 
 /* ---------------- overflow → Body & Metafields helpers ---------------- */
@@ -360,15 +455,98 @@ const SHOPIFY_STD_COLS = [
   "Variant Image",
   "Image Src",
   "Image Position",
-  // "Metafields" is dynamic
+  "Metafields",  // Explicitly include for overflow data
 ];
 
 const REQUIRED_FIELDS = new Set(["Title", "Variant Price"]);
 
+/* ---------------- QA issue index ---------------- */
+// Issues are counted as they are raised; only a bounded slice of the records is kept. This node
+// keeps no run to page from, so the full list is not available (next_cursor stays null).
+const ISSUE_PAGE = 100; // first issues, in order, in qa.issues
+const ISSUE_SAMPLE = 5; // examples per code in qa.samples
+const ISSUE_TOP_HANDLES = 20; // handles with the most issues in qa.handles.top
+
+function createIssueIndex() {
+  const counts = {};
+  const byHandle = new Map();
+  const samples = {};
+  const first = [];
+  const unresolved = new Set(); // handles with EXCESS_OPTION_DIMENSIONS
+  let total = 0;
+  return {
+    unresolved,
+    get total() {
+      return total;
+    },
+    count: (code) => counts[code] || 0,
+    add(rec) {
+      total++;
+      counts[rec.code] = (counts[rec.code] || 0) + 1;
+      byHandle.set(rec.handle, (byHandle.get(rec.handle) || 0) + 1);
+      const sample = (samples[rec.code] = samples[rec.code] || []);
+      if (sample.length < ISSUE_SAMPLE) sample.push(rec);
+      if (first.length < ISSUE_PAGE) first.push(rec);
+      if (rec.code === "EXCESS_OPTION_DIMENSIONS") unresolved.add(rec.handle);
+    },
+    summary(blocking) {
+      const top = [...byHandle].sort((a, b) => b[1] - a[1]).slice(0, ISSUE_TOP_HANDLES);
+      return {
+        blocking,
+        warnings: total - blocking,
+        total,
+        counts,
+        handles: { count: byHandle.size, top: Object.fromEntries(top) },
+        samples,
+        issues: first,
+        next_cursor: null,
+      };
+    },
+  };
+}
+
+/* ---------------- timing spans ---------------- */
+// decision_log.timings: [{ stage, start_ms, ms, rows_in, rows_out, bytes }]; start_ms is relative
+// to the webhook's arrival (Verify HMAC) when that node ran, else to this node's start
+const nodeJson = (name) => {
+  try {
+    return $(name).first().json || {};
+  } catch {
+    return {};
+  }
+};
+const verifyJson = nodeJson("Verify HMAC");
+const t0 = Number(verifyJson.received_at_ms) || startedAt.getTime();
+const timings = [];
+let spanFrom = startedAt.getTime();
+function span(stage, rowsIn, rowsOut, bytes, from = spanFrom, to = Date.now()) {
+  timings.push({
+    stage,
+    start_ms: from - t0,
+    ms: to - from,
+    rows_in: rowsIn ?? null,
+    rows_out: rowsOut ?? null,
+    bytes: bytes ?? null,
+  });
+  spanFrom = to;
+}
+
+// Upstream checkpoints: LogInit stamps started_at (CSV extracted), Log: MappingPath stamps
+// mapping_completed_at (template lookup + AI agent done)
+const upstreamMeta = ($json.decision_log && $json.decision_log.meta) || {};
+const extractedAt = Date.parse(upstreamMeta.started_at || "");
+const mappedAt = Date.parse(upstreamMeta.mapping_completed_at || "");
+if (verifyJson.received_at_ms && extractedAt)
+  span("extract", null, rowsIn.length, verifyJson.debug?.binary_len, t0, extractedAt);
+if (extractedAt && mappedAt) span("mapping", null, mappingArr.length, null, extractedAt, mappedAt);
+if (mappedAt) span("inputs", rowsIn.length, rowsIn.length, null, mappedAt, startedAt.getTime());
+spanFrom = startedAt.getTime();
+
 const groups = groupRowsWooAware(rowsIn);
+span("group", rowsIn.length, groups.length);
 
 const allOutRows = [];
-const issues = [];
+const issueIndex = createIssueIndex();
 const suggestions = [];
 const transforms = [];
 let appliedSlugify = 0,
@@ -378,6 +556,7 @@ let appliedSlugify = 0,
   autoSkuAssigned = 0;
 
 let decision_overrides_applied = [];
+const firstTitledRow = new Map(); // handle → index in allOutRows of its first row with a Title
 
 /* ---------------- per-group build ---------------- */
 for (const g of groups) {
@@ -395,6 +574,7 @@ for (const g of groups) {
 
   // Analyze varying attributes on original set for decisions/UI
   const varying0 = analyzeVaryingAttributes(variantRows0);
+  g.varying0 = varying0; // reused by handles_with_overflow
   const namesAll0 = varying0.filter((a) => a.distinctCount > 1).map((a) => a.name);
   const namesAll0LC = namesAll0.map((n) => n.toLowerCase());
   const inNames0 = (n) => namesAll0LC.includes(String(n).toLowerCase());
@@ -403,8 +583,10 @@ for (const g of groups) {
   let chosenOptNames = [];
   let overflowOptNames = [];
 
-  const per = perProduct[handle];
-  if (per && Array.isArray(per.chosen_options) && per.chosen_options.length) {
+  let per = perProduct[handle];
+  let rule = null;
+  if (ruleIndex.size && !hasChosen(per)) per = rule = ruleIndex.get(attrSetKey(namesAll0)) || null;
+  if (hasChosen(per)) {
     const capLC = per.chosen_options.map((s) => String(s).toLowerCase()).filter(inNames0).slice(0, 3);
     const priLC = Array.isArray(strategy.option_priority)
       ? strategy.option_priority.map((x) => String(x).toLowerCase())
@@ -431,6 +613,8 @@ for (const g of groups) {
   // Synthesize variants for "simple" with multi-value chosen attrs
   const parentType = toStr(parentOrFirst["Type"] || parentOrFirst["type"]).toLowerCase();
   let variantRows = variantRows0;
+  let candidateCount = variantRows0.length;
+  let repeatedValues = 0;
   if (parentType === "simple" && variantRows0.length === 1 && chosenOptNames.length) {
     // If any chosen attr has multiple values, expand cartesian
     const attrs = getRowAttributes(parentOrFirst);
@@ -438,10 +622,14 @@ for (const g of groups) {
     const multi = chosenOptNames.some((n) => {
       const a = byLC[String(n).toLowerCase()];
       const pipeVals = splitPipeValues(a?.values?.length ? a.values.join("|") : a?.value);
-      return pipeVals.length > 1;
+      return new Set(pipeVals).size > 1;
     });
     if (multi) {
-      variantRows = expandSimpleRowToVariants(parentOrFirst, chosenOptNames);
+      const perOptValues = pipeOptionValues(parentOrFirst, chosenOptNames);
+      repeatedValues = repeatedOptionValues(parentOrFirst, chosenOptNames);
+      candidateCount = perOptValues.reduce((n, vals) => n * vals.length, 1);
+      const skuStrat = strategy.sku_generation || "keep_parent";
+      variantRows = expandSimpleRowToVariants(parentOrFirst, chosenOptNames, skuStrat, perOptValues);
     }
   }
 
@@ -466,7 +654,10 @@ for (const g of groups) {
   const seenCombos = new Set();
   const suppressDupIssue = overrides?.dedupe_handles === true;
 
-  variantRows.forEach((r, idx) => {
+  let idx = -1;
+  let built = 0;
+  for (const r of variantRows) {
+    idx++;
     const attrs = getRowAttributes(r);
     const byName = Object.fromEntries(
       attrs.map((a) => [a.name, (a.values && a.values[0]) ? a.values[0] : (a.value || "")])
@@ -484,11 +675,23 @@ for (const g of groups) {
     const comboKey = [ov1, ov2, ov3].join("||");
     if (chosenOptNames.length && seenCombos.has(comboKey)) {
       if (!suppressDupIssue) {
-        issues.push({ code: "DUP_VARIANT_COMBO", field: "Options", value: comboKey, handle });
+        issueIndex.add({ code: "DUP_VARIANT_COMBO", field: "Options", value: comboKey, handle });
       }
-      return;
+      continue;
+    }
+    if (built === variantCap) {
+      // one variant more than the cap allows: stop building (and expanding) this product
+      issueIndex.add({
+        code: "VARIANT_LIMIT_EXCEEDED",
+        field: "Options",
+        handle,
+        value: candidateCount,
+        limit: variantCap,
+      });
+      break;
     }
     seenCombos.add(comboKey);
+    built++;
 
     // Prices (with agentic fixes)
     const reg = toNumber(pick(r, ["Regular price", "Price", "price", "Variant Price"]));
@@ -502,12 +705,15 @@ for (const g of groups) {
     // Apply strategy.fix_missing_price
     const fmp = (strategy && strategy.fix_missing_price) || null;
     if (variantPrice == null || variantPrice === "") {
-      if (fmp === "zero" || (typeof fmp === "object" && String(fmp.mode).toLowerCase() === "zero")) {
+      if (
+        fmp === "zero" ||
+        (fmp && typeof fmp === "object" && String(fmp.mode).toLowerCase() === "zero")
+      ) {
         variantPrice = 0;
         decision_overrides_applied.push({ type: "fix_missing_price_zero", handle });
       } else if (
         fmp === "copy_compare_at" ||
-        (typeof fmp === "object" && String(fmp.mode).toLowerCase() === "copy_compare_at")
+        (fmp && typeof fmp === "object" && String(fmp.mode).toLowerCase() === "copy_compare_at")
       ) {
         if (variantCompare != null) {
           variantPrice = variantCompare;
@@ -528,7 +734,7 @@ for (const g of groups) {
       const n = idx + 1;
       sku = `${handle}-${String(n).padStart(3, "0")}`;
       autoSkuAssigned++;
-      issues.push({ code: "AUTO_SKU_ASSIGNED", field: "Variant SKU", value: sku, handle });
+      issueIndex.add({ code: "AUTO_SKU_ASSIGNED", field: "Variant SKU", value: sku, handle });
     }
 
     const rowOut = Object.assign({}, idx === 0 ? productLevel : { Handle: handle }, {
@@ -561,10 +767,10 @@ for (const g of groups) {
 
     // QA required (blocking)
     if (!rowOut["Title"] && idx === 0) {
-      issues.push({ code: "REQ_MISSING_TITLE", field: "Title", handle });
+      issueIndex.add({ code: "REQ_MISSING_TITLE", field: "Title", handle });
     }
     if (rowOut["Variant Price"] === "" || rowOut["Variant Price"] === null) {
-      issues.push({
+      issueIndex.add({
         code: "REQ_MISSING_PRICE",
         field: "Variant Price",
         handle,
@@ -572,8 +778,9 @@ for (const g of groups) {
       });
     }
 
+    if (rowOut.Title && !firstTitledRow.has(handle)) firstTitledRow.set(handle, allOutRows.length);
     allOutRows.push(rowOut);
-  });
+  }
 
   // Product images from parent (or first variant) as separate image-only rows
   const parentImages = splitImages(pick(parentOrFirst, ["Images", "Image URL", "image", "Image"]));
@@ -585,8 +792,13 @@ for (const g of groups) {
     });
   });
 
-  // Overflow suggestions (for UI) if any
-  const varyingListAll = analyzeVaryingAttributes(variantRows)
+  if (repeatedValues) {
+    issueIndex.add({ code: "DUP_OPTION_VALUES", field: "Options", value: repeatedValues, handle });
+  }
+
+  // Overflow suggestions (for UI) if any; expanded views carry their source row's attributes,
+  // so the original set's analysis holds for them too
+  const varyingListAll = varying0
     .filter((a) => a.distinctCount > 1)
     .map((a) => a.name);
   const chosenSetLC = new Set((chosenOptNames || []).map((n) => String(n).toLowerCase()));
@@ -608,24 +820,25 @@ for (const g of groups) {
     });
   }
 
-  // Apply demotion if explicitly requested via per-product override
-  const per2 = perProduct[handle];
+  // Apply demotion if explicitly requested via per-product override (or a matching rule)
+  const per2 = per;
   const overflowAction = per2?.overflow_to;
 
-  if (per2 && Array.isArray(per2.chosen_options) && per2.chosen_options.length) {
+  if (hasChosen(per2)) {
     // Record applied override
     decision_overrides_applied.push({
       type: "cap_options",
       handle,
       chosen: chosenOptNames,
       overflow: overflowNow,
+      ...(rule ? { rule: rule.rule } : {}),
     });
 
     if (hasOverflow && overflowAction === "append_to_body_html") {
-      const overflowMap = collectOverflowValues(variantRows, overflowNow);
+      const overflowMap = collectOverflowValues(variantRows0, overflowNow);
       const htmlLine = buildOverflowHtmlLine(overflowMap);
 
-      const pIdx = allOutRows.findIndex((r) => r.Handle === handle && r.Title);
+      const pIdx = firstTitledRow.has(handle) ? firstTitledRow.get(handle) : -1;
       if (pIdx !== -1) {
         const cur = toStr(allOutRows[pIdx]["Body (HTML)"] || "");
         allOutRows[pIdx]["Body (HTML)"] = cur + htmlLine;
@@ -636,7 +849,7 @@ for (const g of groups) {
   } else {
     // No override → keep QA issue so UI knows this handle is unresolved
     if (hasOverflow) {
-      issues.push({
+      issueIndex.add({
         code: "EXCESS_OPTION_DIMENSIONS",
         field: "Options",
         handle,
@@ -646,31 +859,138 @@ for (const g of groups) {
   }
 }
 
+span("expand", groups.length, allOutRows.length);
+
 /* ---------------- QA roll-up ---------------- */
 const blockingCodes = new Set(["REQ_MISSING_TITLE", "REQ_MISSING_PRICE"]);
-const blocking = issues.filter((i) => blockingCodes.has(i.code)).length;
-const warnings = issues.length - blocking;
-
-/* ---------------- CSV build ---------------- */
-function buildCsv(rows) {
-  if (!rows.length) return "";
-  const dyn = Array.from(new Set(rows.flatMap((r) => Object.keys(r)))).filter(
-    (c) => !SHOPIFY_STD_COLS.includes(c)
-  );
-  const cols = [...SHOPIFY_STD_COLS, ...dyn];
-  const header = cols.join(",");
-  const body = rows
-    .map((r) => cols.map((c) => csvEscape(r[c])).join(","))
-    .join("\n");
-  return header + "\n" + body + "\n";
+let blocking = 0;
+for (const code of blockingCodes) blocking += issueIndex.count(code);
+const qa = issueIndex.summary(blocking);
+span("qa", allOutRows.length, issueIndex.total);
+
+/* ---------------- CSV export ---------------- */
+// Rows are written once, in order, against a column schema fixed before the first row; output
+// leaves in chunks of ~chunkChars. With maxFileBytes each file (header repeated) stays under
+// that size, breaking only where Handle changes; one product larger than that gets its own file.
+const CSV_CHUNK_CHARS = 1 << 20;
+
+function createCsvWriter(cols, sink, { chunkChars = CSV_CHUNK_CHARS, maxFileBytes = 0 } = {}) {
+  const header = cols.join(",") + "\n";
+  const headerBytes = Buffer.byteLength(header);
+  const parts = []; // per file: { rows, bytes }
+  let chunk = "";
+  let product = []; // held-back lines of the current product (splitting only)
+  let productBytes = 0;
+  let lastHandle;
+
+  const flush = () => {
+    if (chunk) sink.write(chunk);
+    chunk = "";
+  };
+  const emit = (text) => {
+    chunk += text;
+    if (chunk.length >= chunkChars) flush();
+  };
+  const startFile = () => {
+    if (parts.length) {
+      flush();
+      sink.end();
+    }
+    parts.push({ rows: 0, bytes: headerBytes });
+    emit(header);
+  };
+  const add = (line, bytes) => {
+    const cur = parts[parts.length - 1];
+    cur.rows++;
+    cur.bytes += bytes;
+    emit(line);
+  };
+  const commitProduct = () => {
+    if (!product.length) return;
+    const cur = parts[parts.length - 1];
+    if (!cur || (cur.rows && cur.bytes + productBytes > maxFileBytes)) startFile();
+    for (const [line, bytes] of product) add(line, bytes);
+    product = [];
+    productBytes = 0;
+  };
+
+  return {
+    write(row) {
+      let line = "";
+      for (let i = 0; i < cols.length; i++) line += (i ? "," : "") + csvEscape(row[cols[i]]);
+      line += "\n";
+      const bytes = Buffer.byteLength(line);
+      if (!maxFileBytes) {
+        if (!parts.length) startFile();
+        add(line, bytes);
+        return;
+      }
+      if (row.Handle !== lastHandle) {
+        commitProduct();
+        lastHandle = row.Handle;
+      }
+      product.push([line, bytes]);
+      productBytes += bytes;
+    },
+    end() {
+      commitProduct();
+      if (parts.length) {
+        flush();
+        sink.end();
+      }
+      return parts;
+    },
+  };
 }
-const csvStr = buildCsv(allOutRows);
-const shopifyCsvBase64 = Buffer.from(csvStr, "utf8").toString("base64");
 
-/* ---------------- handles_with_overflow (unresolved only) ---------------- */
-const unresolvedHandles = new Set(
-  issues.filter((i) => i.code === "EXCESS_OPTION_DIMENSIONS").map((i) => i.handle)
+// Sink: base64-encodes chunks as they arrive (0–2 bytes carried across chunk edges), so the
+// CSV never exists as one string next to its base64 copy; one base64 string per file
+function base64Sink() {
+  const files = [];
+  let pieces = [];
+  let carry = Buffer.alloc(0);
+  return {
+    files,
+    write(text) {
+      const buf = carry.length ? Buffer.concat([carry, Buffer.from(text, "utf8")]) : Buffer.from(text, "utf8");
+      const cut = buf.length - (buf.length % 3);
+      pieces.push(buf.toString("base64", 0, cut));
+      carry = buf.subarray(cut);
+    },
+    end() {
+      pieces.push(carry.toString("base64"));
+      files.push(pieces.join(""));
+      pieces = [];
+      carry = Buffer.alloc(0);
+    },
+  };
+}
+
+const csvCols = SHOPIFY_STD_COLS; // Metafields always present, empty unless overflow was demoted
+const csvSink = base64Sink();
+const csvWriter = createCsvWriter(csvCols, csvSink, { maxFileBytes: csvSplitBytes });
+for (const row of allOutRows) csvWriter.write(row);
+const csvParts = csvWriter.end();
+const csvFiles =
+  csvParts.length > 1
+    ? {
+        shopify_csv_parts: csvParts.map((p, i) => ({
+          filename: `shopify_products_${startedAt.toISOString().slice(0, 10)}_part${i + 1}.csv`,
+          rows: p.rows,
+          bytes: p.bytes,
+          base64: csvSink.files[i],
+        })),
+      }
+    : { shopify_csv_base64: csvSink.files[0] || "" };
+span(
+  "csv",
+  allOutRows.length,
+  allOutRows.length,
+  csvSink.files.reduce((n, b64) => n + b64.length, 0)
 );
+
+/* ---------------- handles_with_overflow (unresolved only) ---------------- */
+const unresolvedHandles = issueIndex.unresolved;
 const handles_with_overflow = [];
 for (const g of groups) {
   const parentOrFirst = g.parent || g.singles?.[0] || g.variants?.[0];
@@ -679,7 +999,7 @@ for (const g of groups) {
   const handle = kebab(title);
   if (!unresolvedHandles.has(handle)) continue;
   const variantRows = g.variants.length ? g.variants : g.singles || [];
-  const varying = analyzeVaryingAttributes(variantRows);
+  const varying = g.varying0 || analyzeVaryingAttributes(variantRows);
   const attrs = varying.filter((a) => a.distinctCount > 1).map((a) => a.name);
   const picked = chooseOptions(varying, 3, strategy.option_priority);
   const suggested = picked.chosen.slice(0, 3);
@@ -691,6 +1011,8 @@ for (const g of groups) {
   });
 }
 
+span("overflow", unresolvedHandles.size, handles_with_overflow.length);
+
 /* ---------------- gate ---------------- */
 const needsOverride = strict_mode
   ? blocking > 0 // strict blocks only on hard missing Title/Price
@@ -717,7 +1039,7 @@ const decision_log = {
     { rule: "numeric_parse_compare_at", applied_to: appliedNumericCompare },
     { rule: "variant_image_first", applied_to: appliedVarImg },
   ],
-  qa: { blocking, warnings, issues },
+  qa: { blocking, warnings: qa.warnings, counts: qa.counts },
   gate: { needs_override: needsOverride, reasons: gateReasons },
   policy,
   strategy_applied: {
@@ -725,11 +1047,13 @@ const decision_log = {
     option_priority: Array.isArray(strategy.option_priority) ? strategy.option_priority : [],
     fix_missing_price: strategy.fix_missing_price ?? null,
     fix_missing_title: strategy.fix_missing_title ?? null,
+    max_variants_per_product: variantCap,
   },
   overrides_applied: {
     count: decision_overrides_applied.length,
     list: decision_overrides_applied,
   },
+  timings,
 };
 
 /* ---------------- final response ---------------- */
@@ -740,8 +1064,8 @@ return [
       strategy,
       strict_mode,
       preview_transformed: allOutRows.slice(0, 50),
-      files: { shopify_csv_base64: shopifyCsvBase64 },
-      qa: { blocking, warnings, issues },
+      files: csvFiles,
+      qa,
       gate: { needs_override: needsOverride, reasons: gateReasons },
       decision_log,
       handles_with_overflow,
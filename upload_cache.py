@@ -0,0 +1,86 @@
+# upload_cache.py
+# Content-addressed cache of parsed catalogs
+# - Key: sha256 of the raw upload (the same value the client sends as x-file-digest)
+# - Value: local_engine.load_catalog(...) output (grouping, attributes, parsed cells, parse spans)
+# - Size-bounded LRU: least-recently-used catalogs are evicted once max_bytes is exceeded
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import local_engine
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def catalog_nbytes(catalog: Dict[str, Any]) -> int:
+    """Approximate in-memory size of a prepared catalog (frames dominate)."""
+    total = 0
+    for key in ("cells", "attrs"):
+        frame = catalog.get(key)
+        if frame is not None:
+            total += int(frame.memory_usage(deep=True).sum())
+    total += int(getattr(catalog.get("member"), "nbytes", 0))
+    total += 64 * sum(len(g["variants"]) + len(g["singles"]) + 1 for g in catalog.get("groups", []))
+    return total
+
+class CatalogCache:
+    """Thread-safe LRU of prepared catalogs keyed by upload digest, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            return digest in self._items
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(digest)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(digest)
+            self.hits += 1
+            return item[0]
+
+    def put(self, digest: str, catalog: Dict[str, Any], nbytes: Optional[int] = None) -> None:
+        size = catalog_nbytes(catalog) if nbytes is None else int(nbytes)
+        with self._lock:
+            if digest in self._items:
+                self._bytes -= self._items.pop(digest)[1]
+            if size > self.max_bytes:
+                return  # would evict everything else and still not fit
+            self._items[digest] = (catalog, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def get_or_parse(self, file_bytes: bytes, digest: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """Return (catalog, hit). Parses and stores the upload on a miss."""
+        digest = digest or hashlib.sha256(file_bytes).hexdigest()
+        catalog = self.get(digest)
+        if catalog is not None:
+            return catalog, True
+        catalog = local_engine.load_catalog(file_bytes)
+        self.put(digest, catalog)
+        return catalog, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
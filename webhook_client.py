@@ -0,0 +1,140 @@
+# webhook_client.py
+# Request side of the migrate_v1 webhook contract, shared by app.py and batch_migrate.py
+# - HMAC signing (must match the n8n Verify HMAC node: ts.request_id.digest)
+# - post_catalog(): multipart upload + x-* auth headers; strategy / overrides travel once, as form
+#   fields (no query string or x-*-json copies, which hit URL and header size limits); llm_cache="bypass"
+#   makes the workflow's agent steps call the model instead of replaying a cached answer
+# - make_session(): keep-alive session with a connection pool sized for concurrent workers
+# - Streaming upload: the digest is computed in chunks (sha256_hex / read_hashed) and the multipart
+#   body is streamed from the caller's buffer (MultipartBody), never assembled as a second copy
+
+import os
+import time
+import uuid
+import hmac
+import hashlib
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HASH_CHUNK = 1 << 20
+
+def sha256_hex(b: bytes) -> str:
+    """sha256 of any bytes-like (bytes, bytearray, mmap), fed in HASH_CHUNK slices without copying."""
+    view = memoryview(b)
+    h = hashlib.sha256()
+    for i in range(0, len(view), HASH_CHUNK):
+        h.update(view[i:i + HASH_CHUNK])
+    return h.hexdigest()
+
+def read_hashed(path: str) -> Tuple[bytearray, str]:
+    """Read a file and its sha256 in one pass (chunks hashed as they land in a presized buffer)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        buf = bytearray(os.fstat(f.fileno()).st_size)
+        view, n = memoryview(buf), 0
+        while n < len(buf):
+            got = f.readinto(view[n:n + HASH_CHUNK])
+            if not got:
+                break
+            h.update(view[n:n + got])
+            n += got
+    del buf[n:]
+    return buf, h.hexdigest()
+
+def _header_param(value: Any) -> str:
+    """A part-header parameter value, quoted; `"`, CR and LF percent-encoded as urllib3 does,
+    so a file name cannot end the quoted string or the header line."""
+    return '"' + str(value).translate({10: "%0A", 13: "%0D", 34: "%22"}) + '"'
+
+class MultipartBody:
+    """multipart/form-data body streamed by the HTTP client via read(); the file part is sliced
+    straight out of the caller's buffer. len() gives requests its Content-Length."""
+
+    def __init__(self, fields: Dict[str, str], file_field: str, file_name: str, content: Any,
+                 mime: str = "text/csv"):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        head = b""
+        for name, value in fields.items():
+            head += (f"--{self.boundary}\r\nContent-Disposition: form-data; name={_header_param(name)}\r\n\r\n"
+                     f"{value}\r\n").encode("utf-8")
+        head += (f"--{self.boundary}\r\nContent-Disposition: form-data; name={_header_param(file_field)}; "
+                 f"filename={_header_param(file_name)}\r\nContent-Type: {mime}\r\n\r\n").encode("utf-8")
+        self._parts = [memoryview(head), memoryview(content), memoryview(f"\r\n--{self.boundary}--\r\n".encode())]
+        self._len = sum(len(p) for p in self._parts)
+        self._part = self._pos = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def read(self, size: int = -1) -> bytes:
+        out = b""
+        while self._part < len(self._parts) and (size < 0 or len(out) < size):
+            part = self._parts[self._part]
+            take = len(part) - self._pos if size < 0 else min(size - len(out), len(part) - self._pos)
+            out += part[self._pos:self._pos + take]
+            self._pos += take
+            if self._pos >= len(part):
+                self._part, self._pos = self._part + 1, 0
+        return out
+
+def sign_body(secret: str, ts: int, request_id: str, file_digest_header: str) -> str:
+    # Must match n8n Verify HMAC: base = f"{ts}.{request_id}.{file_digest_header}"
+    base = f"{ts}.{request_id}.{file_digest_header}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), base, hashlib.sha256).hexdigest()
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Session whose pool keeps `pool_size` connections per host alive across requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(pool_size)))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def post_catalog(
+    http: Any,
+    base_url: str,
+    path: str,
+    file_name: str,
+    file_bytes: bytes,
+    strict_mode: bool,
+    strategy_json: str,
+    overrides_json: str,
+    secret: str = "",
+    timeout: int = 120,
+    file_digest: str = "",
+    llm_cache: str = "",
+) -> Tuple[bool, str, requests.Response]:
+    """Upload one catalog. `http` is the requests module or a Session; signs only when `secret` is set."""
+    ts = int(time.time())
+    request_id = str(uuid.uuid4())
+    file_digest_header = file_digest or sha256_hex(file_bytes)
+
+    headers = {
+        "x-timestamp": str(ts),
+        "x-request-id": request_id,
+        "x-file-digest": file_digest_header,
+    }
+
+    # Settings go in the body only: Ensure Binary 'file' keeps the form fields in json.context
+    data = {
+        "strict_mode": str(strict_mode).lower(),
+        "strategy_json": strategy_json or "",
+        "overrides_json": overrides_json or "",
+    }
+    if llm_cache:
+        data["llm_cache"] = llm_cache
+
+    body = MultipartBody(data, "file", file_name or "catalog.csv", file_bytes)
+    headers["content-type"] = body.content_type
+
+    signed = False
+    if secret:
+        headers["x-signature"] = sign_body(secret, ts, request_id, file_digest_header)
+        signed = True
+
+    url = base_url.rstrip("/") + "/" + path.lstrip("/")
+    resp = http.post(url, data=body, headers=headers, timeout=timeout)
+    return signed, request_id, resp